@@ -4,12 +4,31 @@ from __future__ import annotations
 
 import asyncio
 from datetime import timedelta
+import functools
 import logging
+import time
 from typing import Optional
 import copy
 
 import async_timeout
-from .envoy_reader import EnvoyReader, StreamData
+from .envoy_reader import (
+    EnvoyReader,
+    EnphaseAuthBroker,
+    StreamData,
+    STREAM_COVERED_ATTRIBUTES,
+    REPORT_GRACE,
+    TIER_FAST,
+    TIER_MEDIUM,
+    TIER_SLOW,
+    TIER_BACKGROUND,
+)
+from .envoy_stream import (
+    ENERGY_COUNTERS,
+    EnergyIntegrator,
+    StreamAggregator,
+    StreamDispatcher,
+    StreamReconnectPolicy,
+)
 import httpx
 
 from homeassistant.config_entries import ConfigEntry
@@ -30,12 +49,17 @@ from homeassistant.core import (
     SupportsResponse,
 )
 from homeassistant.exceptions import ConfigEntryAuthFailed
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.storage import Store
-from homeassistant.util import Throttle
+from homeassistant.util import dt as dt_util
 
 
 from .const import (
+    AUTH_BROKERS,
     COORDINATOR,
     DOMAIN,
     NAME,
@@ -44,12 +68,23 @@ from .const import (
     CONF_TOKEN_SOURCE,
     STORAGE_KEY,
     STORAGE_VERSION,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_SAVE_INTERVAL,
+    SNAPSHOT_MAX_AGE,
     READER,
+    STREAM_RECONNECT,
+    TIER_COORDINATORS,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_MEDIUM_SCAN_INTERVAL,
+    DEFAULT_SLOW_SCAN_INTERVAL,
+    DEFAULT_PCU_COMM_CHECK_INTERVAL,
+    PCU_COMM_CHECK_TIMEOUT,
     DEFAULT_REALTIME_UPDATE_THROTTLE,
     LIVE_UPDATEABLE_ENTITIES,
     DEFAULT_GETDATA_TIMEOUT,
 )
+from .coordinator import EnvoyDataUpdateCoordinator
+from .snapshot import async_replace_snapshot, create_snapshot, restore_snapshot
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -64,6 +99,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     # Setup persistent storage, to save tokens between home assistant restarts
     store = Store(hass, STORAGE_VERSION, ".".join([STORAGE_KEY, entry.entry_id]))
+    snapshot_store = Store(
+        hass, STORAGE_VERSION, ".".join([SNAPSHOT_STORAGE_KEY, entry.entry_id])
+    )
+    snapshot_saved = {"time": time.monotonic()}
 
     disabled_endpoints = options.get("disabled_endpoints", [])
     if (
@@ -73,6 +112,12 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         disabled_endpoints = copy.copy(disabled_endpoints)
         disabled_endpoints.append("endpoint_pcu_comm_check")
 
+    energy_integrator = None
+    if options.get("enable_realtime_updates", False) and options.get(
+        "realtime_energy_counters", False
+    ):
+        energy_integrator = EnergyIntegrator()
+
     envoy_reader = EnvoyReader(
         config[CONF_HOST],
         enlighten_user=config[CONF_USERNAME],
@@ -89,17 +134,33 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             else "endpoint_device_data"
         ),
         token_source=config.get(CONF_TOKEN_SOURCE),
+        auth_broker=_async_get_auth_broker(hass, config),
+        adaptive_polling=options.get("adaptive_polling", False),
+        # Only with these counters from the stream an endpoint is fully
+        # covered by it and polled less often, see STREAM_COVERED_ATTRIBUTES
+        stream_energy_counters=energy_integrator.counters if energy_integrator else (),
     )
     await envoy_reader._sync_store(load=True)
 
-    async def async_update_data():
+    # The first refresh after a snapshot runs in the background, while the
+    # coordinator already has its own refresh scheduled. Fast tier updates
+    # wait for each other, so there is only one full pass at a time.
+    fast_update_lock = asyncio.Lock()
+
+    async def async_update_data(tier=TIER_FAST, timeout=None):
         """Fetch data from API endpoint."""
+        if tier == TIER_FAST:
+            async with fast_update_lock:
+                return await _async_update_data(tier, timeout)
+        return await _async_update_data(tier, timeout)
+
+    async def _async_update_data(tier, timeout):
         data = {}
         async with async_timeout.timeout(
-            options.get("getdata_timeout", DEFAULT_GETDATA_TIMEOUT)
+            timeout or options.get("getdata_timeout", DEFAULT_GETDATA_TIMEOUT)
         ):
             try:
-                await envoy_reader.get_data()
+                await envoy_reader.get_data(tier=tier)
             except httpx.HTTPStatusError as err:
                 raise ConfigEntryAuthFailed from err
             except httpx.HTTPError as err:
@@ -108,10 +169,35 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             # The envoy_reader.all_values will adjust production values, based on option key
             data = envoy_reader.all_values
 
+        if envoy_reader.is_stream_healthy and coordinator.data:
+            # Endpoints providing these values are fetched less often while
+            # the stream is healthy, keep the values received from the stream.
+            for key in STREAM_COVERED_ATTRIBUTES:
+                if key in coordinator.data:
+                    data[key] = coordinator.data[key]
+
+        if energy_integrator:
+            # The Envoy counters are leading, corrected for the realtime estimate
+            data.update(energy_integrator.resync(data))
+
         await envoy_reader._sync_store()
+
+        # Write the snapshot at most once per interval, and on shutdown
+        snapshot_store.async_delay_save(
+            save_snapshot,
+            max(0, snapshot_saved["time"] + SNAPSHOT_SAVE_INTERVAL - time.monotonic()),
+        )
         return data
 
-    coordinator = DataUpdateCoordinator(
+    @callback
+    def save_snapshot():
+        """Return a compact copy of the last coordinator data."""
+        snapshot_saved["time"] = time.monotonic()
+        if not coordinator.data:
+            return None
+        return create_snapshot(coordinator.data, envoy_reader.value_times())
+
+    coordinator = EnvoyDataUpdateCoordinator(
         hass,
         _LOGGER,
         name=f"envoy {name}",
@@ -121,11 +207,93 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         ),
     )
 
-    try:
-        await coordinator.async_config_entry_first_refresh()
-    except ConfigEntryAuthFailed:
-        envoy_reader.get_inverters = False
-        await coordinator.async_config_entry_first_refresh()
+    async def async_first_update():
+        try:
+            return await async_update_data()
+        except ConfigEntryAuthFailed:
+            envoy_reader.get_inverters = False
+            return await async_update_data()
+
+    @callback
+    def async_set_first_update_error(err: Exception) -> None:
+        if isinstance(err, ConfigEntryAuthFailed):
+            entry.async_start_reauth(hass)
+        coordinator.async_set_update_error(err)
+
+    snapshot = restore_snapshot(await snapshot_store.async_load(), SNAPSHOT_MAX_AGE)
+    if snapshot is not None:
+        # Set up the entities with the last known data, and replace it
+        # with live data as soon as the Envoy responded.
+        _LOGGER.debug("Using data snapshot")
+        coordinator.data = snapshot
+        entry.async_create_background_task(
+            hass,
+            async_replace_snapshot(
+                async_first_update,
+                coordinator.async_set_updated_data,
+                async_set_first_update_error,
+            ),
+            f"envoy {name} first refresh",
+        )
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except ConfigEntryAuthFailed:
+            envoy_reader.get_inverters = False
+            await coordinator.async_config_entry_first_refresh()
+
+    async def async_update_pcu_comm_check():
+        """Run the powerline check of all devices, within the configured hours."""
+        if not _in_hour_window(
+            dt_util.now().hour,
+            options.get("pcu_comm_check_start_hour", 0),
+            options.get("pcu_comm_check_end_hour", 24),
+        ):
+            return None
+        return await async_update_data(TIER_BACKGROUND, PCU_COMM_CHECK_TIMEOUT)
+
+    medium_interval = options.get(
+        "time_between_medium_update", DEFAULT_MEDIUM_SCAN_INTERVAL
+    )
+
+    async def async_update_medium_tier():
+        """Update the medium tier, the next time right after the device reports."""
+        data = await async_update_data(TIER_MEDIUM)
+        delay = medium_interval
+        if (next_report := envoy_reader.next_report_time(TIER_MEDIUM)) is not None:
+            delay = min(delay, max(next_report - time.time(), REPORT_GRACE))
+        tier_coordinators[TIER_MEDIUM].update_interval = timedelta(seconds=delay)
+        return data
+
+    # The medium and slow tiers are refreshed on their own schedule, with
+    # their own timeout, and a failure does not fail the fast tier.
+    tier_updates = {
+        TIER_MEDIUM: (async_update_medium_tier, medium_interval),
+        TIER_SLOW: (
+            functools.partial(async_update_data, TIER_SLOW),
+            options.get("time_between_slow_update", DEFAULT_SLOW_SCAN_INTERVAL),
+        ),
+    }
+    if "endpoint_pcu_comm_check" not in disabled_endpoints:
+        tier_updates[TIER_BACKGROUND] = (
+            async_update_pcu_comm_check,
+            options.get("pcu_comm_check_interval", DEFAULT_PCU_COMM_CHECK_INTERVAL),
+        )
+
+    tier_coordinators = {}
+    for tier, (update_method, interval) in tier_updates.items():
+        tier_coordinator = tier_coordinators[tier] = DataUpdateCoordinator(
+            hass,
+            _LOGGER,
+            name=f"envoy {name} {tier}",
+            update_method=update_method,
+            update_interval=timedelta(seconds=interval),
+        )
+        entry.async_on_unload(
+            tier_coordinator.async_add_listener(
+                functools.partial(_async_push_tier_data, coordinator, tier_coordinator)
+            )
+        )
 
     if not entry.unique_id:
         try:
@@ -139,7 +307,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         COORDINATOR: coordinator,
         NAME: name,
         READER: envoy_reader,
+        TIER_COORDINATORS: tier_coordinators,
     }
+    if options.get("enable_realtime_updates", False):
+        stream_policy = StreamReconnectPolicy()
+        hass.data[DOMAIN][entry.entry_id][STREAM_RECONNECT] = stream_policy
     live_entities = hass.data[DOMAIN][entry.entry_id].setdefault(
         LIVE_UPDATEABLE_ENTITIES, {}
     )
@@ -147,11 +319,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     # Finally, start measuring production counters
-    time_between_realtime_updates = timedelta(
-        seconds=options.get(
-            "realtime_update_throttle", DEFAULT_REALTIME_UPDATE_THROTTLE
-        ),
+    stream_aggregator = StreamAggregator(
+        options.get("realtime_update_throttle", DEFAULT_REALTIME_UPDATE_THROTTLE)
     )
+    cancel_stream_flush = None
 
     async def async_enable_dpel(call: ServiceCall):
         await envoy_reader.enable_dpel(
@@ -204,50 +375,53 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         upload_grid_profile,
     )
 
-    @Throttle(time_between_realtime_updates)
+    stream_dispatcher: StreamDispatcher | None = None
+
+    @callback
     def update_production_meters(streamdata: StreamData):
-        new_data = {}
-        total_production = 0
-        total_consumption = 0
-        total_net_consumption = 0
-
-        for phase in ["l1", "l2", "l3"]:
-            production_watts = envoy_reader.process_production_value(
-                streamdata.production[phase].watts
-            )
-            consumption_watts = streamdata.consumption[phase].watts
-            net_consumption_watts = streamdata.net_consumption[phase].watts
-
-            total_production += production_watts
-            total_consumption += consumption_watts
-            total_net_consumption += net_consumption_watts
-
-            new_data.update(
-                {
-                    "production_" + phase: production_watts,
-                    "voltage_" + phase: streamdata.production[phase].volt,
-                    "ampere_" + phase: streamdata.production[phase].amps,
-                    "apparent_power_" + phase: streamdata.production[phase].volt_ampere,
-                    "power_factor" + phase: streamdata.production[phase].pf,
-                    "reactive_power_" + phase: streamdata.production[phase].var,
-                    "frequency_" + phase: streamdata.production[phase].hz,
-                    "consumption_" + phase: consumption_watts,
-                    "net_consumption_" + phase: net_consumption_watts,
-                }
+        nonlocal cancel_stream_flush
+        new_data = stream_dispatcher.dispatch(streamdata.raw)
+
+        if energy_integrator:
+            new_data.update(energy_integrator.add(stream_dispatcher.values))
+
+        # Values within the throttle window are averaged, the trailing
+        # window is written by a timer when no new values arrive.
+        if (aggregates := stream_aggregator.add(new_data)) is not None:
+            if cancel_stream_flush:
+                cancel_stream_flush()
+                cancel_stream_flush = None
+            write_production_meters(aggregates)
+        elif cancel_stream_flush is None:
+            cancel_stream_flush = async_call_later(
+                hass, stream_aggregator.remaining(), flush_production_meters
             )
 
-        new_data["production"] = total_production
-        new_data["consumption"] = total_consumption
-        new_data["net_consumption"] = total_net_consumption
+    @callback
+    def flush_production_meters(_now) -> None:
+        nonlocal cancel_stream_flush
+        cancel_stream_flush = None
+        if stream_aggregator.pending:
+            write_production_meters(stream_aggregator.flush())
 
-        for key, value in new_data.items():
+    @callback
+    def write_production_meters(aggregates) -> None:
+        for key, aggregate in aggregates.items():
+            value = aggregate.last if key in ENERGY_COUNTERS else aggregate.mean
             if live_entities.get(key, False) and coordinator.data.get(key) != value:
                 # Update the value in the coordinator
                 coordinator.data[key] = value
 
-                # Let hass know the data is updated
-                if live_entities[key].hass:
-                    live_entities[key].async_write_ha_state()
+                # Let hass know the data is updated, when it changed enough
+                entity = live_entities[key]
+                if entity.hass and (
+                    entity.deadband is None
+                    or entity.deadband.significant(
+                        value,
+                        available=entity.available and coordinator.last_update_success,
+                    )
+                ):
+                    entity.async_write_ha_state()
 
     async def read_realtime_updates() -> None:
         while (
@@ -255,24 +429,84 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             or hass.is_running
             and options.get("enable_realtime_updates", False)
         ):
-            result = await envoy_reader.stream_reader(
-                meter_callback=update_production_meters
-            )
-            if not result:
+            try:
+                result = await envoy_reader.stream_reader(
+                    connect_callback=stream_policy.connected,
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                # Like logging in while the Envoy is unreachable, try again
+                _LOGGER.debug("Unable to connect to /stream/meter: %s", err)
+                result = None
+
+            if result is False:
                 # If result is False, then we are done reconnecting
                 _LOGGER.warning(
                     "Reading /stream/meter failed, stopping realtime updates"
                 )
                 return
 
-            _LOGGER.debug("Re-connecting /stream/meter")
-            # throttle reconnect attempts
-            await asyncio.sleep(30)
+            # Reconnect right away after a clean close, back off on errors
+            delay = stream_policy.disconnected(clean=result is True)
+            _LOGGER.debug("Re-connecting /stream/meter in %.1f seconds", delay)
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def consume_realtime_updates(subscription) -> None:
+        nonlocal stream_dispatcher
+        # The live entities are known once the platforms are set up
+        stream_dispatcher = StreamDispatcher(
+            live_entities.keys()
+            | (energy_integrator.power_keys if energy_integrator else set()),
+            process_production=envoy_reader.process_production_value,
+        )
+
+        # Runs apart from the stream read loop, so slow entity updates
+        # only drop events instead of stalling the connection.
+        async for streamdata in subscription:
+            try:
+                update_production_meters(streamdata)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unable to process realtime data")
+
+    @callback
+    def async_start_realtime_updates() -> None:
+        nonlocal task
+        subscription = envoy_reader.subscribe_stream(maxsize=30)
+        entry.async_on_unload(lambda: envoy_reader.unsubscribe_stream(subscription))
+        entry.async_create_background_task(
+            hass,
+            consume_realtime_updates(subscription),
+            f"envoy {name} realtime updates",
+        )
 
-    if options.get("enable_realtime_updates", False):
         # Setup a home assistant task (that will never die...)
         _LOGGER.debug("Starting loop for /stream/meter")
         task = asyncio.create_task(read_realtime_updates())
+        hass.data[DOMAIN][entry.entry_id]["realtime_loop"] = task
+
+    if options.get("enable_realtime_updates", False):
+        if envoy_reader.endpoint_type:
+            async_start_realtime_updates()
+        else:
+            # Started from a snapshot, the stream needs the Envoy model
+            # which is known after the first successful live update.
+            remove_listener = None
+
+            @callback
+            def async_model_detected() -> None:
+                nonlocal remove_listener
+                if remove_listener and envoy_reader.endpoint_type:
+                    remove_listener()
+                    remove_listener = None
+                    async_start_realtime_updates()
+
+            @callback
+            def async_remove_listener() -> None:
+                if remove_listener:
+                    remove_listener()
+
+            remove_listener = coordinator.async_add_listener(async_model_detected)
+            entry.async_on_unload(async_remove_listener)
 
     @callback
     async def _async_stop(_: Event) -> None:
@@ -281,6 +515,13 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
         hass.data[DOMAIN][entry.entry_id]["realtime_loop"] = False
 
+    @callback
+    def _async_cancel_stream_flush() -> None:
+        if cancel_stream_flush:
+            cancel_stream_flush()
+
+    entry.async_on_unload(_async_cancel_stream_flush)
+
     # Make sure task is cancelled on shutdown (or tests complete)
     entry.async_on_unload(
         hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
@@ -291,6 +532,42 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+def _in_hour_window(hour: int, start: int, end: int) -> bool:
+    """Return True when the hour is in [start, end), which may wrap midnight."""
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+@callback
+def _async_push_tier_data(
+    coordinator: EnvoyDataUpdateCoordinator, tier_coordinator: DataUpdateCoordinator
+) -> None:
+    """Pass the data of a successful tier refresh on to the entities."""
+    if tier_coordinator.last_update_success and tier_coordinator.data is not None:
+        coordinator.async_set_tier_data(tier_coordinator.data)
+
+
+@callback
+def _async_get_auth_broker(hass: HomeAssistant, config) -> EnphaseAuthBroker:
+    """Return the login session shared by all Envoys of one Enphase account."""
+    brokers = hass.data.setdefault(DOMAIN, {}).setdefault(AUTH_BROKERS, {})
+    token_source = config.get(CONF_TOKEN_SOURCE)
+    key = (
+        "enlighten" if token_source == "enlighten" else "entrez",
+        config[CONF_USERNAME].lower(),
+    )
+
+    broker = brokers.get(key)
+    if broker is None or broker.password != config[CONF_PASSWORD]:
+        broker = brokers[key] = EnphaseAuthBroker(
+            config[CONF_USERNAME],
+            config[CONF_PASSWORD],
+            token_source=token_source,
+        )
+    return broker
+
+
 async def _cancel_realtime_task(task: Optional[asyncio.Future]) -> None:
     if not task:
         _LOGGER.debug("No task to cancel")
@@ -12,9 +12,16 @@ from .const import (
     DOMAIN,
     NAME,
     BINARY_SENSORS,
+    STREAM_RECONNECT,
     resolve_hardware_id,
     get_model_name,
 )
+from .coordinator import device_data
+from .device_descriptions import (
+    BINARY_SENSOR_DEVICE_RULES,
+    DeviceDescriptions,
+    entity_context,
+)
 
 
 async def async_setup_entry(
@@ -25,89 +32,74 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][config_entry.entry_id]
     coordinator = data[COORDINATOR]
     name = data[NAME]
+    stream_policy = data.get(STREAM_RECONNECT)
+
+    registry = DeviceDescriptions(BINARY_SENSORS, BINARY_SENSOR_DEVICE_RULES)
 
     entities = []
-    for sensor_description in BINARY_SENSORS:
-        if sensor_description.key.startswith("inverter_data_"):
-            if coordinator.data.get("inverter_device_data"):
-                for inverter in coordinator.data["inverter_device_data"].keys():
-                    device_name = f"Inverter {inverter}"
-                    entity_name = f"{device_name} {sensor_description.name}"
-                    entities.append(
-                        EnvoyInverterEntity(
-                            sensor_description,
-                            entity_name,
-                            device_name,
-                            inverter,
-                            None,
-                            coordinator,
-                        )
-                    )
+    for family, serial_number, sensor_description in registry.entities(
+        coordinator.data
+    ):
+        if family == "inverter":
+            device_name = f"Inverter {serial_number}"
+            entities.append(
+                EnvoyInverterEntity(
+                    sensor_description,
+                    f"{device_name} {sensor_description.name}",
+                    device_name,
+                    serial_number,
+                    None,
+                    coordinator,
+                )
+            )
 
-        elif sensor_description.key.startswith("inverter_info_"):
-            if coordinator.data.get("inverter_info"):
-                for inverter in coordinator.data["inverter_info"].keys():
-                    device_name = f"Inverter {inverter}"
-                    entity_name = f"{device_name} {sensor_description.name}"
-                    entities.append(
-                        EnvoyInverterEntity(
-                            sensor_description,
-                            entity_name,
-                            device_name,
-                            inverter,
-                            None,
-                            coordinator,
-                        )
-                    )
+        elif family in ("relay", "relay_contact"):
+            device_name = f"Relay {serial_number}"
+            entity_class = EnvoyRelayEntity
+            entity_serial_number = None
+            if family == "relay_contact":
+                entity_class = EnvoyRelayContactEntity
+                entity_serial_number = serial_number
+            entities.append(
+                entity_class(
+                    sensor_description,
+                    f"{device_name} {sensor_description.name}",
+                    device_name,
+                    serial_number,
+                    entity_serial_number,
+                    coordinator,
+                    config_entry.unique_id,
+                )
+            )
 
-        elif sensor_description.key.startswith("relay_info_"):
-            if coordinator.data.get("relay_info") is not None:
-                for serial_number, data in coordinator.data["relay_info"].items():
-                    device_name = f"Relay {serial_number}"
-                    entity_name = f"{device_name} {sensor_description.name}"
-
-                    if sensor_description.key == "relay_info_relay":
-                        entities.append(
-                            EnvoyRelayContactEntity(
-                                sensor_description,
-                                entity_name,
-                                device_name,
-                                serial_number,
-                                serial_number,
-                                coordinator,
-                                config_entry.unique_id,
-                            )
-                        )
-                    else:
-                        entities.append(
-                            EnvoyRelayEntity(
-                                sensor_description,
-                                entity_name,
-                                device_name,
-                                serial_number,
-                                None,
-                                coordinator,
-                                config_entry.unique_id,
-                            )
-                        )
-
-        elif sensor_description.key.startswith("batteries_"):
-            if coordinator.data.get("batteries"):
-                for battery in coordinator.data["batteries"].keys():
-                    device_name = f"Battery {battery}"
-                    entity_name = f"{device_name} {sensor_description.name}"
-                    serial_number = battery
-                    entities.append(
-                        EnvoyBatteryEntity(
-                            sensor_description,
-                            entity_name,
-                            device_name,
-                            serial_number,
-                            None,
-                            coordinator,
-                            config_entry.unique_id,
-                        )
+        elif family == "battery":
+            device_name = f"Battery {serial_number}"
+            entities.append(
+                EnvoyBatteryEntity(
+                    sensor_description,
+                    f"{device_name} {sensor_description.name}",
+                    device_name,
+                    serial_number,
+                    None,
+                    coordinator,
+                    config_entry.unique_id,
+                )
+            )
+
+    for sensor_description in registry.other:
+        if sensor_description.key == "realtime_stream":
+            if stream_policy:
+                entities.append(
+                    EnvoyStreamEntity(
+                        sensor_description,
+                        f"{name} {sensor_description.name}",
+                        name,
+                        config_entry.unique_id,
+                        None,
+                        coordinator,
+                        stream_policy=stream_policy,
                     )
+                )
 
         else:
             data = coordinator.data.get(sensor_description.key)
@@ -144,7 +136,9 @@ class EnvoyInverterEntity(CoordinatorEntity, BinarySensorEntity):
         self._serial_number = serial_number
         self._device_name = device_name
         self._device_serial_number = device_serial_number
-        CoordinatorEntity.__init__(self, coordinator)
+        CoordinatorEntity.__init__(
+            self, coordinator, entity_context(description.key, device_serial_number)
+        )
 
     @property
     def name(self):
@@ -183,11 +177,17 @@ class EnvoyInverterEntity(CoordinatorEntity, BinarySensorEntity):
         if not self._device_serial_number:
             return None
 
-        hw_version = (
-            self.coordinator.data.get("inverter_info", {})
-            .get(self._device_serial_number, {})
-            .get("part_num", None)
+        info = device_data(
+            self.coordinator.data, "inverter_info", self._device_serial_number
         )
+        return self.coordinator.cached_device_info(
+            (EnvoyInverterEntity, self._device_serial_number),
+            (info.get("part_num"),),
+            self._create_device_info,
+            info.get("part_num"),
+        )
+
+    def _create_device_info(self, hw_version) -> DeviceInfo:
         return DeviceInfo(
             identifiers={(DOMAIN, str(self._device_serial_number))},
             manufacturer="Enphase",
@@ -235,7 +235,9 @@ class EnvoyBaseEntity(CoordinatorEntity):
         self._device_serial_number = device_serial_number
         self._parent_device = parent_device
 
-        super().__init__(coordinator)
+        super().__init__(
+            coordinator, entity_context(description.key, device_serial_number)
+        )
 
     @property
     def name(self):
@@ -265,19 +267,36 @@ class EnvoyBaseEntity(CoordinatorEntity):
         """Return the device_info of the device."""
         if not self._device_serial_number:
             return None
+
+        if self.MODEL == "Envoy":
+            info = self.coordinator.data.get("envoy_info") or {}
+            fingerprint = (info.get("software"), info.get("pn"), info.get("model"))
+        elif self.MODEL == "Relay":
+            info = device_data(
+                self.coordinator.data, "relay_info", self._device_serial_number
+            )
+            fingerprint = (info.get("img_pnum_running"), info.get("part_num"))
+        else:
+            info = {}
+            fingerprint = ()
+        return self.coordinator.cached_device_info(
+            (EnvoyBaseEntity, self.MODEL, self._device_serial_number),
+            fingerprint,
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
         device_info_kw = {}
         if self._parent_device:
             device_info_kw["via_device"] = (DOMAIN, self._parent_device)
 
         model_name = self.MODEL
         if self.MODEL == "Envoy":
-            model = self.coordinator.data.get("envoy_info", {}).get("model", "Standard")
+            model = info.get("model", "Standard")
             model_name = f"Envoy-S {model}"
 
         elif self.MODEL == "Relay":
-            info = self.coordinator.data.get("relay_info", {}).get(
-                self._device_serial_number, {}
-            )
             device_info_kw["sw_version"] = info.get("img_pnum_running", None)
             device_info_kw["hw_version"] = resolve_hardware_id(
                 info.get("part_num", None)
@@ -319,6 +338,25 @@ class EnvoyBinaryEntity(EnvoyBaseEntity, BinarySensorEntity):
         return self.coordinator.data.get(self.entity_description.key)
 
 
+class EnvoyStreamEntity(EnvoyBinaryEntity):
+    """Connection state and statistics of the realtime meter stream."""
+
+    def __init__(self, *args, stream_policy, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stream_policy = stream_policy
+        # Not coordinator data, refresh on every update
+        self.coordinator_context = None
+
+    @property
+    def is_on(self) -> bool | None:
+        return self._stream_policy.is_connected
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return the state attributes."""
+        return self._stream_policy.diagnostics()
+
+
 class EnvoyRelayEntity(EnvoyBinaryEntity):
     """Envoy relay entity."""
 
@@ -380,7 +418,9 @@ class EnvoyBatteryEntity(CoordinatorEntity, BinarySensorEntity):
         self._device_name = device_name
         self._device_serial_number = device_serial_number
         self._parent_device = parent_device
-        CoordinatorEntity.__init__(self, coordinator)
+        CoordinatorEntity.__init__(
+            self, coordinator, entity_context(description.key, device_serial_number)
+        )
 
     @property
     def name(self):
@@ -422,21 +462,19 @@ class EnvoyBatteryEntity(CoordinatorEntity, BinarySensorEntity):
         if not self._device_serial_number:
             return None
 
-        sw_version = None
-        hw_version = None
-        if self.coordinator.data.get("batteries") and self.coordinator.data.get(
-            "batteries"
-        ).get(self._device_serial_number):
-            sw_version = (
-                self.coordinator.data.get("batteries")
-                .get(self._device_serial_number)
-                .get("img_pnum_running")
-            )
-            hw_version = (
-                self.coordinator.data.get("batteries")
-                .get(self._device_serial_number)
-                .get("part_num")
-            )
+        info = device_data(
+            self.coordinator.data, "batteries", self._device_serial_number
+        )
+        return self.coordinator.cached_device_info(
+            (EnvoyBatteryEntity, self._device_serial_number),
+            (info.get("img_pnum_running"), info.get("part_num")),
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
+        sw_version = info.get("img_pnum_running")
+        hw_version = info.get("part_num")
 
         return DeviceInfo(
             identifiers={(DOMAIN, str(self._device_serial_number))},
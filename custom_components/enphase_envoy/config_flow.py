@@ -31,8 +31,14 @@ from .const import (
     CONF_TOKEN_SOURCE,
     STORAGE_KEY,
     STORAGE_VERSION,
+    SNAPSHOT_STORAGE_KEY,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_MEDIUM_SCAN_INTERVAL,
+    DEFAULT_SLOW_SCAN_INTERVAL,
+    DEFAULT_PCU_COMM_CHECK_INTERVAL,
     DEFAULT_REALTIME_UPDATE_THROTTLE,
+    DEFAULT_DEADBAND_RELATIVE,
+    DEFAULT_DEADBAND_MAX_SILENCE,
     ENABLE_ADDITIONAL_METRICS,
     DEFAULT_GETDATA_TIMEOUT,
 )
@@ -226,13 +232,15 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
                 data[CONF_TOKEN_SOURCE] = advanced_options[CONF_TOKEN_SOURCE]
 
                 if self._current_entry:
-                    # Remove saved token to prevent it being used after reconfire
-                    store = Store(
-                        self.hass,
-                        STORAGE_VERSION,
-                        ".".join([STORAGE_KEY, self._current_entry.entry_id]),
-                    )
-                    await store.async_remove()
+                    # Remove saved token and data snapshot to prevent them
+                    # being used after reconfigure
+                    for key in (STORAGE_KEY, SNAPSHOT_STORAGE_KEY):
+                        store = Store(
+                            self.hass,
+                            STORAGE_VERSION,
+                            ".".join([key, self._current_entry.entry_id]),
+                        )
+                        await store.async_remove()
 
                     return self.async_update_reload_and_abort(
                         self._current_entry,
@@ -297,6 +305,22 @@ class EnvoyOptionsFlowHandler(OptionsFlowWithReload):
                     "time_between_update", DEFAULT_SCAN_INTERVAL
                 ),
             ): vol.All(vol.Coerce(int), vol.Range(min=5)),
+            vol.Optional(
+                "time_between_medium_update",
+                default=self.config_entry.options.get(
+                    "time_between_medium_update", DEFAULT_MEDIUM_SCAN_INTERVAL
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=30)),
+            vol.Optional(
+                "time_between_slow_update",
+                default=self.config_entry.options.get(
+                    "time_between_slow_update", DEFAULT_SLOW_SCAN_INTERVAL
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=60)),
+            vol.Optional(
+                "adaptive_polling",
+                default=self.config_entry.options.get("adaptive_polling", False),
+            ): bool,
             vol.Optional(
                 "getdata_timeout",
                 default=self.config_entry.options.get(
@@ -319,6 +343,28 @@ class EnvoyOptionsFlowHandler(OptionsFlowWithReload):
                     "realtime_update_throttle", DEFAULT_REALTIME_UPDATE_THROTTLE
                 ),
             ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+            vol.Optional(
+                "realtime_energy_counters",
+                default=self.config_entry.options.get(
+                    "realtime_energy_counters", False
+                ),
+            ): bool,
+            vol.Optional(
+                "deadband_enabled",
+                default=self.config_entry.options.get("deadband_enabled", False),
+            ): bool,
+            vol.Optional(
+                "deadband_relative",
+                default=self.config_entry.options.get(
+                    "deadband_relative", DEFAULT_DEADBAND_RELATIVE
+                ),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+            vol.Optional(
+                "deadband_max_silence",
+                default=self.config_entry.options.get(
+                    "deadband_max_silence", DEFAULT_DEADBAND_MAX_SILENCE
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0)),
             vol.Optional(
                 ENABLE_ADDITIONAL_METRICS,
                 default=self.config_entry.options.get(ENABLE_ADDITIONAL_METRICS, False),
@@ -327,6 +373,20 @@ class EnvoyOptionsFlowHandler(OptionsFlowWithReload):
                 "enable_pcu_comm_check",
                 default=self.config_entry.options.get("enable_pcu_comm_check", False),
             ): bool,
+            vol.Optional(
+                "pcu_comm_check_interval",
+                default=self.config_entry.options.get(
+                    "pcu_comm_check_interval", DEFAULT_PCU_COMM_CHECK_INTERVAL
+                ),
+            ): vol.All(vol.Coerce(int), vol.Range(min=300)),
+            vol.Optional(
+                "pcu_comm_check_start_hour",
+                default=self.config_entry.options.get("pcu_comm_check_start_hour", 0),
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=23)),
+            vol.Optional(
+                "pcu_comm_check_end_hour",
+                default=self.config_entry.options.get("pcu_comm_check_end_hour", 24),
+            ): vol.All(vol.Coerce(int), vol.Range(min=1, max=24)),
             vol.Optional(
                 "devstatus_device_data",
                 default=self.config_entry.options.get("devstatus_device_data", False),
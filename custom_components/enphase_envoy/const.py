@@ -41,10 +41,22 @@ PLATFORMS = [
 COORDINATOR = "coordinator"
 NAME = "name"
 READER = "reader"
+AUTH_BROKERS = "auth_brokers"
+STREAM_RECONNECT = "stream_reconnect"
+TIER_COORDINATORS = "tier_coordinators"
 
 DEFAULT_SCAN_INTERVAL = 60  # default in seconds
 DEFAULT_REALTIME_UPDATE_THROTTLE = 10
 DEFAULT_GETDATA_TIMEOUT = 60
+# Intervals of the medium (inverter reports) and slow (configuration) tiers
+DEFAULT_MEDIUM_SCAN_INTERVAL = 300
+DEFAULT_SLOW_SCAN_INTERVAL = 3600
+# The pcu_comm_check job, the Envoy polls every device over powerline
+DEFAULT_PCU_COMM_CHECK_INTERVAL = 3600
+# Covers the request timeout of the endpoint, see ENVOY_ENDPOINTS
+PCU_COMM_CHECK_TIMEOUT = 330
+DEFAULT_DEADBAND_RELATIVE = 1  # percent of the last written value
+DEFAULT_DEADBAND_MAX_SILENCE = 300  # seconds
 
 CONF_SERIAL = "serial"
 CONF_TOKEN_SOURCE = "token_source"
@@ -52,6 +64,12 @@ CONF_TOKEN_SOURCE = "token_source"
 STORAGE_KEY = "envoy"
 STORAGE_VERSION = 1
 
+# Last coordinator data, used to set up entities before the first refresh
+SNAPSHOT_STORAGE_KEY = "envoy_snapshot"
+SNAPSHOT_SAVE_INTERVAL = 300
+# Not used when the newest value in it is older, in seconds
+SNAPSHOT_MAX_AGE = 15 * 60
+
 LIVE_UPDATEABLE_ENTITIES = "live-update-entities"
 ENABLE_ADDITIONAL_METRICS = "enable_additional_metrics"
 ADDITIONAL_METRICS = []
@@ -804,6 +822,12 @@ BINARY_SENSORS = (
         icon="mdi:transmission-tower-import",
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
+    BinarySensorEntityDescription(
+        key="realtime_stream",
+        name="Realtime Stream",
+        device_class=BinarySensorDeviceClass.CONNECTIVITY,
+        entity_category=EntityCategory.DIAGNOSTIC,
+    ),
 )
 
 SWITCHES = (
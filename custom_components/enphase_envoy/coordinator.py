@@ -0,0 +1,90 @@
+"""Data update coordinator for Enphase Envoy."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.core import callback
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+
+from .device_descriptions import DeviceInfoCache
+from .envoy_reader import diff_values
+
+
+def device_data(data: dict[str, Any], key: str, serial_number: str) -> dict:
+    """Return the data of one device from a per device value."""
+    return (data.get(key) or {}).get(serial_number) or {}
+
+
+class EnvoyDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
+    """Coordinator that only notifies the entities whose data changed.
+
+    Entities pass the data keys they read as their coordinator context,
+    see entity_context, device entities only wake up for changes of their
+    own device. Listeners without a context are always notified,
+    as are all listeners after a failed or the first update.
+    """
+
+    changed_keys: set | None = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._device_infos = DeviceInfoCache()
+
+    def cached_device_info(
+        self,
+        key: tuple,
+        fingerprint: tuple,
+        factory: Callable[..., DeviceInfo],
+        *args: Any,
+    ) -> DeviceInfo:
+        """Return the DeviceInfo of a device, shared by all its entities."""
+        return self._device_infos.get(key, fingerprint, factory, *args)
+
+    async def _async_update_data(self) -> dict[str, Any]:
+        try:
+            data = await super()._async_update_data()
+        except Exception:
+            self.changed_keys = None
+            raise
+        self._async_set_changed_keys(data)
+        return data
+
+    @callback
+    def async_set_updated_data(self, data: dict[str, Any]) -> None:
+        self._async_set_changed_keys(data)
+        super().async_set_updated_data(data)
+
+    @callback
+    def async_set_tier_data(self, data: dict[str, Any]) -> None:
+        """Set data fetched by a slower tier, see EnvoyReader.get_data.
+
+        Unlike async_set_updated_data this keeps the refresh schedule, so
+        the fast tier is never delayed by the slower ones.
+        """
+        self._async_set_changed_keys(data)
+        self.data = data
+        self.async_update_listeners()
+
+    @callback
+    def _async_set_changed_keys(self, data: dict[str, Any]) -> None:
+        if self.data is None or not self.last_update_success:
+            # Availability of all entities changes
+            self.changed_keys = None
+        else:
+            self.changed_keys = diff_values(self.data, data)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners whose data changed."""
+        changed_keys = self.changed_keys
+        for update_callback, context in list(self._listeners.values()):
+            if (
+                changed_keys is None
+                or context is None
+                or not changed_keys.isdisjoint(context)
+            ):
+                update_callback()
+        self.changed_keys = None
@@ -0,0 +1,68 @@
+"""Filtering of insignificant sensor state changes."""
+
+import time
+
+# Smallest change written, per sensor device class
+DEADBAND_ABSOLUTE = {
+    "power": 1.0,
+    "apparent_power": 1.0,
+    "reactive_power": 1.0,
+    "voltage": 0.5,
+    "current": 0.05,
+    "frequency": 0.05,
+    "power_factor": 0.01,
+    "temperature": 0.5,
+}
+
+
+class Deadband:
+    """Decides if a new sensor value differs enough from the last written one.
+
+    A numeric change is significant when it exceeds both the absolute
+    deadband and the relative deadband (a fraction of the last value).
+    Other changes, like to or from None, and changes of availability are
+    always significant. After `max_silence` seconds any value is written
+    again as a heartbeat.
+    """
+
+    def __init__(self, absolute=0.0, relative=0.0, max_silence=None):
+        self.absolute = absolute
+        self.relative = relative
+        self.max_silence = max_silence
+        self._value = None
+        self._available = None
+        self._time = None
+
+    def significant(self, value, available=True, now=None):
+        """Return True when the value should be written, and remember it."""
+        if now is None:
+            now = time.monotonic()
+
+        if (
+            self._time is not None
+            and (self.max_silence is None or now - self._time < self.max_silence)
+            and available == self._available
+            and not self._changed(self._value, value)
+        ):
+            return False
+
+        self._value = value
+        self._available = available
+        self._time = now
+        return True
+
+    def _changed(self, old, new):
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            return old != new
+        return abs(new - old) > max(self.absolute, abs(old) * self.relative)
+
+
+def create_deadband(device_class, relative=0.0, max_silence=None):
+    """Return a Deadband for sensors of the device class, None if unfiltered."""
+    if device_class not in DEADBAND_ABSOLUTE:
+        return None
+    return Deadband(
+        absolute=DEADBAND_ABSOLUTE[device_class],
+        relative=relative,
+        max_silence=max_silence,
+    )
@@ -0,0 +1,234 @@
+"""Registry of the entity descriptions of the per device entities."""
+
+import datetime
+import functools
+from collections import namedtuple
+
+# Rule matching entity descriptions of a device family:
+# - match: the description key, or a key prefix when it ends with "_"
+# - data_key: the per device value the devices are read from
+# - family: the kind of entity to create
+# - field_offset: when set, only devices reporting the field key[offset:]
+#   get an entity
+# - requires: other values that must be present to create the entities
+DeviceRule = namedtuple(
+    "DeviceRule", ["match", "data_key", "family", "field_offset", "requires"]
+)
+
+SENSOR_DEVICE_RULES = (
+    DeviceRule(
+        "inverter_pcu_communication_level",
+        "inverter_device_data",
+        "inverter_signal",
+        None,
+        ("pcu_availability",),
+    ),
+    DeviceRule(
+        "relay_pcu_communication_level",
+        "relay_device_data",
+        "relay_signal",
+        None,
+        ("pcu_availability",),
+    ),
+    DeviceRule("inverter_data_watts", "inverter_production", "inverter", None, ()),
+    DeviceRule("inverter_data_", "inverter_device_data", "inverter", 14, ()),
+    DeviceRule("inverter_info_", "inverter_info", "inverter", None, ()),
+    DeviceRule("relay_data_", "relay_device_data", "relay", 11, ()),
+    DeviceRule("relay_info_", "relay_info", "relay", None, ()),
+    DeviceRule("batteries_software", "batteries", "battery_firmware", None, ()),
+    DeviceRule("batteries_", "batteries", "battery", None, ()),
+)
+
+BINARY_SENSOR_DEVICE_RULES = (
+    DeviceRule("inverter_data_", "inverter_device_data", "inverter", None, ()),
+    DeviceRule("inverter_info_", "inverter_info", "inverter", None, ()),
+    DeviceRule("relay_info_relay", "relay_info", "relay_contact", None, ()),
+    DeviceRule("relay_info_", "relay_info", "relay", None, ()),
+    DeviceRule("batteries_", "batteries", "battery", None, ()),
+)
+
+
+# Coordinator data read by device entities, by entity description key
+ENTITY_DATA_KEYS = {
+    "inverter_data_watts": ("inverter_production",),
+}
+# and by entity description key prefix
+ENTITY_DATA_PREFIXES = (
+    ("inverter_data_", ("inverter_device_data", "inverter_info")),
+    ("inverter_info_", ("inverter_info",)),
+    ("inverter_pcu_", ("pcu_availability", "inverter_info")),
+    ("relay_data_", ("relay_device_data",)),
+    ("relay_info_", ("relay_info",)),
+    ("relay_pcu_", ("pcu_availability", "relay_info")),
+    ("batteries_", ("batteries", "batteries_power")),
+)
+
+
+def entity_context(key, serial_number=None):
+    """Return the coordinator data an entity description depends on.
+
+    Device entities only depend on the data of their own device, passed as
+    (data key, serial number) tuples, see diff_values.
+    """
+    data_keys = ENTITY_DATA_KEYS.get(key)
+    if data_keys is None:
+        data_keys = next(
+            (keys for prefix, keys in ENTITY_DATA_PREFIXES if key.startswith(prefix)),
+            None,
+        )
+    if data_keys is None:
+        return frozenset([key])
+    if serial_number is None:
+        return frozenset(data_keys)
+    return frozenset((data_key, serial_number) for data_key in data_keys)
+
+
+# Where a device sensor reads its value:
+# - data_key: the per device value holding the device
+# - field: the field of the device
+# - reported_field: the field with the time the device last reported
+# - is_timestamp: the value is a unix timestamp
+# - gone_default: when set, None is returned for devices that are gone,
+#   this is assumed for devices without a "gone" field
+# - convert: function applied to the value
+DeviceAccessor = namedtuple(
+    "DeviceAccessor",
+    ["data_key", "field", "reported_field", "is_timestamp", "gone_default", "convert"],
+    defaults=(None, None, False, None, None),
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def utc_timestamp(value):
+    """Return the UTC datetime of a unix timestamp reported by the Envoy."""
+    return datetime.datetime.fromtimestamp(int(value), tz=datetime.timezone.utc)
+
+
+def milliwatt_to_watt(value):
+    return int(value / 1000)
+
+
+def inverter_accessor(key, retain=False):
+    """Return the accessor of an inverter sensor description key."""
+    if key == "inverter_data_watts":
+        return DeviceAccessor(
+            "inverter_production", "lastReportWatts", "lastReportDate"
+        )
+    if key.startswith("inverter_data_"):
+        return DeviceAccessor(
+            "inverter_device_data",
+            key[14:],
+            "last_reading",
+            is_timestamp=key.endswith("last_reading"),
+            gone_default=None if retain else False,
+        )
+    if key.startswith("inverter_info_"):
+        return DeviceAccessor("inverter_info", key[14:], "last_rpt_date")
+    return DeviceAccessor(None)
+
+
+def relay_accessor(key):
+    """Return the accessor of a relay sensor description key."""
+    if key.startswith("relay_data_"):
+        return DeviceAccessor(
+            "relay_device_data",
+            key[11:],
+            "last_reading",
+            is_timestamp=key.endswith("last_reading"),
+            gone_default=True,
+        )
+    if key.startswith("relay_info_"):
+        return DeviceAccessor("relay_info", key[11:], "last_rpt_date")
+    return DeviceAccessor(None)
+
+
+def battery_accessor(key, led_states):
+    """Return the accessor of a battery sensor description key."""
+    if key == "batteries_power":
+        return DeviceAccessor(
+            "batteries_power", "real_power_mw", convert=milliwatt_to_watt
+        )
+    if key == "batteries_led_status":
+        return DeviceAccessor("batteries", "led_status", convert=led_states.get)
+    if key == "batteries_software":
+        return DeviceAccessor("batteries", "img_pnum_running")
+    return DeviceAccessor("batteries", key[10:])
+
+
+def device_value(accessor, device):
+    """Return the value of a device sensor from the data of its device."""
+    value = device.get(accessor.field)
+    if accessor.is_timestamp:
+        return utc_timestamp(value)
+    if accessor.gone_default is not None and device.get("gone", accessor.gone_default):
+        return None
+    if accessor.convert is not None:
+        return accessor.convert(value)
+    return value
+
+
+def match_rule(key, rules):
+    """Return the first rule matching the description key, or None."""
+    for rule in rules:
+        if rule.match.endswith("_"):
+            if key.startswith(rule.match):
+                return rule
+        elif key == rule.match:
+            return rule
+    return None
+
+
+class DeviceDescriptions:
+    """Entity descriptions grouped by device family and data key.
+
+    Descriptions that do not match a rule are kept in `other`, for the
+    entities of the Envoy itself. `entities` makes one pass over the
+    devices of each data key to find all device entities to create.
+    """
+
+    def __init__(self, descriptions, rules):
+        # (data key, required keys) -> [(family, description, field)]
+        self.groups = {}
+        self.other = []
+        for description in descriptions:
+            rule = match_rule(description.key, rules)
+            if rule is None:
+                self.other.append(description)
+                continue
+            field = None
+            if rule.field_offset is not None:
+                field = description.key[rule.field_offset :]
+            self.groups.setdefault((rule.data_key, rule.requires), []).append(
+                (rule.family, description, field)
+            )
+
+    def entities(self, data):
+        """Yield (family, serial number, description) of the device entities."""
+        for (data_key, requires), members in self.groups.items():
+            devices = data.get(data_key)
+            if not devices or not all(data.get(key) for key in requires):
+                continue
+            for serial_number, device in devices.items():
+                for family, description, field in members:
+                    if field is None or device.get(field) is not None:
+                        yield family, serial_number, description
+
+
+class DeviceInfoCache:
+    """DeviceInfo of each device, shared by all entities of the device."""
+
+    def __init__(self):
+        # key -> (fingerprint, DeviceInfo)
+        self._device_infos = {}
+
+    def get(self, key, fingerprint, factory, *args):
+        """Return the DeviceInfo of a device.
+
+        The DeviceInfo is only created again by calling factory with args
+        when the fingerprint, the firmware and part numbers the DeviceInfo
+        is created from, changed.
+        """
+        cached = self._device_infos.get(key)
+        if cached is None or cached[0] != fingerprint:
+            cached = self._device_infos[key] = (fingerprint, factory(*args))
+        return cached[1]
@@ -10,7 +10,7 @@ from homeassistant.const import CONF_HOST, CONF_USERNAME, CONF_PASSWORD
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from .const import COORDINATOR, DOMAIN
+from .const import COORDINATOR, DOMAIN, READER, STREAM_RECONNECT, TIER_COORDINATORS
 
 TO_REDACT = {
     CONF_HOST,
@@ -24,11 +24,26 @@ async def async_get_config_entry_diagnostics(
 ) -> dict[str, Any]:
     """Return diagnostics for a config entry."""
     coordinator: DataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id][COORDINATOR]
+    stream_policy = hass.data[DOMAIN][entry.entry_id].get(STREAM_RECONNECT)
+    tier_coordinators = hass.data[DOMAIN][entry.entry_id].get(TIER_COORDINATORS, {})
+    reader = hass.data[DOMAIN][entry.entry_id][READER]
 
     return async_redact_data(
         {
             "entry": entry.as_dict(),
             "data": coordinator.data,
+            "stream": stream_policy.diagnostics() if stream_policy else None,
+            "tiers": {
+                tier: {
+                    "update_interval": tier_coordinator.update_interval.total_seconds(),
+                    "last_update_success": tier_coordinator.last_update_success,
+                }
+                for tier, tier_coordinator in tier_coordinators.items()
+            },
+            "adaptive_polling": (
+                reader.adaptive_intervals if reader.adaptive_polling else None
+            ),
+            "report_schedule": reader.report_schedule,
         },
         TO_REDACT,
     )
@@ -0,0 +1,233 @@
+"""Recording and replaying of the HTTP traffic of an Envoy.
+
+A capture holds every response of the Envoy (status, headers, body and
+latency) and the chunks of /stream/meter as they arrived, so a site can be
+replayed offline:
+
+    capture = EnvoyCapture()
+    reader = EnvoyReader(host, ..., capture=capture)
+    await reader.get_data()
+    capture.save("site.capture.gz")
+
+    capture = EnvoyCapture.load("site.capture.gz")
+    reader = EnvoyReader(host, ..., transport=ReplayTransport(capture, speed=10))
+
+The capture is redacted: the host, the given strings (serial number, user
+name) and tokens are replaced in urls and bodies, and only the headers in
+CAPTURE_HEADERS are kept. Identical bodies are stored once and the file is
+gzipped. Replay does not talk to Enphase, the reader needs a token.
+"""
+
+import asyncio
+import gzip
+import ipaddress
+import json
+import re
+import time
+
+import httpx
+
+CAPTURE_VERSION = 1
+
+# Response headers stored in a capture, all others are dropped
+CAPTURE_HEADERS = ("content-type", "location", "etag", "last-modified")
+
+# Headers that no longer apply after the body was decoded
+_DECODED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+_TOKEN_RE = re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]*")
+
+
+class EnvoyCapture:
+    """Responses and stream chunks recorded from an Envoy."""
+
+    def __init__(self, host=None, redact=()):
+        self.host = host
+        self.redact = [value for value in redact if value]
+        self.started = time.time()
+        self.responses = []
+        self.bodies = []
+        self._body_index = {}
+        self._start = time.monotonic()
+
+    def _hosts(self):
+        """Return the forms of the host found in urls and bodies."""
+        host = self.host.strip("[]")
+        try:
+            address = ipaddress.IPv6Address(host)
+        except ipaddress.AddressValueError:
+            return [self.host]
+        # Bracketed in urls, the bare address may be in bodies
+        forms = dict.fromkeys([host, address.compressed, address.exploded])
+        return [f"[{form}]" for form in forms] + list(forms)
+
+    def _redact(self, text):
+        if self.host:
+            for host in self._hosts():
+                text = text.replace(host, "envoy.local")
+        for n, value in enumerate(self.redact):
+            text = text.replace(value, f"redacted{n}")
+        return _TOKEN_RE.sub("redacted-token", text)
+
+    def _add_body(self, content):
+        body = self._redact(content.decode("utf-8", errors="replace"))
+        index = self._body_index.get(body)
+        if index is None:
+            index = self._body_index[body] = len(self.bodies)
+            self.bodies.append(body)
+        return index
+
+    def record(self, request, response, latency, content=None):
+        """Record a response, return the entry to append stream chunks to."""
+        entry = {
+            "t": round(time.monotonic() - self._start - latency, 3),
+            "method": request.method,
+            "path": self._redact(request.url.raw_path.decode()),
+            "status": response.status_code,
+            "headers": {
+                name: self._redact(response.headers[name])
+                for name in CAPTURE_HEADERS
+                if name in response.headers
+            },
+            "latency": round(latency, 3),
+        }
+        if content is not None:
+            entry["body"] = self._add_body(content)
+        else:
+            entry["chunks"] = []
+        self.responses.append(entry)
+        return entry
+
+    def record_chunk(self, entry, offset, chunk):
+        entry["chunks"].append(
+            [round(offset, 3), self._redact(chunk.decode("utf-8", errors="replace"))]
+        )
+
+    def as_dict(self):
+        return {
+            "version": CAPTURE_VERSION,
+            "started": self.started,
+            "bodies": self.bodies,
+            "responses": self.responses,
+        }
+
+    def save(self, path):
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump(self.as_dict(), file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != CAPTURE_VERSION:
+            raise ValueError(f"Unsupported capture version {data.get('version')}")
+
+        capture = cls()
+        capture.started = data["started"]
+        capture.bodies = data["bodies"]
+        capture.responses = data["responses"]
+        return capture
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, capture, entry):
+        self._stream = stream
+        self._capture = capture
+        self._entry = entry
+        self._start = time.monotonic()
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._capture.record_chunk(
+                self._entry, time.monotonic() - self._start, chunk
+            )
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class CaptureTransport(httpx.AsyncBaseTransport):
+    """Transport recording all responses it passes on into a capture.
+
+    The transport outlives the clients it is used by, closing a client
+    leaves the wrapped transport open.
+    """
+
+    def __init__(self, capture, transport=None):
+        self.capture = capture
+        self._transport = transport or httpx.AsyncHTTPTransport(verify=False)
+
+    async def handle_async_request(self, request):
+        start = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            entry = self.capture.record(request, response, time.monotonic() - start)
+            response.stream = _RecordingStream(response.stream, self.capture, entry)
+            return response
+
+        content = await response.aread()
+        self.capture.record(request, response, time.monotonic() - start, content)
+        return httpx.Response(
+            response.status_code,
+            headers=[
+                (name, value)
+                for name, value in response.headers.multi_items()
+                if name not in _DECODED_HEADERS
+            ],
+            content=content,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        pass
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transport answering requests from a capture.
+
+    The responses of each method and path are returned in recorded order,
+    starting over when all were used. `speed` scales the recorded latency
+    and stream timing (2 is twice as fast), None replays without delays.
+    Requests that were not recorded are answered with 404.
+    """
+
+    def __init__(self, capture, speed=1.0):
+        self.capture = capture
+        self.speed = speed
+        self._responses = {}
+        for entry in capture.responses:
+            key = (entry["method"], entry["path"])
+            self._responses.setdefault(key, []).append(entry)
+        self._next = {}
+
+    async def _sleep(self, seconds):
+        if self.speed and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    async def handle_async_request(self, request):
+        key = (request.method, request.url.raw_path.decode())
+        entries = self._responses.get(key)
+        if not entries:
+            return httpx.Response(404, text="Not in capture")
+
+        n = self._next.get(key, 0)
+        self._next[key] = (n + 1) % len(entries)
+        entry = entries[n]
+
+        await self._sleep(entry["latency"])
+        if "chunks" in entry:
+            content = self._replay_chunks(entry["chunks"])
+        else:
+            content = self.capture.bodies[entry["body"]].encode()
+        return httpx.Response(
+            entry["status"], headers=entry["headers"], content=content
+        )
+
+    async def _replay_chunks(self, chunks):
+        previous = 0
+        for offset, chunk in chunks:
+            await self._sleep(offset - previous)
+            previous = offset
+            yield chunk.encode()
@@ -1,3 +1,7 @@
+# "tier": fetched every refresh ("fast"), with the inverter reports ("medium")
+# or with the static configuration data ("slow"), see EnvoyReader.get_data. The
+# "background" tier runs as a job with its own schedule. "timeout" is the
+# request timeout in seconds, 30 when not set.
 ENVOY_ENDPOINTS = {
     # Generic endpoints
     "info": {
@@ -5,18 +9,21 @@ ENVOY_ENDPOINTS = {
         "cache": 3600,
         "installer_required": False,
         "optional": False,
+        "tier": "slow",
     },
     "peb_newscan": {
         "url": "https://{}/ivp/peb/newscan",
         "cache": 3600,
         "installer_required": True,
         "optional": True,
+        "tier": "slow",
     },
     "dpel": {
         "url": "https://{}/ivp/ss/dpel",
         "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "fast",
     },
     # Production/consumption endpoints
     "production_json": {
@@ -24,36 +31,42 @@ ENVOY_ENDPOINTS = {
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     "production_v1": {
         "url": "https://{}/api/v1/production",
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "production_inverters": {
         "url": "https://{}/api/v1/production/inverters",
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "medium",
     },
     "production_report": {
         "url": "https://{}/ivp/meters/reports/production",
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "production_power": {
         "url": "https://{}/ivp/mod/603980032/mode/power",
         "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "fast",
     },
     "pdm_energy": {
         "url": "https://{}/ivp/pdm/energy",
         "cache": 0,
         "installer_required": True,
         "optional": False,
+        "tier": "fast",
     },
     # Battery endpoints
     "ensemble_inventory": {
@@ -61,18 +74,21 @@ ENVOY_ENDPOINTS = {
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "medium",
     },
     "ensemble_secctrl": {
         "url": "https://{}/ivp/ensemble/secctrl",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     "ensemble_power": {
         "url": "https://{}/ivp/ensemble/power",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     # Inverter endpoints
     "inventory": {
@@ -80,36 +96,43 @@ ENVOY_ENDPOINTS = {
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "device_data": {
         "url": "https://{}/ivp/pdm/device_data",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "medium",
     },
     "devstatus": {
         "url": "https://{}/ivp/peb/devstatus",
         "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "medium",
     },
     "pcu_comm_check": {
         "url": "https://{}/installer/pcu_comm_check",
-        "cache": 3600,
+        "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "background",
+        "timeout": 300,
     },
     "meters": {
         "url": "https://{}/ivp/meters",
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "slow",
     },
     "meters_readings": {
         "url": "https://{}/ivp/meters/readings",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     # Netprofile endpoints
     "installer_agf": {
@@ -117,6 +140,7 @@ ENVOY_ENDPOINTS = {
         "cache": 3600,
         "installer_required": True,
         "optional": True,
+        "tier": "slow",
     },
     # Tariff endpoints
     "admin_tariff": {
@@ -124,6 +148,7 @@ ENVOY_ENDPOINTS = {
         "cache": 300,
         "installer_required": False,
         "optional": True,
+        "tier": "slow",
     },
 }
 
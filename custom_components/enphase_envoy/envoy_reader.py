@@ -1,6 +1,7 @@
 """Module to read production and consumption values from an Enphase Envoy on the local network."""
 
 import asyncio
+import collections
 import datetime
 import time
 import logging
@@ -14,6 +15,8 @@ import re
 from jsonpath import JSONPath
 from json.decoder import JSONDecodeError
 
+from .envoy_capture import CaptureTransport
+from .envoy_stream import STREAM_PHASES
 from .envoy_endpoints import (
     ENVOY_ENDPOINTS,
     ENDPOINT_URL_STREAM,
@@ -33,6 +36,73 @@ ENLIGHTEN_TOKEN_URL = "https://entrez.enphaseenergy.com/tokens"
 
 ENDPOINT_URL_CHECK_JWT = "https://{}/auth/check_jwt"
 
+# A logged in Enlighten/Entrez session is reused for this many seconds
+ENPHASE_SESSION_LIFETIME = 1800
+
+# Optional endpoints answering 404 (or 401 to a valid token) are not requested
+# again for this many seconds, as long as the firmware does not change.
+UNSUPPORTED_ENDPOINT_TTL = 7 * 24 * 3600
+
+# Values that are also received from /stream/meter. While the stream is
+# healthy, endpoints providing only these values (and the energy counters
+# integrated from the stream, see EnvoyReader.stream_energy_counters) are
+# fetched at most every STREAM_COVERED_CACHE_TIME seconds. Every endpoint
+# with power values also has energy counters, so this only applies with the
+# realtime_energy_counters option enabled.
+STREAM_COVERED_ATTRIBUTES = frozenset(
+    ["production", "consumption", "net_consumption"]
+    + [
+        f"{attr}_{phase}"
+        for attr in (
+            "production",
+            "consumption",
+            "net_consumption",
+            "voltage",
+            "ampere",
+            "apparent_power",
+            "power_factor",
+            "reactive_power",
+            "frequency",
+        )
+        for phase in ("l1", "l2", "l3")
+    ]
+)
+STREAM_COVERED_CACHE_TIME = 300
+# Endpoints are fetched in tiers, each with its own interval, see get_data
+TIER_FAST = "fast"
+TIER_MEDIUM = "medium"
+TIER_SLOW = "slow"
+# Endpoints the Envoy takes tens of seconds to answer, like pcu_comm_check
+# which polls every device over powerline. Only fetched by get_data with
+# this tier, never as part of the other tiers.
+TIER_BACKGROUND = "background"
+ENDPOINT_TIERS = (TIER_FAST, TIER_MEDIUM, TIER_SLOW, TIER_BACKGROUND)
+
+# The stream is considered healthy when the last event is at most this old
+STREAM_HEALTHY_AGE = 30
+
+# Adaptive polling: after ADAPTIVE_STABLE_FETCHES fetches with the same
+# content, the interval of an endpoint doubles on every unchanged fetch,
+# starting at ADAPTIVE_MIN_INTERVAL up to ADAPTIVE_MAX_INTERVAL seconds.
+ADAPTIVE_STABLE_FETCHES = 3
+ADAPTIVE_MIN_INTERVAL = 60
+ADAPTIVE_MAX_INTERVAL = 900
+
+# Endpoints with data that only changes when the devices report, with the
+# field holding the report time of each device. After a fetch these are not
+# fetched again before REPORT_GRACE seconds after the next expected report,
+# REPORT_INTERVAL seconds after the newest one. When that is overdue (the
+# devices sleep at night, or the Envoy clock is off) the endpoint is fetched
+# every REPORT_INTERVAL seconds.
+REPORT_TIME_FIELDS = {
+    "endpoint_production_inverters": "lastReportDate",
+    "endpoint_device_data": "last_reading",
+    "endpoint_devstatus": "last_reading",
+    "endpoint_ensemble_inventory": "last_rpt_date",
+}
+REPORT_INTERVAL = 300
+REPORT_GRACE = 30
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -149,15 +219,18 @@ def parse_devicedata(data):
 
 
 def merge_metersdata(data1=[], data2=[]):
+    # Merge into copies, earlier results may still be referenced by the
+    # coordinator data they are compared against.
+    merged = [dict(el1) for el1 in data1]
     for el2 in data2:
-        for el1 in data1:
+        for el1 in merged:
             if el1["eid"] == el2["eid"]:
                 el1.update(el2)
                 break
         else:
-            data1.append(el2)
+            merged.append(dict(el2))
 
-    return data1
+    return merged
 
 
 def read_file_as_bytes(filename):
@@ -177,6 +250,192 @@ class EnvoyError(EnvoyReaderError):
     pass
 
 
+def _create_client(transport=None, **kwargs):
+    """Return a new httpx client, using the transport when one is set."""
+    if transport is not None:
+        kwargs["transport"] = transport
+    return httpx.AsyncClient(verify=False, **kwargs)
+
+
+class EnphaseAuthBroker:
+    """Logged in Enlighten/Entrez session that mints tokens for Envoy serials.
+
+    One broker can be shared by all readers that use the same Enphase account,
+    so the account only logs in once and concurrent token requests for the
+    same serial are coalesced into a single cloud call.
+    """
+
+    def __init__(
+        self,
+        username,
+        password,
+        token_source=None,
+        async_client=None,
+        session_lifetime=ENPHASE_SESSION_LIFETIME,
+        transport=None,
+    ):
+        self.username = username
+        self.password = password
+        self.token_source = token_source
+        self.session_lifetime = session_lifetime
+
+        self._async_client = async_client
+        self._transport = transport
+        self._session = None
+        self._session_time = 0
+        self._login_lock = asyncio.Lock()
+        self._pending_tokens = {}
+
+    @property
+    def source_name(self):
+        return "Enlighten" if self.token_source == "enlighten" else "Entrez"
+
+    @property
+    def async_client(self):
+        """Return the httpx client."""
+        return self._async_client or _create_client(self._transport)
+
+    async def async_get_token(self, serial_num):
+        """Return a new token for the Envoy with the given serial number.
+
+        Callers asking for the same serial while a request is in flight
+        share its result.
+        """
+        task = self._pending_tokens.get(serial_num)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_token(serial_num))
+            self._pending_tokens[serial_num] = task
+
+            def _forget(done):
+                if self._pending_tokens.get(serial_num) is done:
+                    del self._pending_tokens[serial_num]
+
+            task.add_done_callback(_forget)
+
+        return await asyncio.shield(task)
+
+    def invalidate_session(self):
+        self._session = None
+        self._session_time = 0
+
+    async def _fetch_token(self, serial_num):
+        session, fresh = await self._login()
+        try:
+            return await self._request_token(session, serial_num)
+        except EnlightenError:
+            if fresh:
+                raise
+
+        # The reused session may have expired on the Enphase side
+        _LOGGER.debug("Token request with reused %s session failed", self.source_name)
+        if self._session is session:
+            self.invalidate_session()
+        session, _ = await self._login()
+        return await self._request_token(session, serial_num)
+
+    async def _login(self):
+        """Return the current session and whether it was just created."""
+        async with self._login_lock:
+            if (
+                self._session is not None
+                and time.time() - self._session_time < self.session_lifetime
+            ):
+                return self._session, False
+
+            _LOGGER.debug("Logging in to %s", self.source_name)
+            if self.token_source == "enlighten":
+                self._session = await self._login_enlighten()
+            else:
+                self._session = await self._login_entrez()
+            self._session_time = time.time()
+            return self._session, True
+
+    async def _request_token(self, session, serial_num):
+        if self.token_source == "enlighten":
+            return await self._request_enlighten_token(session, serial_num)
+        return await self._request_entrez_token(session, serial_num)
+
+    async def _login_entrez(self):
+        async with self.async_client as client:
+            payload_login = {
+                "username": self.username,
+                "password": self.password,
+            }
+            login_resp = await client.post(
+                ENTREZ_LOGIN_URL, data=payload_login, timeout=30
+            )
+            if login_resp.status_code >= 400:
+                raise EnlightenError("Could not authenticate via Entrez")
+
+            return login_resp.cookies
+
+    async def _request_entrez_token(self, cookies, serial_num):
+        """
+        Try to fetch the token json from Entrez
+        :return:
+        """
+        _LOGGER.debug("Fetching Entrez token")
+        async with self.async_client as client:
+            # now that we're in a logged in session, we can request the installer token
+            payload_token = {
+                "serialNum": serial_num,
+            }
+            token_resp = await client.post(
+                ENTREZ_TOKEN_URL,
+                data=payload_token,
+                timeout=30,
+                cookies=cookies,
+            )
+            if token_resp.status_code != 200:
+                raise EnlightenError("Could not get Entrez token")
+
+            match = re.search(
+                r"<textarea[^>]*>(.*?)</textarea>", token_resp.text, re.DOTALL
+            )
+            if match:
+                token = match.group(1).strip()
+                if token.startswith("Error"):
+                    raise EnlightenError("Could not get Entrez token")
+            else:
+                raise EnlightenError("Could not get Entrez token")
+
+            return token
+
+    async def _login_enlighten(self):
+        async with self.async_client as client:
+            payload_login = {
+                "user[email]": self.username,
+                "user[password]": self.password,
+            }
+            resp = await client.post(
+                ENLIGHTEN_LOGIN_URL, data=payload_login, timeout=30
+            )
+            if resp.status_code >= 400:
+                raise EnlightenError("Could not authenticate via Enlighten")
+
+            return resp.json()["session_id"]
+
+    async def _request_enlighten_token(self, session_id, serial_num):
+        """
+        Try to fetch the token json from Enlighten API
+        :return:
+        """
+        _LOGGER.debug("Fetching Enlighten token")
+        async with self.async_client as client:
+            # now that we're in a logged in session, we can request the installer token
+            payload_token = {
+                "session_id": session_id,
+                "serial_num": serial_num,
+                "username": self.username,
+            }
+            resp = await client.post(
+                ENLIGHTEN_TOKEN_URL, json=payload_token, timeout=30
+            )
+            if resp.status_code != 200:
+                raise EnlightenError("Could not get Enlighten token")
+            return resp.text
+
+
 class FileData:
     def __init__(self, file):
         self.file = file
@@ -196,6 +455,11 @@ class FileData:
     def status_code(self):
         return 200
 
+    @property
+    def content(self):
+        with open(self.file, "rb") as file:
+            return file.read()
+
     @property
     def headers(self):
         return {"content-type": self.content_type}
@@ -216,17 +480,147 @@ class FileData:
             return self.url.split("/")[-1]
 
 
+# What a full stream subscription does with a new event
+STREAM_DROP_OLDEST = "drop_oldest"
+STREAM_DROP_NEWEST = "drop_newest"
+STREAM_COALESCE = "coalesce"
+
+
+class StreamSubscription:
+    """Bounded queue of stream events for one consumer.
+
+    Events are put without ever blocking the stream read loop. When the
+    queue is full the oldest (drop_oldest) or the new (drop_newest) event is
+    dropped; with coalesce only the latest event is kept. Iterate over the
+    subscription to receive the events, until it is closed.
+    """
+
+    def __init__(self, maxsize=10, policy=STREAM_DROP_OLDEST):
+        if policy not in (STREAM_DROP_OLDEST, STREAM_DROP_NEWEST, STREAM_COALESCE):
+            raise ValueError(f"Unknown stream subscription policy {policy}")
+        self.maxsize = 1 if policy == STREAM_COALESCE else maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+        self._queue = collections.deque()
+        self._waiter = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, item):
+        """Queue an event, never blocks."""
+        if self.closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            if self.policy == STREAM_DROP_NEWEST:
+                return
+            self._queue.popleft()
+        self._queue.append(item)
+        self._wake()
+
+    async def get(self):
+        """Return the next event, or None when the subscription is closed."""
+        while not self._queue:
+            if self.closed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._queue.popleft()
+
+    def close(self):
+        """Stop the subscription, events already queued can still be read."""
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if (item := await self.get()) is None:
+            raise StopAsyncIteration
+        return item
+
+
+class SSEParser:
+    """Incremental parser for the server-sent events of /stream/meter.
+
+    Bytes are fed as they arrive from the connection, regardless of how
+    they were chunked. The payload of every complete ``data:`` line is
+    returned, the Envoy puts each reading as one JSON document on a single
+    line. Comments, other fields and blank lines are skipped.
+    """
+
+    __slots__ = ("_buffer", "_discarding", "_max_size")
+
+    def __init__(self, max_size=1024 * 1024):
+        self._buffer = bytearray()
+        self._max_size = max_size
+        self._discarding = False
+
+    def feed(self, chunk):
+        """Add received bytes, returns the payloads of completed events."""
+        buffer = self._buffer
+        buffer += chunk
+        events = []
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            if self._discarding:
+                # Remainder of an oversized line, resync on the next line.
+                self._discarding = False
+            else:
+                line_end = end
+                if line_end > start and buffer[line_end - 1] == 0x0D:
+                    line_end -= 1
+                if buffer.startswith(b"data:", start, line_end):
+                    data_start = start + 5
+                    if data_start < line_end and buffer[data_start] == 0x20:
+                        data_start += 1
+                    events.append(buffer[data_start:line_end])
+            start = end + 1
+
+        del buffer[:start]
+        if len(buffer) > self._max_size:
+            _LOGGER.debug("Discarding oversized stream line of %s bytes", len(buffer))
+            buffer.clear()
+            self._discarding = True
+        return events
+
+    def reset(self):
+        """Drop any partially received line."""
+        self._buffer.clear()
+        self._discarding = False
+
+
 class StreamData:
+    """One /stream/meter event, phase groups are decoded when first read."""
+
+    __slots__ = ("_consumption", "_net_consumption", "_production", "raw")
+
     class PhaseData:
+        """Read-only view on the measurements of one phase."""
+
+        __slots__ = ("_raw",)
+
         def __init__(self, phase_data):
-            # https://en.wikipedia.org/wiki/AC_power explains the terms/units
-            self.watts = phase_data["p"]  # wNow, active/real power, W
-            self.amps = phase_data["i"]  # rmsCurrent, A
-            self.volt_ampere = phase_data["s"]  # apparent_power, VA
-            self.volt = phase_data["v"]  # rmsVoltage, V
-            self.pf = phase_data["pf"]  # pwrFactor, PF
-            self.hz = phase_data["f"]  # Frequency, Hz
-            self.var = phase_data["q"]  # Reactive power, var (volt ampere reactive)
+            self._raw = phase_data
+
+        # https://en.wikipedia.org/wiki/AC_power explains the terms/units
+        watts = property(lambda self: self._raw["p"])  # wNow, active/real power, W
+        amps = property(lambda self: self._raw["i"])  # rmsCurrent, A
+        volt_ampere = property(lambda self: self._raw["s"])  # apparent_power, VA
+        volt = property(lambda self: self._raw["v"])  # rmsVoltage, V
+        pf = property(lambda self: self._raw["pf"])  # pwrFactor, PF
+        hz = property(lambda self: self._raw["f"])  # Frequency, Hz
+        var = property(lambda self: self._raw["q"])  # Reactive power, var
 
         def __str__(self):
             desc = "<Phase %s watts, %s volt, %s amps, %s va, %s hz, %s pf, %s var />"
@@ -241,20 +635,45 @@ class StreamData:
             )
 
     def __init__(self, data):
-        self.production = {}
-        self.consumption = {}
-        self.net_consumption = {}
-
-        phase_mapping = {"ph-a": "l1", "ph-b": "l2", "ph-c": "l3"}
-        for data_key, attr in {
-            "production": "production",
-            "total-consumption": "consumption",
-            "net-consumption": "net_consumption",
-        }.items():
-            for phase_key, phase in phase_mapping.items():
-                if not data.get(data_key, {}).get(phase_key, False):
-                    continue
-                getattr(self, attr)[phase] = self.PhaseData(data[data_key][phase_key])
+        self.raw = data
+        self._production = None
+        self._consumption = None
+        self._net_consumption = None
+
+    def _group(self, data_key):
+        group = self.raw.get(data_key) or {}
+        return {
+            phase: self.PhaseData(group[phase_key])
+            for phase_key, phase in STREAM_PHASES
+            if group.get(phase_key)
+        }
+
+    @property
+    def production(self):
+        if self._production is None:
+            self._production = self._group("production")
+        return self._production
+
+    @property
+    def consumption(self):
+        if self._consumption is None:
+            self._consumption = self._group("total-consumption")
+        return self._consumption
+
+    @property
+    def net_consumption(self):
+        if self._net_consumption is None:
+            self._net_consumption = self._group("net-consumption")
+        return self._net_consumption
+
+    def value(self, data_key, phase_key, field):
+        """Return one raw measurement without decoding the group.
+
+        ``StreamData.value("production", "ph-a", "p")`` is the same as
+        ``StreamData.production["l1"].watts``, None when not present.
+        """
+        phase_data = (self.raw.get(data_key) or {}).get(phase_key)
+        return phase_data.get(field) if phase_data else None
 
     def __str__(self):
         return "<StreamData production=%s, consumption=%s, net_consumption=%s />" % (
@@ -264,6 +683,43 @@ class StreamData:
         )
 
 
+# Values that are dicts keyed by device serial number
+DEVICE_DATA_KEYS = (
+    "inverter_production",
+    "inverter_device_data",
+    "inverter_info",
+    "relay_device_data",
+    "relay_info",
+    "pcu_availability",
+    "batteries",
+    "batteries_power",
+)
+
+
+def diff_values(old, new):
+    """Return the keys whose value differs between two all_values results.
+
+    For the per device values the changed devices are added as
+    (key, serial number) tuples as well.
+    """
+    if old is None:
+        old = {}
+    changed = {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+    for key in changed.intersection(DEVICE_DATA_KEYS):
+        old_devices = old.get(key)
+        new_devices = new.get(key)
+        if not isinstance(old_devices, dict):
+            old_devices = {}
+        if not isinstance(new_devices, dict):
+            new_devices = {}
+        changed.update(
+            (key, serial)
+            for serial in old_devices.keys() | new_devices.keys()
+            if old_devices.get(serial) != new_devices.get(serial)
+        )
+    return changed
+
+
 def _async_get_property(key):
     async def get(self):
         return self.data.get(key)
@@ -318,6 +774,7 @@ class EnvoyData(object):
         self.data = {}
         self.initial_update_finished = False
         self._required_endpoints = None
+        self._endpoint_attributes = None
         super(object, self).__init__()
 
     def set_endpoint_data(self, endpoint, response):
@@ -395,6 +852,30 @@ class EnvoyData(object):
 
         return endpoints
 
+    def endpoint_attributes(self):
+        """Return the attributes each endpoint provides."""
+        if self._endpoint_attributes is not None:
+            return self._endpoint_attributes
+
+        attributes = {}
+        for attr in self._attributes:
+            path = getattr(self, f"{attr}_value", None)
+            if isinstance(path, str):
+                if self.initial_update_finished and self._resolve_path(path) is None:
+                    continue
+                endpoints = [path.split(".", 1)[0]]
+            else:
+                endpoints = self._envoy_properties.get(attr) or []
+                if not isinstance(endpoints, list):
+                    endpoints = [endpoints]
+
+            for endpoint in endpoints:
+                attributes.setdefault(endpoint, set()).add(attr)
+
+        if self.initial_update_finished:
+            self._endpoint_attributes = attributes
+        return attributes
+
     @property
     def all_values(self):
         """A special property attribute, that will return all dynamic fields."""
@@ -711,6 +1192,11 @@ class EnvoyMeteredWithCT(EnvoyMetered):
             return "Export" if export_limit else "Production"
 
 
+ENVOY_DATA_CLASSES = {
+    cls.__name__: cls for cls in (EnvoyStandard, EnvoyMetered, EnvoyMeteredWithCT)
+}
+
+
 class EnvoyReader:
     """Instance of EnvoyReader"""
 
@@ -733,6 +1219,11 @@ class EnvoyReader:
         lifetime_production_correction=0,
         device_data_endpoint="endpoint_device_data",
         token_source=None,
+        auth_broker=None,
+        transport=None,
+        capture=None,
+        adaptive_polling=False,
+        stream_energy_counters=(),
     ):
         """Init the EnvoyReader."""
         self.host = host.lower()
@@ -744,6 +1235,7 @@ class EnvoyReader:
         self.fetch_task = None
 
         self._async_client = async_client
+        self._transport = transport
         self._authorization_header = None
         self._cookies = None
         self.enlighten_user = enlighten_user
@@ -753,6 +1245,13 @@ class EnvoyReader:
         self.token_refresh_buffer_seconds = token_refresh_buffer_seconds
         self.token_type = None
         self.token_source = token_source
+        self.auth_broker = auth_broker or EnphaseAuthBroker(
+            enlighten_user,
+            enlighten_pass,
+            token_source=token_source,
+            async_client=async_client,
+            transport=transport,
+        )
 
         self.data: EnvoyData = EnvoyStandard(self)
         self.required_endpoints = set()  # in case we would need it..
@@ -771,17 +1270,46 @@ class EnvoyReader:
         except ipaddress.AddressValueError:
             pass
 
+        if capture is not None:
+            # Record the Envoy traffic, the Enphase cloud is left out
+            capture.host = capture.host or self.host
+            capture.redact += [
+                value
+                for value in (enlighten_serial_num, enlighten_user)
+                if value and value not in capture.redact
+            ]
+            self._transport = CaptureTransport(capture, transport)
+
         self.disable_negative_production = disable_negative_production
         self.disable_installer_account_use = False
 
         self.is_receiving_realtime_data = False
+        self._last_stream_event = 0
+        self._stream_subscriptions = []
+        # Energy counters kept up to date from the stream power values, empty
+        # unless realtime_energy_counters is enabled
+        self.stream_energy_counters = frozenset(stream_energy_counters)
+
+        self.adaptive_polling = adaptive_polling
+        # endpoint -> content hash, fetches, changes, unchanged fetches, interval
+        self._adaptive = {}
+        # endpoint -> time of the next fetch, after the next device report
+        self._next_report = {}
 
         self._store = store
         self._store_data = {}
         self._store_update_pending = False
+        self._model_restored = False
 
     def register_url(
-        self, attr, url, cache=10, installer_required=False, optional=False
+        self,
+        attr,
+        url,
+        cache=10,
+        installer_required=False,
+        optional=False,
+        tier=TIER_FAST,
+        timeout=30,
     ):
         self.uri_registry[attr] = {
             "url": url,
@@ -789,6 +1317,8 @@ class EnvoyReader:
             "last_fetch": 0,
             "installer_required": installer_required,
             "optional": optional,
+            "tier": tier,
+            "timeout": timeout,
         }
         setattr(self, attr, None)
         return self.uri_registry[attr]
@@ -799,6 +1329,102 @@ class EnvoyReader:
 
         # Setting last_fetch to 0 ensures it will be fetched upon next run
         self.uri_registry[attr]["last_fetch"] = 0
+        if state := self._adaptive.get(attr):
+            # Written to, the content is expected to change
+            state["unchanged"] = 0
+            state["interval"] = 0
+        self._next_report.pop(attr, None)
+
+    def _schedule_report_fetch(self, endpoint):
+        """Set the time to fetch the endpoint again, after the next report."""
+        data = self.data.data.get(endpoint) if self.data else None
+        if endpoint == "endpoint_ensemble_inventory" and isinstance(data, list):
+            data = [
+                device
+                for group in data
+                if isinstance(group, dict)
+                for device in group.get("devices", [])
+            ]
+        if not isinstance(data, list):
+            return
+
+        field = REPORT_TIME_FIELDS[endpoint]
+        report_times = [
+            int(device[field])
+            for device in data
+            if isinstance(device, dict) and device.get(field)
+        ]
+        if not report_times:
+            return
+
+        now = time.time()
+        next_fetch = max(report_times) + REPORT_INTERVAL + REPORT_GRACE
+        if not now < next_fetch <= now + REPORT_INTERVAL + REPORT_GRACE:
+            next_fetch = now + REPORT_INTERVAL
+        self._next_report[endpoint] = next_fetch
+
+    def next_report_time(self, tier=None):
+        """Return the earliest time a report endpoint of the tier is due."""
+        times = [
+            next_fetch
+            for endpoint, next_fetch in self._next_report.items()
+            if tier is None or self.uri_registry[endpoint]["tier"] == tier
+        ]
+        return min(times, default=None)
+
+    def value_times(self):
+        """Return the time each value was last fetched from the Envoy."""
+        times = {}
+        for endpoint, attributes in self.data.endpoint_attributes().items():
+            response = getattr(self, endpoint, None)
+            if getattr(response, "status_code", None) != 200:
+                continue
+            last_fetch = self.uri_registry[endpoint]["last_fetch"]
+            for attr in attributes:
+                times[attr] = max(times.get(attr, 0), last_fetch)
+        return times
+
+    @property
+    def report_schedule(self):
+        """Return the time each report endpoint is fetched again."""
+        return dict(self._next_report)
+
+    def _track_endpoint_change(self, endpoint, response):
+        """Adapt the interval of the endpoint to how often its content changes."""
+        content_hash = hash(response.content)
+        state = self._adaptive.setdefault(
+            endpoint,
+            {"hash": None, "fetches": 0, "changes": 0, "unchanged": 0, "interval": 0},
+        )
+        state["fetches"] += 1
+        if content_hash != state["hash"]:
+            if state["hash"] is not None:
+                state["changes"] += 1
+            state["hash"] = content_hash
+            state["unchanged"] = 0
+            state["interval"] = 0
+            return
+
+        state["unchanged"] += 1
+        if state["unchanged"] >= ADAPTIVE_STABLE_FETCHES:
+            base = max(self.uri_registry[endpoint]["cache_time"], ADAPTIVE_MIN_INTERVAL)
+            state["interval"] = min(
+                base * 2 ** (state["unchanged"] - ADAPTIVE_STABLE_FETCHES),
+                ADAPTIVE_MAX_INTERVAL,
+            )
+
+    @property
+    def adaptive_intervals(self):
+        """Return the learned interval and change counts of the endpoints."""
+        return {
+            endpoint: {
+                "interval": state["interval"],
+                "fetches": state["fetches"],
+                "changes": state["changes"],
+                "unchanged_fetches": state["unchanged"],
+            }
+            for endpoint, state in self._adaptive.items()
+        }
 
     @property
     def _token(self):
@@ -820,14 +1446,17 @@ class EnvoyReader:
     @property
     def async_client(self):
         """Return the httpx client."""
-        return self._async_client or httpx.AsyncClient(verify=False)
+        return self._async_client or _create_client(self._transport)
 
     async def _update_endpoint(self, attr, url, only_on_success=False):
         """Update a property from an endpoint."""
         if url.startswith("https://"):
             formatted_url = url.format(self.host)
+            settings = self.uri_registry.get(attr) or {}
             response = await self._async_fetch_with_retry(
-                formatted_url, follow_redirects=False
+                formatted_url,
+                timeout=settings.get("timeout", 30),
+                follow_redirects=False,
             )
             if not only_on_success or response.status_code == 200:
                 setattr(self, attr, response)
@@ -835,7 +1464,7 @@ class EnvoyReader:
             data = FileData(url)
             setattr(self, attr, data)
 
-    async def _async_fetch_with_retry(self, url, **kwargs):
+    async def _async_fetch_with_retry(self, url, timeout=30, **kwargs):
         """Retry 3 times to fetch the url if there is a transport error."""
         received_401 = 0
         for attempt in range(3):
@@ -852,7 +1481,7 @@ class EnvoyReader:
                         url,
                         headers=self._authorization_header,
                         cookies=self._cookies,
-                        timeout=30,
+                        timeout=timeout,
                         **kwargs,
                     )
                     if resp.status_code == 401 and attempt < 2:
@@ -920,88 +1549,9 @@ class EnvoyReader:
             _LOGGER.debug("TransportError: %s", e)
             raise e
 
-    async def _fetch_entrez_token(self):
-        """
-        Try to fetch the token json from Entrez
-        :return:
-        """
-        _LOGGER.debug("Fetching Entrez token")
-        async with self.async_client as client:
-            # login to Enlighten
-            payload_login = {
-                "username": self.enlighten_user,
-                "password": self.enlighten_pass,
-            }
-            login_resp = await client.post(
-                ENTREZ_LOGIN_URL, data=payload_login, timeout=30
-            )
-            if login_resp.status_code >= 400:
-                raise EnlightenError("Could not authenticate via Entrez")
-
-            # now that we're in a logged in session, we can request the installer token
-            payload_token = {
-                "serialNum": self.enlighten_serial_num,
-            }
-            token_resp = await client.post(
-                ENTREZ_TOKEN_URL,
-                data=payload_token,
-                timeout=30,
-                cookies=login_resp.cookies,
-            )
-            if token_resp.status_code != 200:
-                raise EnlightenError("Could not get Entrez token")
-
-            match = re.search(
-                r"<textarea[^>]*>(.*?)</textarea>", token_resp.text, re.DOTALL
-            )
-            if match:
-                token = match.group(1).strip()
-                if token.startswith("Error"):
-                    raise EnlightenError("Could not get Entrez token")
-            else:
-                raise EnlightenError("Could not get Entrez token")
-
-            return token
-
-    async def _fetch_enlighten_token(self):
-        """
-        Try to fetch the token json from Enlighten API
-        :return:
-        """
-        _LOGGER.debug("Fetching Enlighten token")
-        async with self.async_client as client:
-            # login to Enlighten
-            payload_login = {
-                "user[email]": self.enlighten_user,
-                "user[password]": self.enlighten_pass,
-            }
-            resp = await client.post(
-                ENLIGHTEN_LOGIN_URL, data=payload_login, timeout=30
-            )
-            if resp.status_code >= 400:
-                raise EnlightenError("Could not authenticate via Enlighten")
-
-            # now that we're in a logged in session, we can request the installer token
-            login_data = resp.json()
-            payload_token = {
-                "session_id": login_data["session_id"],
-                "serial_num": self.enlighten_serial_num,
-                "username": self.enlighten_user,
-            }
-            resp = await client.post(
-                ENLIGHTEN_TOKEN_URL, json=payload_token, timeout=30
-            )
-            if resp.status_code != 200:
-                raise EnlightenError("Could not get Enlighten token")
-            return resp.text
-
     async def _get_enphase_token(self):
-        if self.token_source == "enlighten":
-            self._token = await self._fetch_enlighten_token()
-            _LOGGER.debug("Enlighten Token: %s", self._token)
-        else:
-            self._token = await self._fetch_entrez_token()
-            _LOGGER.debug("Entrez Token: %s", self._token)
+        self._token = await self.auth_broker.async_get_token(self.enlighten_serial_num)
+        _LOGGER.debug("%s Token: %s", self.auth_broker.source_name, self._token)
 
         if self._is_enphase_token_expired(self._token):
             raise EnlightenError("Just received token already expired")
@@ -1090,7 +1640,7 @@ class EnvoyReader:
             else:
                 await self._refresh_token_cookies()
 
-    async def stream_reader(self, meter_callback=None):
+    async def stream_reader(self, meter_callback=None, connect_callback=None):
         # First, login, etc, make sure we have a token.
         await self.init_authentication()
 
@@ -1109,7 +1659,7 @@ class EnvoyReader:
         # The Envoy normally sends data every few seconds; 60s without any
         # bytes means the connection is stale and should be recycled.
         stream_timeout = httpx.Timeout(connect=10.0, read=60.0, write=10.0, pool=10.0)
-        stream_client = httpx.AsyncClient(verify=False, timeout=stream_timeout)
+        stream_client = _create_client(self._transport, timeout=stream_timeout)
 
         try:
             _LOGGER.debug(
@@ -1145,25 +1695,31 @@ class EnvoyReader:
 
                 self.is_receiving_realtime_data = True
                 _LOGGER.info("Connected to /stream/meter, receiving realtime data")
+                if connect_callback:
+                    connect_callback()
 
-                async for chunk in response.aiter_text():
-                    if not chunk.startswith("data:"):
-                        continue
-
-                    try:
-                        reading = json.loads(chunk[6:])
-                    except JSONDecodeError:
-                        _LOGGER.debug("Unable to decode json chunk: %s", chunk[6:])
-                        continue
-
-                    if meter_callback:
+                parser = SSEParser()
+                async for chunk in response.aiter_bytes():
+                    for payload in parser.feed(chunk):
                         try:
-                            meter_callback(StreamData(reading))
-                        except Exception as e:
-                            _LOGGER.exception("Unable to execute callback: %s", e)
-                            raise
-                    else:
-                        print(StreamData(reading))
+                            reading = json.loads(payload)
+                        except (JSONDecodeError, UnicodeDecodeError):
+                            _LOGGER.debug("Unable to decode json event: %s", payload)
+                            continue
+
+                        self._last_stream_event = time.monotonic()
+                        stream_data = StreamData(reading)
+                        for subscription in self._stream_subscriptions:
+                            subscription.put(stream_data)
+
+                        if meter_callback:
+                            try:
+                                meter_callback(stream_data)
+                            except Exception as e:
+                                _LOGGER.exception("Unable to execute callback: %s", e)
+                                raise
+                        elif not self._stream_subscriptions:
+                            print(stream_data)
 
             return True
         except httpx.ReadTimeout:
@@ -1178,15 +1734,87 @@ class EnvoyReader:
             self.is_receiving_realtime_data = False
             await stream_client.aclose()
 
-    async def update_endpoints(self, endpoints=None):
+    def subscribe_stream(self, maxsize=10, policy=STREAM_DROP_OLDEST):
+        """Subscribe to the events received by stream_reader.
+
+        All subscribers share the one stream connection, a slow subscriber
+        only loses its own events. See StreamSubscription.
+        """
+        subscription = StreamSubscription(maxsize=maxsize, policy=policy)
+        self._stream_subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe_stream(self, subscription):
+        """Close the subscription and stop queueing events for it."""
+        subscription.close()
+        if subscription in self._stream_subscriptions:
+            self._stream_subscriptions.remove(subscription)
+
+    @property
+    def is_stream_healthy(self):
+        """Return True when /stream/meter is connected and sending data."""
+        return (
+            self.is_receiving_realtime_data
+            and time.monotonic() - self._last_stream_event < STREAM_HEALTHY_AGE
+        )
+
+    def _stream_covered_endpoints(self):
+        """Return the endpoints of which the stream provides all values.
+
+        Coverage is per endpoint: an endpoint is skipped only when all its
+        values come from the stream, so without stream_energy_counters the
+        energy counters keep every endpoint in the regular polling."""
+        if not self.is_metering_enabled or not self.is_stream_healthy:
+            return frozenset()
+
+        covered = STREAM_COVERED_ATTRIBUTES | self.stream_energy_counters
+        return {
+            endpoint
+            for endpoint, attributes in self.data.endpoint_attributes().items()
+            if attributes <= covered
+        }
+
+    def _tier_endpoints(self, endpoints, tier):
+        """Return the endpoints the tier fetches.
+
+        Endpoints whose cache was cleared, after a write to the Envoy, are
+        fetched by the fast tier so the change shows on the next refresh."""
+        tier_endpoints = set()
+        for endpoint in endpoints:
+            settings = self.uri_registry.get(endpoint) or {}
+            if settings.get("tier", TIER_FAST) == tier or (
+                tier == TIER_FAST and settings.get("last_fetch") == 0
+            ):
+                tier_endpoints.add(endpoint)
+        return tier_endpoints
+
+    async def update_endpoints(self, endpoints=None, tier=None):
         """Update one or more endpoints, and set the appropriate class attribute.
 
         If no endpoint provided, then it will determine the endpoints based on the EnvoyData class.
-        If a endpoint is provided, it needs to be a list of registered endpoints"""
+        If a endpoint is provided, it needs to be a list of registered endpoints.
+        If a tier is provided, only the endpoints of that tier are updated."""
         if endpoints is None:
-            endpoints = self.data.required_endpoints | self.required_endpoints
+            background = {
+                endpoint
+                for endpoint, settings in self.uri_registry.items()
+                if settings.get("tier") == TIER_BACKGROUND
+            }
+            if tier == TIER_BACKGROUND:
+                # Left out of the first update, so they are never required
+                endpoints = background
+            else:
+                endpoints = (
+                    self.data.required_endpoints | self.required_endpoints
+                ) - background
+        if tier is not None:
+            endpoints = self._tier_endpoints(endpoints, tier)
 
         _LOGGER.debug("Updating endpoints %s", endpoints)
+        unsupported = self._unsupported_endpoints()
+        stream_covered = self._stream_covered_endpoints()
+        unauthorized = []
+        received_success = False
         for endpoint in endpoints:
             endpoint_settings = self.uri_registry.get(endpoint)
 
@@ -1215,13 +1843,36 @@ class EnvoyReader:
                 )
                 continue
 
+            if unsupported is not None and endpoint in unsupported:
+                if time.time() - unsupported[endpoint]["time"] < (
+                    UNSUPPORTED_ENDPOINT_TTL
+                ):
+                    _LOGGER.debug(
+                        "Skipping endpoint %s, not supported by this Envoy (HTTP %s)",
+                        endpoint,
+                        unsupported[endpoint]["status"],
+                    )
+                    continue
+                self._forget_unsupported_endpoint(endpoint)
+
+            cache_time = endpoint_settings["cache_time"]
+            if endpoint in stream_covered:
+                cache_time = max(cache_time, STREAM_COVERED_CACHE_TIME)
+            if self.adaptive_polling and endpoint in self._adaptive:
+                cache_time = max(cache_time, self._adaptive[endpoint]["interval"])
+
             endpoint_settings.setdefault("last_fetch", 0)
             time_since_last_fetch = time.time() - endpoint_settings["last_fetch"]
-            if time_since_last_fetch > endpoint_settings["cache_time"]:
+            report_pending = time.time() < self._next_report.get(endpoint, 0)
+            fetched = False
+            if time_since_last_fetch > cache_time and not report_pending:
                 _LOGGER.debug(
                     "UPDATING ENDPOINT %s: %s", endpoint, endpoint_settings["url"]
                 )
                 endpoint_settings["last_fetch"] = time.time()
+                # Scheduled again after a successful fetch, without a schedule
+                # a failed endpoint is retried on the next update
+                self._next_report.pop(endpoint, None)
                 await self._update_endpoint(
                     attr=endpoint,
                     url=endpoint_settings["url"],
@@ -1231,21 +1882,88 @@ class EnvoyReader:
                     endpoint,
                     time.time() - endpoint_settings["last_fetch"],
                 )
+
+                status_code = getattr(getattr(self, endpoint), "status_code", None)
+                if status_code == 200:
+                    received_success = True
+                    fetched = True
+                    if self.adaptive_polling:
+                        self._track_endpoint_change(endpoint, getattr(self, endpoint))
+                elif endpoint_settings["optional"] and unsupported is not None:
+                    if status_code == 404:
+                        self._mark_unsupported_endpoint(endpoint, status_code)
+                    elif status_code == 401:
+                        unauthorized.append(endpoint)
             else:
                 _LOGGER.debug(
-                    "Skipping update of %s: last fetch: %s, cache time: %s",
+                    "Skipping update of %s: last fetch: %s, cache time: %s, "
+                    "next report fetch: %s",
                     endpoint,
                     endpoint_settings["last_fetch"],
                     endpoint_settings["cache_time"],
+                    self._next_report.get(endpoint),
                 )
 
             if self.data:
                 self.data.set_endpoint_data(endpoint, getattr(self, endpoint))
+            if fetched and endpoint in REPORT_TIME_FIELDS:
+                self._schedule_report_fetch(endpoint)
+
+        # A 401 only tells something about the endpoint when other endpoints
+        # accepted the same token.
+        if received_success:
+            for endpoint in unauthorized:
+                self._mark_unsupported_endpoint(endpoint, 401)
+
+    def _unsupported_endpoints(self):
+        """Return the endpoints this firmware and token do not support.
+
+        Returns None as long as the firmware version is not known yet."""
+        firmware = self.data.get("envoy_software")
+        if firmware is None:
+            return None
+
+        table = self._store_data.get("unsupported_endpoints")
+        if (
+            table is None
+            or table.get("firmware") != firmware
+            or table.get("token_type") != self.token_type
+        ):
+            table = {
+                "firmware": firmware,
+                "token_type": self.token_type,
+                "endpoints": {},
+            }
+            self._store_data["unsupported_endpoints"] = table
+            self._store_update_pending = True
 
-    async def get_data(self, get_inverters=True):
+        return table["endpoints"]
+
+    def _mark_unsupported_endpoint(self, endpoint, status_code):
+        _LOGGER.debug(
+            "Endpoint %s returned HTTP %s, not requesting it for %s seconds",
+            endpoint,
+            status_code,
+            UNSUPPORTED_ENDPOINT_TTL,
+        )
+        self._store_data["unsupported_endpoints"]["endpoints"][endpoint] = {
+            "status": status_code,
+            "time": time.time(),
+        }
+        self._store_update_pending = True
+
+    def _forget_unsupported_endpoint(self, endpoint):
+        self._store_data["unsupported_endpoints"]["endpoints"].pop(endpoint, None)
+        self._store_update_pending = True
+
+    async def get_data(self, get_inverters=True, tier=None):
         """
         Fetch data from the endpoint and if inverters selected default
         to fetching inverter data.
+
+        With a tier, only the endpoints of that tier are fetched (TIER_FAST,
+        TIER_MEDIUM or TIER_SLOW in ENVOY_ENDPOINTS). The first update always
+        fetches all endpoints, except those of TIER_BACKGROUND.
         """
         await self.init_authentication()
 
@@ -1255,15 +1973,31 @@ class EnvoyReader:
         if not self.get_inverters or not get_inverters:
             return
 
+        if not self.data.initial_update_finished:
+            if tier == TIER_BACKGROUND:
+                return
+            tier = None
+
         # Fetch inverter status and stuff, raise exception if unauthorized.
-        await self.update_endpoints()  # fetch all remaining endpoints
+        await self.update_endpoints(tier=tier)
+
+        if self._model_restored:
+            self._model_restored = False
+            if not self._cached_model_consistent():
+                _LOGGER.info("Cached Envoy model is outdated, detecting model again")
+                self._store_data.pop("model", None)
+                self.endpoint_type = None
+                self.data = EnvoyStandard(self)
+                await self.detect_model()
+                await self.update_endpoints()
 
         # Set boolean that initial update has completed. This will cause
         # the dataclass to all None results, and possibly discarding some
         # endpoints to be polled.
         self.data.initial_update_finished = True
+        self._save_model()
 
-        if self.endpoint_meters.status_code == 401:
+        if self.endpoint_meters is not None and self.endpoint_meters.status_code == 401:
             self.endpoint_meters.raise_for_status()
 
     @property
@@ -1284,7 +2018,11 @@ class EnvoyReader:
     async def detect_model(self):
         """Method to determine if the Envoy supports consumption values or only production."""
         # Fetch required endpoints for model detection
-        await self.update_endpoints(["endpoint_info", "endpoint_meters"])
+        await self.update_endpoints(["endpoint_info"])
+        if self._restore_model():
+            return
+
+        await self.update_endpoints(["endpoint_meters"])
 
         if (
             self.endpoint_info
@@ -1319,9 +2057,90 @@ class EnvoyReader:
                 + "'."
             )
 
+    @property
+    def _model_fingerprint(self):
+        """Settings that influence which endpoints end up being required."""
+        return {
+            "token_type": self.token_type,
+            "device_data_endpoint": self.device_data_endpoint,
+            "disabled_endpoints": sorted(self.disabled_endpoints),
+        }
+
+    def _restore_model(self):
+        """Reuse the model detected on a previous run with the same firmware."""
+        cached = self._store_data.get("model")
+        if not cached:
+            return False
+
+        firmware = self.data.get("envoy_software")
+        data_class = ENVOY_DATA_CLASSES.get(cached.get("data_class"))
+        if firmware is None or firmware != cached.get("firmware") or not data_class:
+            _LOGGER.debug(
+                "Not using cached model %s for firmware %s",
+                cached.get("data_class"),
+                firmware,
+            )
+            return False
+
+        _LOGGER.debug("Using cached model %s", cached["data_class"])
+        self.endpoint_type = cached["endpoint_type"]
+        self.data = data_class(self)
+        if cached.get("fingerprint") == self._model_fingerprint and cached.get(
+            "required_endpoints"
+        ):
+            self.data._required_endpoints = set(cached["required_endpoints"])
+
+        self._model_restored = True
+        return True
+
+    def _save_model(self):
+        model = {
+            "firmware": self.data.get("envoy_software"),
+            "endpoint_type": self.endpoint_type,
+            "data_class": self.data.__class__.__name__,
+            "fingerprint": self._model_fingerprint,
+            "required_endpoints": sorted(self.data.required_endpoints),
+        }
+        if model["firmware"] is None or self._store_data.get("model") == model:
+            return
+
+        self._store_data["model"] = model
+        self._store_update_pending = True
+
+    def _cached_model_consistent(self):
+        """Check the restored model against the data that was just fetched."""
+        imeter = self.data.get("has_integrated_meter")
+        if imeter is not None and (imeter == "true") != (
+            self.endpoint_type == ENVOY_MODEL_M
+        ):
+            return False
+
+        if self.endpoint_meters and self.endpoint_meters.status_code == 200:
+            production_ct = self.data._resolve_path(
+                "endpoint_meters.[?(@.measurementType == 'production' and @.state == 'enabled')]"
+            )
+            if bool(production_ct) != isinstance(self.data, EnvoyMeteredWithCT):
+                return False
+
+        for endpoint in self.data.required_endpoints:
+            response = getattr(self, endpoint, None)
+            if (
+                response is not None
+                and not self.uri_registry[endpoint]["optional"]
+                and response.status_code == 404
+            ):
+                return False
+
+        return True
+
     async def get_full_serial_number(self):
         """Method to get the Envoy serial number.
         Used once upon initialization or upon adding component into homeassistant"""
+        if self.endpoint_info is not None and self.endpoint_info.status_code == 200:
+            # Already fetched info.xml while updating data
+            if serial := self.data.get("serial_number"):
+                return serial
+
         response = await self._async_fetch_with_retry(
             f"https://{self.host}/info.xml",
             follow_redirects=True,
@@ -1401,6 +2220,8 @@ class EnvoyReader:
             }
         )
         await self._async_post(formatted_url, data=enable_dpel_json)
+        # Make sure the next poll will update the endpoint.
+        self._clear_endpoint_cache("endpoint_dpel")
 
     async def disable_dpel(self):
         formatted_url = ENVOY_ENDPOINTS["dpel"]["url"].format(self.host)
@@ -1412,6 +2233,8 @@ class EnvoyReader:
             }
         )
         await self._async_post(formatted_url, data=disable_dpel_json)
+        # Make sure the next poll will update the endpoint.
+        self._clear_endpoint_cache("endpoint_dpel")
 
     async def set_grid_profile(self, profile_id):
         if self.endpoint_installer_agf is not None:
@@ -0,0 +1,379 @@
+"""Processing of the values received from the Envoy /stream/meter endpoint."""
+
+from collections import namedtuple
+import random
+import time
+
+StreamAggregate = namedtuple(
+    "StreamAggregate", ["mean", "minimum", "maximum", "last", "count"]
+)
+
+
+class StreamAggregator:
+    """Aggregates stream values per key over a fixed window.
+
+    Every `add` is one stream event, with only the values that changed: a
+    key that is left out keeps its previous value for that event. The
+    first event after a quiet period is returned right away, events within
+    the window after that are combined and returned when the window ends.
+    Use `remaining` to schedule the trailing `flush`, so the last values of
+    a burst are never lost.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._events = 0
+        # key -> last value, kept between windows
+        self._last = {}
+        # key -> [total, minimum, maximum, event of last change, first event]
+        self._stats = {}
+        self._last_flush = None
+
+    @property
+    def pending(self):
+        """Return True when there are events waiting for the window end."""
+        return self._events > 0
+
+    def remaining(self, now=None):
+        """Return the seconds until the current window ends."""
+        if self._last_flush is None:
+            return 0
+        if now is None:
+            now = time.monotonic()
+        return max(0, self._last_flush + self.window - now)
+
+    def add(self, values, now=None):
+        """Add an event, returns the aggregates when the window has ended."""
+        event = self._events
+        self._events += 1
+        last = self._last
+        stats = self._stats
+        for key, value in values.items():
+            if value is None:
+                continue
+            previous = last.get(key)
+            if (entry := stats.get(key)) is None:
+                # A known key held its previous value since the window start
+                start = 0 if previous is not None else event
+                entry = stats[key] = [0, None, None, start, start]
+            if previous is not None:
+                self._account(entry, previous, event)
+            last[key] = value
+
+        if now is None:
+            now = time.monotonic()
+        if self.remaining(now) == 0:
+            return self.flush(now)
+        return None
+
+    def flush(self, now=None):
+        """Return the aggregates of the events since the last flush."""
+        self._last_flush = time.monotonic() if now is None else now
+        events = self._events
+        if not events:
+            return {}
+
+        result = {}
+        carry = {}
+        for key, entry in self._stats.items():
+            last = self._last[key]
+            self._account(entry, last, events)
+            total, minimum, maximum, _, first = entry
+            result[key] = aggregate = StreamAggregate(
+                total / (events - first), minimum, maximum, last, events - first
+            )
+            if aggregate.mean != last:
+                # Still differs from the reported value, report it next window
+                carry[key] = [0, None, None, 0, 0]
+
+        self._events = 0
+        self._stats = carry
+        return result
+
+    @staticmethod
+    def _account(entry, value, event):
+        """Add the value, held from the last change up to the event."""
+        if (held := event - entry[3]) > 0:
+            entry[0] += value * held
+            if entry[1] is None or value < entry[1]:
+                entry[1] = value
+            if entry[2] is None or value > entry[2]:
+                entry[2] = value
+            entry[3] = event
+
+
+# Value key -> (stream group, stream field), per phase as "{key}_l1"
+STREAM_FIELDS = {
+    "production": ("production", "p"),
+    "consumption": ("total-consumption", "p"),
+    "net_consumption": ("net-consumption", "p"),
+    "voltage": ("production", "v"),
+    "ampere": ("production", "i"),
+    "apparent_power": ("production", "s"),
+    "power_factor": ("production", "pf"),
+    "reactive_power": ("production", "q"),
+    "frequency": ("production", "f"),
+}
+# These are also provided as the sum of all phases
+STREAM_TOTALS = ("production", "consumption", "net_consumption")
+# Stream event phase keys, and the phase names of the values
+STREAM_PHASES = (("ph-a", "l1"), ("ph-b", "l2"), ("ph-c", "l3"))
+
+
+class StreamDispatcher:
+    """Maps stream events to the values of a fixed set of keys.
+
+    The keys are compiled once into a table of stream fields, keys the
+    stream does not provide are ignored. `dispatch` reads only those fields
+    from the decoded event and returns the values that changed.
+    """
+
+    def __init__(self, keys, process_production=None):
+        wanted = set(keys)
+        # (key, group, phase, field, is production, report the change)
+        self._fields = []
+        # total key -> [phase keys]
+        self._totals = {}
+        self._process_production = process_production
+        self.values = {}
+
+        for prefix, (group, field) in STREAM_FIELDS.items():
+            is_total = prefix in STREAM_TOTALS and prefix in wanted
+            phase_keys = []
+            for phase_key, phase in STREAM_PHASES:
+                key = f"{prefix}_{phase}"
+                if key in wanted or is_total:
+                    self._fields.append(
+                        (
+                            key,
+                            group,
+                            phase_key,
+                            field,
+                            prefix == "production",
+                            key in wanted,
+                        )
+                    )
+                    phase_keys.append(key)
+            if is_total:
+                self._totals[prefix] = phase_keys
+
+        self.keys = frozenset(
+            [field[0] for field in self._fields if field[5]] + list(self._totals)
+        )
+
+    def dispatch(self, data):
+        """Return the changed values of a decoded stream event."""
+        values = self.values
+        changes = {}
+        changed_phases = False
+        for key, group, phase_key, field, is_production, report in self._fields:
+            phase_data = (data.get(group) or {}).get(phase_key)
+            if not phase_data or (value := phase_data.get(field)) is None:
+                continue
+            if is_production and self._process_production:
+                value = self._process_production(value)
+            if values.get(key) != value:
+                values[key] = value
+                changed_phases = True
+                if report:
+                    changes[key] = value
+
+        if changed_phases:
+            for key, phase_keys in self._totals.items():
+                total = sum(values.get(phase_key) or 0 for phase_key in phase_keys)
+                if values.get(key) != total:
+                    values[key] = total
+                    changes[key] = total
+
+        return changes
+
+
+def _energy_counters():
+    counters = {}
+    for suffix in ("", "_l1", "_l2", "_l3"):
+        for counter in ("daily_production", "lifetime_production"):
+            counters[counter + suffix] = ("production" + suffix, 1)
+        for counter in ("daily_consumption", "lifetime_consumption"):
+            counters[counter + suffix] = ("consumption" + suffix, 1)
+        # Net consumption counters only increase, import and export are
+        # counted separately.
+        counters["lifetime_net_consumption" + suffix] = ("net_consumption" + suffix, 1)
+        counters["lifetime_net_production" + suffix] = ("net_consumption" + suffix, -1)
+    return counters
+
+
+# Energy counter key -> (stream power key, sign of the power that is counted)
+ENERGY_COUNTERS = _energy_counters()
+
+
+class EnergyIntegrator:
+    """Advances energy counters between polls by integrating stream power.
+
+    Power samples are integrated with the trapezoidal rule, gaps longer
+    than `max_gap` seconds are not integrated. Each poll `resync` resets
+    the counters to the values reported by the Envoy. When the estimate
+    ran ahead of the Envoy by at most `max_drift` of the energy integrated
+    since the previous poll, the estimate is held until the Envoy passes
+    it, so the counters never decrease. A larger difference, like the
+    daily reset, is taken over as is. An unchanged polled value, from an
+    endpoint that was not fetched again, does not reset the estimate.
+    """
+
+    def __init__(self, counters=ENERGY_COUNTERS, max_gap=30, max_drift=0.25):
+        self.counters = counters
+        self.max_gap = max_gap
+        self.max_drift = max_drift
+        self.power_keys = frozenset(key for key, _ in counters.values())
+        # power key -> (time, watts)
+        self._samples = {}
+        # counter key -> [polled value, integrated Wh since poll, floor]
+        self._state = {}
+
+    def add(self, values, now=None):
+        """Integrate the power values, returns the estimated counters."""
+        if now is None:
+            now = time.monotonic()
+
+        intervals = {}
+        for power_key in self.power_keys:
+            if (watts := values.get(power_key)) is None:
+                continue
+            previous = self._samples.get(power_key)
+            self._samples[power_key] = (now, watts)
+            if previous is not None and 0 < now - previous[0] <= self.max_gap:
+                intervals[power_key] = (previous[1], watts, now - previous[0])
+
+        result = {}
+        for counter, (power_key, sign) in self.counters.items():
+            if (state := self._state.get(counter)) is None:
+                continue
+            if (interval := intervals.get(power_key)) is not None:
+                start, end, seconds = interval
+                state[1] += (
+                    (max(sign * start, 0) + max(sign * end, 0)) / 2 * seconds / 3600
+                )
+            result[counter] = self._value(state)
+        return result
+
+    def resync(self, values):
+        """Take over the polled counters, returns the values to report."""
+        result = {}
+        for counter in self.counters:
+            if (value := values.get(counter)) is None:
+                continue
+            if (state := self._state.get(counter)) is None:
+                self._state[counter] = [value, 0.0, None]
+                result[counter] = value
+                continue
+            if value == state[0]:
+                # Not updated by the Envoy since the previous poll
+                result[counter] = self._value(state)
+                continue
+
+            ahead = self._value(state) - value
+            if 0 < ahead <= max(1.0, state[1] * self.max_drift):
+                state[:] = [value, 0.0, value + ahead]
+            else:
+                state[:] = [value, 0.0, None]
+            result[counter] = self._value(state)
+        return result
+
+    @staticmethod
+    def _value(state):
+        value = state[0] + state[1]
+        if state[2] is not None:
+            if value < state[2]:
+                return state[2]
+            state[2] = None
+        return value
+
+
+class StreamReconnectPolicy:
+    """Decides how long to wait before reconnecting to the stream.
+
+    After a clean close of a connection that was up for at least
+    `min_uptime` seconds, the stream is reconnected right away. Errors and
+    connections closed sooner back off exponentially from `initial` up to `maximum` seconds,
+    with up to `jitter` of the delay randomly taken off.
+    """
+
+    def __init__(
+        self, initial=1, maximum=300, factor=2, jitter=0.2, min_uptime=10, rng=None
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.min_uptime = min_uptime
+        self._random = rng or random.random
+
+        self.connects = 0
+        self.disconnects = 0
+        self.failures = 0
+        self.delay = 0
+        self._attempt = 0
+        self._connected_at = None
+        self._disconnected_at = None
+        self._downtime = 0.0
+        self._last_connect = None
+        self._last_disconnect = None
+
+    @property
+    def is_connected(self):
+        return self._connected_at is not None
+
+    def connected(self, now=None):
+        """Register that the stream is connected and receiving data."""
+        if now is None:
+            now = time.monotonic()
+        if self._disconnected_at is not None:
+            self._downtime += now - self._disconnected_at
+            self._disconnected_at = None
+        self._connected_at = now
+        self._last_connect = time.time()
+        self.connects += 1
+
+    def disconnected(self, clean, now=None):
+        """Register the end of a connection attempt, returns the delay."""
+        if now is None:
+            now = time.monotonic()
+        connected_at = self._connected_at
+        if connected_at is not None:
+            self.disconnects += 1
+            self._connected_at = None
+            self._disconnected_at = now
+            self._last_disconnect = time.time()
+        elif self._disconnected_at is None:
+            # Never connected yet, count the downtime from the first attempt
+            self._disconnected_at = now
+
+        if connected_at is not None and now - connected_at >= self.min_uptime:
+            # The connection was stable, start backing off from the beginning
+            self._attempt = 0
+            if clean:
+                self.delay = 0
+                return self.delay
+
+        self.failures += 1
+        self._attempt += 1
+        delay = min(self.maximum, self.initial * self.factor ** (self._attempt - 1))
+        self.delay = delay * (1 - self.jitter * self._random())
+        return self.delay
+
+    def diagnostics(self, now=None):
+        """Return the connection statistics."""
+        if now is None:
+            now = time.monotonic()
+        downtime = self._downtime
+        if self._disconnected_at is not None:
+            downtime += now - self._disconnected_at
+        return {
+            "connected": self.is_connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "failed_attempts": self.failures,
+            "downtime": round(downtime, 1),
+            "reconnect_delay": round(self.delay, 1),
+            "last_connect": self._last_connect,
+            "last_disconnect": self._last_disconnect,
+        }
@@ -6,18 +6,21 @@ ENVOY_ENDPOINTS = {
         "cache": 20,
         "installer_required": False,
         "optional": False,
+        "tier": "slow",
     },
     "peb_newscan": {
         "url": TEST_DATA + "endpoint_peb_newscan.json",
         "cache": 3600,
         "installer_required": True,
         "optional": True,
+        "tier": "slow",
     },
     "dpel": {
         "url": TEST_DATA + "endpoint_dpel.json",
         "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "fast",
     },
     # Production/consumption endpoints
     "production_json": {
@@ -25,36 +28,42 @@ ENVOY_ENDPOINTS = {
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "production_v1": {
         "url": TEST_DATA + "endpoint_production_v1.json",
         "cache": 20,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "production_inverters": {
         "url": TEST_DATA + "endpoint_production_inverters.json",
         "cache": 20,
         "installer_required": False,
         "optional": False,
+        "tier": "medium",
     },
     "production_report": {
         "url": TEST_DATA + "endpoint_production_report.json",
         "cache": 0,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "production_power": {
         "url": TEST_DATA + "endpoint_production_power.json",
         "cache": 20,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     "pdm_energy": {
         "url": TEST_DATA + "endpoint_pdm_energy.json",
         "cache": 20,
         "installer_required": True,
         "optional": False,
+        "tier": "fast",
     },
     # Battery endpoints
     "ensemble_inventory": {
@@ -62,18 +71,21 @@ ENVOY_ENDPOINTS = {
         "cache": 20,
         "installer_required": False,
         "optional": True,
+        "tier": "medium",
     },
     "ensemble_secctrl": {
         "url": TEST_DATA + "endpoint_ensemble_secctrl.json",
         "cache": 20,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     "ensemble_power": {
         "url": TEST_DATA + "endpoint_ensemble_power.json",
         "cache": 20,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     # Inverter endpoints
     "inventory": {
@@ -81,36 +93,43 @@ ENVOY_ENDPOINTS = {
         "cache": 300,
         "installer_required": False,
         "optional": False,
+        "tier": "fast",
     },
     "device_data": {
         "url": TEST_DATA + "endpoint_device_data.json",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "medium",
     },
     "devstatus": {
         "url": TEST_DATA + "endpoint_devstatus.json",
         "cache": 20,
         "installer_required": True,
         "optional": False,
+        "tier": "medium",
     },
     "pcu_comm_check": {
         "url": TEST_DATA + "endpoint_pcu_comm_check.json",
-        "cache": 90,
+        "cache": 0,
         "installer_required": True,
         "optional": True,
+        "tier": "background",
+        "timeout": 300,
     },
     "meters": {
         "url": TEST_DATA + "endpoint_meters.json",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "slow",
     },
     "meters_readings": {
         "url": TEST_DATA + "endpoint_meters_readings.json",
         "cache": 0,
         "installer_required": False,
         "optional": True,
+        "tier": "fast",
     },
     # Netprofile endpoints
     "installer_agf": {
@@ -118,6 +137,7 @@ ENVOY_ENDPOINTS = {
         "cache": 10,
         "installer_required": True,
         "optional": True,
+        "tier": "slow",
     },
     # Tariff endpoints
     "admin_tariff": {
@@ -125,6 +145,7 @@ ENVOY_ENDPOINTS = {
         "cache": 10,
         "installer_required": False,
         "optional": True,
+        "tier": "slow",
     },
 }
 
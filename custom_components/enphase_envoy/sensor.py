@@ -2,13 +2,12 @@
 
 from __future__ import annotations
 
-import datetime
 import logging
 
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
@@ -22,11 +21,25 @@ from .const import (
     PHASE_SENSORS,
     LIVE_UPDATEABLE_ENTITIES,
     ENABLE_ADDITIONAL_METRICS,
+    DEFAULT_DEADBAND_RELATIVE,
+    DEFAULT_DEADBAND_MAX_SILENCE,
     ADDITIONAL_METRICS,
     BATTERY_STATE_MAPPING,
     resolve_hardware_id,
     get_model_name,
 )
+from .deadband import Deadband, create_deadband
+from .device_descriptions import (
+    SENSOR_DEVICE_RULES,
+    DeviceDescriptions,
+    battery_accessor,
+    device_value,
+    entity_context,
+    inverter_accessor,
+    relay_accessor,
+    utc_timestamp,
+)
+from .envoy_stream import ENERGY_COUNTERS
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -45,190 +58,68 @@ async def async_setup_entry(
     name = data[NAME]
     live_entities = data[LIVE_UPDATEABLE_ENTITIES]
     options = config_entry.options
-
-    entities = []
-    _LOGGER.debug("Setting up Sensors")
-    for sensor_description in SENSORS:
-        if not options.get(ENABLE_ADDITIONAL_METRICS, False):
-            if sensor_description.key in ADDITIONAL_METRICS:
+    stream_updateable_keys = STREAM_UPDATEABLE_KEYS
+    if options.get("realtime_energy_counters", False):
+        stream_updateable_keys = stream_updateable_keys | ENERGY_COUNTERS.keys()
+
+    descriptions = SENSORS
+    if not options.get(ENABLE_ADDITIONAL_METRICS, False):
+        descriptions = [d for d in SENSORS if d.key not in ADDITIONAL_METRICS]
+    registry = DeviceDescriptions(descriptions, SENSOR_DEVICE_RULES)
+
+    # Device family -> (entity class, device name prefix)
+    device_entities = {
+        "inverter": (EnvoyInverterEntity, "Inverter"),
+        "inverter_signal": (EnvoyInverterSignalEntity, "Inverter"),
+        "relay": (EnvoyRelayEntity, "Relay"),
+        "relay_signal": (EnvoyRelaySignalEntity, "Relay"),
+        "battery": (EnvoyBatteryEntity, "Battery"),
+        "battery_firmware": (EnvoyBatteryFirmwareEntity, "Battery"),
+    }
+
+    # (serial number, description key) of the device entities set up
+    device_entity_keys = set()
+
+    def new_device_entities():
+        entities = []
+        for family, serial_number, sensor_description in registry.entities(
+            coordinator.data
+        ):
+            key = sensor_description.key
+            if (serial_number, key) in device_entity_keys:
                 continue
-        if sensor_description.key == "inverter_pcu_communication_level":
-            if coordinator.data.get("pcu_availability"):
-                for serial_number in coordinator.data["inverter_device_data"]:
-                    device_name = f"Inverter {serial_number}"
-                    entities.append(
-                        EnvoyInverterSignalEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
-
-        elif sensor_description.key == "relay_pcu_communication_level":
-            if coordinator.data.get("relay_device_data") and coordinator.data.get(
-                "pcu_availability"
-            ):
-                for serial_number in coordinator.data["relay_device_data"].keys():
-                    device_name = f"Relay {serial_number}"
-                    entities.append(
-                        EnvoyRelaySignalEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
-
-        elif sensor_description.key == "inverter_data_watts":
-            if coordinator.data.get("inverter_production"):
-                for inverter in coordinator.data["inverter_production"].keys():
-                    device_name = f"Inverter {inverter}"
-                    serial_number = inverter
-                    entities.append(
-                        EnvoyInverterEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
-
-        elif sensor_description.key.startswith("inverter_data_"):
-            if coordinator.data.get("inverter_device_data"):
-                for inverter in coordinator.data["inverter_device_data"].keys():
-                    if (
-                        coordinator.data["inverter_device_data"][inverter].get(
-                            sensor_description.key[14:]
-                        )
-                        is not None
-                    ):
-                        device_name = f"Inverter {inverter}"
-                        serial_number = inverter
-                        entities.append(
-                            EnvoyInverterEntity(
-                                description=sensor_description,
-                                name=f"{device_name} {sensor_description.name}",
-                                device_name=device_name,
-                                device_serial_number=serial_number,
-                                serial_number=None,
-                                coordinator=coordinator,
-                                parent_device=config_entry.unique_id,
-                            )
-                        )
-
-        elif sensor_description.key.startswith("inverter_info_"):
-            if coordinator.data.get("inverter_info"):
-                for inverter in coordinator.data["inverter_info"].keys():
-                    device_name = f"Inverter {inverter}"
-                    serial_number = inverter
-                    entities.append(
-                        EnvoyInverterEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
-
-        elif sensor_description.key.startswith("relay_data_"):
-            if coordinator.data.get("relay_device_data"):
-                for relay in coordinator.data["relay_device_data"].keys():
-                    if (
-                        coordinator.data["relay_device_data"][relay].get(
-                            sensor_description.key[11:]
-                        )
-                        is not None
-                    ):
-                        device_name = f"Relay {relay}"
-                        serial_number = relay
-
-                        if sensor_description.key.endswith(("l1", "l2", "l3")):
-                            line = sensor_description.key[-2:].replace("l", "line")
-                            line_connected = (
-                                coordinator.data.get("relay_info", {})
-                                .get(relay, {})
-                                .get(f"{line}-connected")
-                            )
-                            if line_connected is False:
-                                continue
-
-                        entities.append(
-                            EnvoyRelayEntity(
-                                description=sensor_description,
-                                name=f"{device_name} {sensor_description.name}",
-                                device_name=device_name,
-                                device_serial_number=serial_number,
-                                serial_number=None,
-                                coordinator=coordinator,
-                                parent_device=config_entry.unique_id,
-                            )
-                        )
-
-        elif sensor_description.key.startswith("relay_info_"):
-            if coordinator.data.get("relay_info"):
-                for relay in coordinator.data["relay_info"].keys():
-                    device_name = f"Relay {relay}"
-                    serial_number = relay
-                    entities.append(
-                        EnvoyRelayEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
-
-        elif sensor_description.key == "batteries_software":
-            if coordinator.data.get("batteries"):
-                for battery in coordinator.data["batteries"].keys():
-                    device_name = f"Battery {battery}"
-                    serial_number = battery
-                    entities.append(
-                        EnvoyBatteryFirmwareEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
+            device_entity_keys.add((serial_number, key))
+
+            if key.startswith("relay_data_") and key.endswith(("l1", "l2", "l3")):
+                line = key[-2:].replace("l", "line")
+                line_connected = (
+                    coordinator.data.get("relay_info", {})
+                    .get(serial_number, {})
+                    .get(f"{line}-connected")
+                )
+                if line_connected is False:
+                    continue
+
+            entity_class, device_type = device_entities[family]
+            device_name = f"{device_type} {serial_number}"
+            entities.append(
+                entity_class(
+                    description=sensor_description,
+                    name=f"{device_name} {sensor_description.name}",
+                    device_name=device_name,
+                    device_serial_number=serial_number,
+                    serial_number=None,
+                    coordinator=coordinator,
+                    parent_device=config_entry.unique_id,
+                )
+            )
+        return entities
 
-        elif sensor_description.key.startswith("batteries_"):
-            if coordinator.data.get("batteries"):
-                for battery in coordinator.data["batteries"].keys():
-                    device_name = f"Battery {battery}"
-                    serial_number = battery
-                    entities.append(
-                        EnvoyBatteryEntity(
-                            description=sensor_description,
-                            name=f"{device_name} {sensor_description.name}",
-                            device_name=device_name,
-                            device_serial_number=serial_number,
-                            serial_number=None,
-                            coordinator=coordinator,
-                            parent_device=config_entry.unique_id,
-                        )
-                    )
+    _LOGGER.debug("Setting up Sensors")
+    entities = new_device_entities()
 
-        elif sensor_description.key.startswith("agg_batteries_"):
+    for sensor_description in registry.other:
+        if sensor_description.key.startswith("agg_batteries_"):
             if coordinator.data.get("batteries"):
                 entities.append(
                     CoordinatedEnvoyEntity(
@@ -256,7 +147,7 @@ async def async_setup_entry(
                 coordinator=coordinator,
                 device_host=config_entry.data[CONF_HOST],
             )
-            if sensor_description.key in STREAM_UPDATEABLE_KEYS:
+            if sensor_description.key in stream_updateable_keys:
                 live_entities[sensor_description.key] = entity
             entities.append(entity)
 
@@ -280,7 +171,47 @@ async def async_setup_entry(
         )
         entities.append(live_entities[sensor_description.key])
 
-    async_add_entities(entities)
+    def add_entities(entities):
+        if options.get("deadband_enabled", False):
+            relative = options.get("deadband_relative", DEFAULT_DEADBAND_RELATIVE) / 100
+            max_silence = options.get(
+                "deadband_max_silence", DEFAULT_DEADBAND_MAX_SILENCE
+            )
+            for entity in entities:
+                entity.deadband = create_deadband(
+                    entity.entity_description.device_class, relative, max_silence
+                )
+
+        async_add_entities(entities)
+
+    add_entities(entities)
+
+    @callback
+    def async_add_signal_entities() -> None:
+        """Add the signal sensors once the background pcu_comm_check reported."""
+        if entities := new_device_entities():
+            add_entities(entities)
+
+    if options.get("enable_pcu_comm_check", False):
+        config_entry.async_on_unload(
+            coordinator.async_add_listener(
+                async_add_signal_entities, frozenset(["pcu_availability"])
+            )
+        )
+
+
+class DeadbandMixin:
+    """Skips state writes for insignificant changes of the value."""
+
+    deadband: Deadband | None = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self.deadband is None or self.deadband.significant(
+            self.native_value,
+            available=self.available and self.coordinator.last_update_success,
+        ):
+            super()._handle_coordinator_update()
 
 
 class EnvoyEntity(SensorEntity):
@@ -320,7 +251,7 @@ class EnvoyEntity(SensorEntity):
         return None
 
 
-class CoordinatedEnvoyEntity(EnvoyEntity, CoordinatorEntity):
+class CoordinatedEnvoyEntity(DeadbandMixin, EnvoyEntity, CoordinatorEntity):
     def __init__(
         self,
         description,
@@ -334,7 +265,7 @@ class CoordinatedEnvoyEntity(EnvoyEntity, CoordinatorEntity):
         EnvoyEntity.__init__(
             self, description, name, device_name, device_serial_number, serial_number
         )
-        CoordinatorEntity.__init__(self, coordinator)
+        CoordinatorEntity.__init__(self, coordinator, entity_context(description.key))
         self.device_host = device_host
 
     @property
@@ -348,9 +279,18 @@ class CoordinatedEnvoyEntity(EnvoyEntity, CoordinatorEntity):
         if not self._device_serial_number:
             return None
 
-        sw_version = self.coordinator.data.get("envoy_info", {}).get("software")
-        hw_version = self.coordinator.data.get("envoy_info", {}).get("pn")
-        model = self.coordinator.data.get("envoy_info", {}).get("model", "Standard")
+        info = self.coordinator.data.get("envoy_info") or {}
+        return self.coordinator.cached_device_info(
+            (CoordinatedEnvoyEntity, self._device_serial_number),
+            (info.get("software"), info.get("pn"), info.get("model")),
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
+        sw_version = info.get("software")
+        hw_version = info.get("pn")
+        model = info.get("model", "Standard")
 
         device_host = self.device_host
         if is_ipv6_address(self.device_host):
@@ -368,7 +308,7 @@ class CoordinatedEnvoyEntity(EnvoyEntity, CoordinatorEntity):
         )
 
 
-class EnvoyDeviceEntity(CoordinatorEntity, SensorEntity):
+class EnvoyDeviceEntity(DeadbandMixin, CoordinatorEntity, SensorEntity):
     def __init__(
         self,
         description,
@@ -385,7 +325,19 @@ class EnvoyDeviceEntity(CoordinatorEntity, SensorEntity):
         self._device_name = device_name
         self._device_serial_number = device_serial_number
         self._parent_device = parent_device
-        CoordinatorEntity.__init__(self, coordinator)
+        self._resolve_accessor(description.key)
+        CoordinatorEntity.__init__(
+            self, coordinator, entity_context(description.key, device_serial_number)
+        )
+
+    def _resolve_accessor(self, key):
+        """Resolve where the value of the entity description key is read."""
+
+    def _device_data(self, data_key):
+        """Return the data of this device from a per device value."""
+        if devices := self.coordinator.data.get(data_key):
+            return devices.get(self._device_serial_number)
+        return None
 
     @property
     def name(self):
@@ -402,85 +354,24 @@ class EnvoyDeviceEntity(CoordinatorEntity, SensorEntity):
 
 
 class EnvoyInverterEntity(EnvoyDeviceEntity):
+    def _resolve_accessor(self, key):
+        self._accessor = inverter_accessor(key, self.entity_description.retain)
+
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        if self.entity_description.key == "inverter_data_watts":
-            if self.coordinator.data.get("inverter_production"):
-                return (
-                    self.coordinator.data.get("inverter_production")
-                    .get(self._device_serial_number)
-                    .get("lastReportWatts")
-                )
-        elif self.entity_description.key.startswith("inverter_data_"):
-            if self.coordinator.data.get("inverter_device_data"):
-                value = (
-                    self.coordinator.data.get("inverter_device_data")
-                    .get(self._device_serial_number)
-                    .get(self.entity_description.key[14:])
-                )
-                if self.entity_description.key.endswith("last_reading"):
-                    return datetime.datetime.fromtimestamp(
-                        int(value), tz=datetime.timezone.utc
-                    )
-                if (
-                    self.coordinator.data.get("inverter_device_data")
-                    .get(self._device_serial_number)
-                    .get("gone")
-                    and not self.entity_description.retain
-                ):
-                    return None
-                return value
-        elif self.entity_description.key.startswith("inverter_info_"):
-            if self.coordinator.data.get("inverter_info"):
-                return (
-                    self.coordinator.data.get("inverter_info")
-                    .get(self._device_serial_number)
-                    .get(self.entity_description.key[14:])
-                )
-
-        return None
+        if (device := self._device_data(self._accessor.data_key)) is None:
+            return None
+        return device_value(self._accessor, device)
 
     @property
     def extra_state_attributes(self):
         """Return the state attributes."""
+        if (device := self._device_data(self._accessor.data_key)) is None:
+            return None
+        reported = device.get(self._accessor.reported_field)
         try:
-            if self.entity_description.key == "inverter_data_watts":
-                if self.coordinator.data.get("inverter_production"):
-                    value = (
-                        self.coordinator.data.get("inverter_production")
-                        .get(self._device_serial_number)
-                        .get("lastReportDate")
-                    )
-                    return {
-                        "last_reported": datetime.datetime.fromtimestamp(
-                            int(value), tz=datetime.timezone.utc
-                        )
-                    }
-            elif self.entity_description.key.startswith("inverter_info_"):
-                if self.coordinator.data.get("inverter_info"):
-                    value = (
-                        self.coordinator.data.get("inverter_info")
-                        .get(self._device_serial_number)
-                        .get("last_rpt_date")
-                    )
-                    return {
-                        "last_reported": datetime.datetime.fromtimestamp(
-                            int(value), tz=datetime.timezone.utc
-                        )
-                    }
-            elif self.entity_description.key.startswith("inverter_data_"):
-                if self.coordinator.data.get("inverter_device_data"):
-                    value = (
-                        self.coordinator.data.get("inverter_device_data")
-                        .get(self._device_serial_number)
-                        .get("last_reading")
-                    )
-                    return {
-                        "last_reported": datetime.datetime.fromtimestamp(
-                            int(value), tz=datetime.timezone.utc
-                        )
-                    }
+            return {"last_reported": utc_timestamp(reported)}
         except (ValueError, TypeError):
             return None
 
@@ -489,23 +380,22 @@ class EnvoyInverterEntity(EnvoyDeviceEntity):
         """Return the device_info of the device."""
         if not self._device_serial_number:
             return None
+
+        info = self._device_data("inverter_info") or {}
+        return self.coordinator.cached_device_info(
+            (EnvoyInverterEntity, self._device_serial_number),
+            (info.get("img_pnum_running"), info.get("part_num")),
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
         device_info_kw = {}
         if self._parent_device:
             device_info_kw["via_device"] = (DOMAIN, self._parent_device)
 
-        if self.coordinator.data.get("inverter_info") and self.coordinator.data.get(
-            "inverter_info"
-        ).get(self._device_serial_number):
-            device_info_kw["sw_version"] = (
-                self.coordinator.data.get("inverter_info")
-                .get(self._device_serial_number)
-                .get("img_pnum_running")
-            )
-            device_info_kw["hw_version"] = (
-                self.coordinator.data.get("inverter_info")
-                .get(self._device_serial_number)
-                .get("part_num")
-            )
+        device_info_kw["sw_version"] = info.get("img_pnum_running")
+        device_info_kw["hw_version"] = info.get("part_num")
         model_name = get_model_name("Inverter", device_info_kw["hw_version"])
 
         return DeviceInfo(
@@ -519,69 +409,42 @@ class EnvoyInverterEntity(EnvoyDeviceEntity):
 
 
 class EnvoyRelayEntity(EnvoyDeviceEntity):
+    def _resolve_accessor(self, key):
+        self._accessor = relay_accessor(key)
+
     @property
     def native_value(self):
-        if self.entity_description.key.startswith("relay_data_"):
-            if self.coordinator.data.get("relay_device_data"):
-                serial = self.coordinator.data.get("relay_device_data").get(
-                    self._device_serial_number
-                )
-                value = serial.get(self.entity_description.key[11:])
-                if self.entity_description.key.endswith("last_reading"):
-                    return datetime.datetime.fromtimestamp(
-                        int(value), tz=datetime.timezone.utc
-                    )
-                if serial.get("gone", True):
-                    return None
-                return value
-        elif self.entity_description.key.startswith("relay_info_"):
-            if self.coordinator.data.get("relay_info"):
-                return (
-                    self.coordinator.data.get("relay_info")
-                    .get(self._device_serial_number)
-                    .get(self.entity_description.key[11:])
-                )
+        if (device := self._device_data(self._accessor.data_key)) is None:
+            return None
+        return device_value(self._accessor, device)
 
     @property
     def extra_state_attributes(self):
         """Return the state attributes."""
-        if self.entity_description.key.startswith("relay_data_"):
-            if self.coordinator.data.get("relay_device_data"):
-                value = (
-                    self.coordinator.data.get("relay_device_data")
-                    .get(self._device_serial_number)
-                    .get("last_reading")
-                )
-                return {
-                    "last_reported": datetime.datetime.fromtimestamp(
-                        int(value), tz=datetime.timezone.utc
-                    )
-                }
-        elif self.entity_description.key.startswith("relay_info_"):
-            if self.coordinator.data.get("relay_info"):
-                value = (
-                    self.coordinator.data.get("relay_info")
-                    .get(self._device_serial_number)
-                    .get("last_rpt_date")
-                )
-                return {
-                    "last_reported": datetime.datetime.fromtimestamp(
-                        int(value), tz=datetime.timezone.utc
-                    )
-                }
+        if (device := self._device_data(self._accessor.data_key)) is None:
+            return None
+        reported = device.get(self._accessor.reported_field)
+        return {"last_reported": utc_timestamp(reported)}
 
     @property
     def device_info(self) -> DeviceInfo | None:
         """Return the device_info of the device."""
         if not self._device_serial_number:
             return None
+
+        info = self._device_data("relay_info") or {}
+        return self.coordinator.cached_device_info(
+            (EnvoyRelayEntity, self._device_serial_number),
+            (info.get("img_pnum_running"), info.get("part_num")),
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
         device_info_kw = {}
         if self._parent_device:
             device_info_kw["via_device"] = (DOMAIN, self._parent_device)
 
-        info = self.coordinator.data.get("relay_info", {}).get(
-            self._device_serial_number, {}
-        )
         device_info_kw["sw_version"] = info.get("img_pnum_running", None)
         device_info_kw["hw_version"] = resolve_hardware_id(info.get("part_num", None))
         model_name = get_model_name("Relay", info.get("part_num", None))
@@ -632,42 +495,24 @@ class EnvoyRelaySignalEntity(EnvoySignalEntity, EnvoyRelayEntity):
 class EnvoyBatteryEntity(EnvoyDeviceEntity):
     """Envoy battery entity."""
 
+    def _resolve_accessor(self, key):
+        self._accessor = battery_accessor(key, BATTERY_STATE_MAPPING)
+
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        if self.coordinator.data.get("batteries"):
-            if self.entity_description.key == "batteries_power":
-                return int(
-                    self.coordinator.data.get("batteries_power")
-                    .get(self._device_serial_number)
-                    .get("real_power_mw")
-                    / 1000
-                )
-            elif self.entity_description.key == "batteries_led_status":
-                return BATTERY_STATE_MAPPING.get(
-                    self.coordinator.data.get("batteries")
-                    .get(self._device_serial_number)
-                    .get("led_status")
-                )
-            else:
-                return (
-                    self.coordinator.data.get("batteries")
-                    .get(self._device_serial_number)
-                    .get(self.entity_description.key[10:])
-                )
-
-        return None
+        if not self.coordinator.data.get("batteries"):
+            return None
+        if (device := self._device_data(self._accessor.data_key)) is None:
+            return None
+        return device_value(self._accessor, device)
 
     @property
     def extra_state_attributes(self):
         """Return the state attributes."""
-        if self.coordinator.data.get("batteries"):
-            battery = self.coordinator.data.get("batteries").get(
-                self._device_serial_number
-            )
-            return {"last_reported": battery.get("report_date")}
-
-        return None
+        if (battery := self._device_data("batteries")) is None:
+            return None
+        return {"last_reported": battery.get("report_date")}
 
     @property
     def device_info(self) -> DeviceInfo | None:
@@ -675,21 +520,17 @@ class EnvoyBatteryEntity(EnvoyDeviceEntity):
         if not self._device_serial_number:
             return None
 
-        sw_version = None
-        hw_version = None
-        if self.coordinator.data.get("batteries") and self.coordinator.data.get(
-            "batteries"
-        ).get(self._device_serial_number):
-            sw_version = (
-                self.coordinator.data.get("batteries")
-                .get(self._device_serial_number)
-                .get("img_pnum_running")
-            )
-            hw_version = (
-                self.coordinator.data.get("batteries")
-                .get(self._device_serial_number)
-                .get("part_num")
-            )
+        info = self._device_data("batteries") or {}
+        return self.coordinator.cached_device_info(
+            (EnvoyBatteryEntity, self._device_serial_number),
+            (info.get("img_pnum_running"), info.get("part_num")),
+            self._create_device_info,
+            info,
+        )
+
+    def _create_device_info(self, info) -> DeviceInfo:
+        sw_version = info.get("img_pnum_running")
+        hw_version = info.get("part_num")
 
         return DeviceInfo(
             identifiers={(DOMAIN, str(self._device_serial_number))},
@@ -704,13 +545,4 @@ class EnvoyBatteryEntity(EnvoyDeviceEntity):
 
 
 class EnvoyBatteryFirmwareEntity(EnvoyBatteryEntity):
-    @property
-    def native_value(self) -> str:
-        if self.coordinator.data.get("batteries") and self.coordinator.data.get(
-            "batteries"
-        ).get(self._device_serial_number):
-            return (
-                self.coordinator.data.get("batteries")
-                .get(self._device_serial_number)
-                .get("img_pnum_running")
-            )
+    pass
@@ -0,0 +1,60 @@
+"""Persisted copy of the coordinator data, to set up entities right away.
+
+On setup a recent snapshot is used as the coordinator data, so the
+entities are available before the Envoy answered. The first live update
+then runs in the background and replaces it.
+"""
+
+import time
+
+
+def create_snapshot(data, value_times, now=None):
+    """Return a compact copy of the data, with the time of each value.
+
+    `value_times` holds the time each value was received from the Envoy.
+    """
+    if now is None:
+        now = time.time()
+
+    values = {key: value for key, value in data.items() if value not in (None, [], {})}
+    return {
+        "time": now,
+        "data": values,
+        "times": {key: round(value_times[key]) for key in values if key in value_times},
+    }
+
+
+def snapshot_age(snapshot, now=None):
+    """Return the age of the newest value in the snapshot, in seconds.
+
+    Snapshots keep being saved while the Envoy is unreachable, the time of
+    the values tells how old the data is.
+    """
+    if now is None:
+        now = time.time()
+    times = snapshot.get("times")
+    return now - (max(times.values()) if times else snapshot["time"])
+
+
+def restore_snapshot(snapshot, max_age, now=None):
+    """Return the data of the snapshot, None when older than max_age."""
+    if not snapshot or not snapshot.get("data"):
+        return None
+    if snapshot_age(snapshot, now) >= max_age:
+        return None
+    return snapshot["data"]
+
+
+async def async_replace_snapshot(first_update, set_data, set_error):
+    """Run the first live update, return True when it replaced the snapshot.
+
+    A failure is passed on to set_error, the scheduled refreshes retry it.
+    """
+    try:
+        data = await first_update()
+    except Exception as err:  # pylint: disable=broad-except
+        set_error(err)
+        return False
+
+    set_data(data)
+    return True
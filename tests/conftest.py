@@ -1,14 +1,68 @@
+import importlib.util
 import os
-from unittest.mock import AsyncMock
+import sys
+from types import ModuleType
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+PACKAGE = "custom_components.enphase_envoy"
+
 TEST_DATA_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "test_data",
     "envoy_metered",
 )
 
+
+def load_envoy_reader():
+    """Return the envoy_reader module, imported without Home Assistant.
+
+    The package __init__.py and const.py import homeassistant, so a stub
+    package is registered with mocked const and envoy_endpoints modules and
+    envoy_reader is loaded from its source, once for all test modules.
+    """
+    if module := sys.modules.get(f"{PACKAGE}.envoy_reader"):
+        return module
+
+    if PACKAGE not in sys.modules:
+        package = ModuleType(PACKAGE)
+        package.__path__ = ["custom_components/enphase_envoy"]
+        package.__package__ = PACKAGE
+        sys.modules[PACKAGE] = package
+    for sub in ("const", "envoy_endpoints"):
+        sys.modules.setdefault(f"{PACKAGE}.{sub}", MagicMock())
+    sys.modules[
+        f"{PACKAGE}.envoy_endpoints"
+    ].ENDPOINT_URL_STREAM = "https://{}/stream/meter"
+
+    spec = importlib.util.spec_from_file_location(
+        f"{PACKAGE}.envoy_reader",
+        "custom_components/enphase_envoy/envoy_reader.py",
+        submodule_search_locations=[],
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[f"{PACKAGE}.envoy_reader"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: large site benchmarks, only run with -m benchmark"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless they are selected with -m benchmark."""
+    if "benchmark" in config.getoption("markexpr", ""):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with -m benchmark")
+    for item in items:
+        if item.get_closest_marker("benchmark"):
+            item.add_marker(skip)
+
+
 ENDPOINTS = {
     "info": {
         "url": os.path.join(TEST_DATA_DIR, "endpoint_info.xml"),
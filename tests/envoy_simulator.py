@@ -0,0 +1,226 @@
+"""In-process Envoy simulator, served as an httpx transport.
+
+Pass `EnvoySimulator.transport` to EnvoyReader(transport=...) to run the
+real request path (retries, 401 handling, check_jwt, the token broker and
+stream_reader) against the fixture payloads, without network access:
+
+    simulator = EnvoySimulator(host="envoy.local")
+    simulator.set_latency("production_inverters", 0.2, jitter=0.05)
+    simulator.fail("inventory", 503, count=2)
+    reader = EnvoyReader("envoy.local", transport=simulator.transport, ...)
+
+The Envoy only accepts tokens the simulator issued through its Entrez
+login and token endpoints, `expire_tokens` revokes all of them.
+"""
+
+import asyncio
+import importlib.util
+import itertools
+import json
+import os
+import random
+import time
+import urllib.parse
+
+import httpx
+import jwt
+
+from tests.site_generator import TEST_DATA_DIR, stream_event
+
+_spec = importlib.util.spec_from_file_location(
+    "envoy_endpoints", "custom_components/enphase_envoy/envoy_endpoints.py"
+)
+_envoy_endpoints = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_envoy_endpoints)
+
+ENVOY_ENDPOINTS = _envoy_endpoints.ENVOY_ENDPOINTS
+
+TOKEN_SECRET = "envoy-simulator-secret-long-enough-for-hs256"
+
+CLOUD_HOSTS = ("entrez.enphaseenergy.com", "enlighten.enphaseenergy.com")
+
+
+class EnvoySimulator:
+    """Serves the endpoint fixtures of a directory like an Envoy does."""
+
+    def __init__(
+        self,
+        host="192.168.1.1",
+        data_dir=TEST_DATA_DIR,
+        serial_number="999999900879",
+        token_type="installer",
+        token_lifetime=3600,
+        stream_interval=1.0,
+        stream_events=None,
+        stream_phases=3,
+        seed=0,
+    ):
+        self.host = host
+        self.data_dir = data_dir
+        self.serial_number = serial_number
+        self.token_type = token_type
+        self.token_lifetime = token_lifetime
+        self.stream_interval = stream_interval
+        self.stream_events = stream_events
+        self.stream_phases = stream_phases
+        self._random = random.Random(seed)
+
+        # url path -> endpoint name
+        self.endpoints = dict(ENVOY_ENDPOINTS)
+        self._paths = {
+            urllib.parse.urlsplit(endpoint["url"].format(host)).path: name
+            for name, endpoint in self.endpoints.items()
+        }
+        self._paths[
+            urllib.parse.urlsplit(_envoy_endpoints.ENDPOINT_URL_STREAM).path
+        ] = "stream"
+
+        # endpoint name -> (latency, jitter), "default" for all others
+        self._latency = {"default": (0, 0)}
+        # endpoint name -> [status code or exception, remaining count or None]
+        self._failures = {}
+
+        self._tokens = set()
+        self._sessions = set()
+        self._counter = itertools.count(1)
+
+        self.requests = []
+        self.logins = 0
+        self.tokens_issued = 0
+
+    @property
+    def transport(self):
+        """Return a new httpx transport handled by the simulator."""
+        return httpx.MockTransport(self.handle)
+
+    def url(self, endpoint):
+        """Return the url of an endpoint of the simulated Envoy."""
+        return self.endpoints[endpoint]["url"].format(self.host)
+
+    def set_latency(self, endpoint, latency, jitter=0):
+        """Delay the responses of the endpoint ("default" for all)."""
+        self._latency[endpoint] = (latency, jitter)
+
+    def fail(self, endpoint, error, count=None):
+        """Answer the endpoint with a status code or raise an httpx exception.
+
+        Applies to the next `count` requests, or to all when count is None.
+        """
+        self._failures[endpoint] = [error, count]
+
+    def issue_token(self):
+        """Return a new valid token, as Entrez would."""
+        self.tokens_issued += 1
+        token = jwt.encode(
+            {
+                "exp": int(time.time()) + self.token_lifetime,
+                "enphaseUser": self.token_type,
+                "sn": self.serial_number,
+                "jti": next(self._counter),
+            },
+            TOKEN_SECRET,
+            algorithm="HS256",
+        )
+        self._tokens.add(token)
+        return token
+
+    def expire_tokens(self):
+        """Revoke all tokens and sessions, the Envoy answers 401 after this."""
+        self._tokens.clear()
+        self._sessions.clear()
+
+    def count(self, endpoint):
+        """Return how many requests the endpoint received."""
+        return sum(1 for name in self.requests if name == endpoint)
+
+    async def handle(self, request):
+        if request.url.host in CLOUD_HOSTS:
+            return self._handle_cloud(request)
+
+        endpoint = self._endpoint(request.url.path)
+        self.requests.append(endpoint)
+        await self._delay(endpoint)
+
+        failure = self._failures.get(endpoint)
+        if failure is not None:
+            error, count = failure
+            if count is not None:
+                failure[1] -= 1
+                if failure[1] <= 0:
+                    del self._failures[endpoint]
+            if isinstance(error, int):
+                return httpx.Response(error, text=f"Simulated HTTP {error}")
+            raise error("Simulated error", request=request)
+
+        if endpoint == "check_jwt":
+            return self._check_jwt(request)
+        if not self._is_authorized(request):
+            return httpx.Response(401, text="Unauthorized")
+        if endpoint == "stream":
+            return httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=self._stream(),
+            )
+        return self._fixture(endpoint)
+
+    def _endpoint(self, path):
+        if path == "/auth/check_jwt":
+            return "check_jwt"
+        return self._paths.get(path, path)
+
+    async def _delay(self, endpoint):
+        latency, jitter = self._latency.get(endpoint, self._latency["default"])
+        if latency or jitter:
+            await asyncio.sleep(max(0, latency + self._random.uniform(-jitter, jitter)))
+
+    def _is_authorized(self, request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if token in self._tokens:
+            return True
+        session = request.headers.get("cookie", "").partition("sessionId=")[2]
+        return session.split(";")[0] in self._sessions
+
+    def _check_jwt(self, request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if token not in self._tokens:
+            return httpx.Response(401, text="Invalid token")
+        session = f"session-{next(self._counter)}"
+        self._sessions.add(session)
+        return httpx.Response(
+            200,
+            text="<!DOCTYPE html><h2>Valid token.</h2>",
+            headers={"set-cookie": f"sessionId={session}; Path=/"},
+        )
+
+    def _handle_cloud(self, request):
+        if request.url.path == "/login":
+            self.logins += 1
+            return httpx.Response(200, headers={"set-cookie": "SESSION=entrez; Path=/"})
+        if request.url.path == "/entrez_tokens":
+            return httpx.Response(
+                200, text=f"<textarea>{self.issue_token()}</textarea>"
+            )
+        return httpx.Response(404)
+
+    def _fixture(self, endpoint):
+        for extension, content_type in (
+            ("json", "application/json"),
+            ("xml", "application/xml"),
+        ):
+            path = os.path.join(self.data_dir, f"endpoint_{endpoint}.{extension}")
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    return httpx.Response(
+                        200, content=file.read(), headers={"content-type": content_type}
+                    )
+        return httpx.Response(404, text="Not found")
+
+    async def _stream(self):
+        for n in itertools.count():
+            if self.stream_events is not None and n >= self.stream_events:
+                return
+            if n:
+                await asyncio.sleep(self.stream_interval)
+            event = stream_event(self.stream_phases, seed=n)
+            yield b"data: " + json.dumps(event).encode() + b"\n\n"
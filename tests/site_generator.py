@@ -0,0 +1,212 @@
+"""Generator of synthetic Envoy endpoint payloads for large sites.
+
+The payloads of test_data/envoy_metered are scaled to any number of
+inverters, relays, batteries and meter phases. The first device of each
+type in the fixtures is used as the template, serial numbers and ids are
+numbered and the measurements are varied with a seeded random generator,
+so a site is the same every run.
+"""
+
+import copy
+import json
+import os
+import random
+import shutil
+
+TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "test_data",
+    "envoy_metered",
+)
+
+# The generated endpoints, the other fixtures are copied as is
+GENERATED_ENDPOINTS = (
+    "inventory",
+    "device_data",
+    "devstatus",
+    "production_inverters",
+    "pcu_comm_check",
+    "ensemble_inventory",
+    "ensemble_power",
+    "meters",
+    "meters_readings",
+)
+
+
+def _load(endpoint):
+    with open(os.path.join(TEST_DATA_DIR, f"endpoint_{endpoint}.json")) as file:
+        return json.load(file)
+
+
+def _serials(prefix, count):
+    return [f"{prefix}{n:08d}" for n in range(count)]
+
+
+class SiteGenerator:
+    """Creates the endpoint payloads of a site of a given size."""
+
+    def __init__(self, inverters=14, relays=2, batteries=3, phases=3, seed=0):
+        self.inverters = _serials("1221", inverters)
+        self.relays = _serials("1222", relays)
+        self.batteries = _serials("1223", batteries)
+        self.phases = phases
+        self.seed = seed
+
+    def payloads(self):
+        """Return the payloads of the generated endpoints by endpoint name."""
+        self._random = random.Random(self.seed)
+        return {endpoint: getattr(self, endpoint)() for endpoint in GENERATED_ENDPOINTS}
+
+    def write(self, directory):
+        """Write the site as endpoint_*.json/xml files like test_data has."""
+        os.makedirs(directory, exist_ok=True)
+        for fname in os.listdir(TEST_DATA_DIR):
+            shutil.copy(os.path.join(TEST_DATA_DIR, fname), directory)
+        for endpoint, payload in self.payloads().items():
+            path = os.path.join(directory, f"endpoint_{endpoint}.json")
+            with open(path, "w") as file:
+                json.dump(payload, file)
+        return directory
+
+    def _vary(self, value, spread=0.1):
+        return type(value)(value * (1 + self._random.uniform(-spread, spread)))
+
+    def inventory(self):
+        inventory = _load("inventory")
+        for group in inventory:
+            serials = {"PCU": self.inverters, "NSRB": self.relays}.get(group["type"])
+            if serials is None or not group["devices"]:
+                continue
+            template = group["devices"][0]
+            group["devices"] = []
+            for n, serial in enumerate(serials):
+                device = copy.deepcopy(template)
+                device["serial_num"] = serial
+                device["chaneid"] = template["chaneid"] + n
+                device["last_rpt_date"] = str(
+                    int(template["last_rpt_date"]) + self._random.randint(0, 900)
+                )
+                group["devices"].append(device)
+        return inventory
+
+    def device_data(self):
+        fixture = _load("device_data")
+        templates = {}
+        for device in fixture.values():
+            if isinstance(device, dict):
+                templates.setdefault(device["devName"], device)
+
+        result = {}
+        devices = [("pcu", serial) for serial in self.inverters]
+        devices += [("nsrb", serial) for serial in self.relays]
+        for n, (dev_name, serial) in enumerate(devices):
+            device = copy.deepcopy(templates[dev_name])
+            device["sn"] = serial
+            channel = device["channels"][0]
+            channel["chanEid"] = 1627390000 + n
+            reading = channel["lastReading"]
+            reading["eid"] = channel["chanEid"]
+            reading["endDate"] += self._random.randint(0, 900)
+            if dev_name == "pcu":
+                channel["watts"]["now"] = self._vary(channel["watts"]["now"], 0.5)
+                reading["acVoltageINmV"] = self._vary(reading["acVoltageINmV"], 0.02)
+                reading["dcVoltageINmV"] = self._vary(reading["dcVoltageINmV"])
+                reading["dcCurrentINmA"] = self._vary(reading["dcCurrentINmA"])
+            result[str(553648384 + n * 256)] = device
+        result["deviceCount"] = len(devices)
+        result["deviceDataLimit"] = fixture["deviceDataLimit"]
+        return result
+
+    def devstatus(self):
+        devstatus = _load("devstatus")
+        for group, serials in (("pcu", self.inverters), ("nsrb", self.relays)):
+            values = devstatus[group]["values"]
+            if not values:
+                continue
+            template = values[0]
+            devstatus[group]["values"] = [
+                [serial] + copy.deepcopy(template[1:]) for serial in serials
+            ]
+            for counter in ("expected", "discovered", "ctrlsTotal", "chansTotal"):
+                devstatus["counters"][group][counter] = len(serials)
+        return devstatus
+
+    def production_inverters(self):
+        template = _load("production_inverters")[0]
+        result = []
+        for serial in self.inverters:
+            inverter = dict(template)
+            inverter["serialNumber"] = serial
+            inverter["lastReportDate"] += self._random.randint(0, 900)
+            inverter["lastReportWatts"] = self._random.randint(0, 300)
+            result.append(inverter)
+        return result
+
+    def pcu_comm_check(self):
+        return {
+            serial: self._random.randint(0, 5)
+            for serial in self.inverters + self.relays
+        }
+
+    def ensemble_inventory(self):
+        inventory = _load("ensemble_inventory")
+        for group in inventory:
+            if group.get("type") != "ENCHARGE":
+                continue
+            template = group["devices"][0]
+            group["devices"] = []
+            for serial in self.batteries:
+                device = copy.deepcopy(template)
+                device["serial_num"] = serial
+                device["percentFull"] = self._random.randint(0, 100)
+                group["devices"].append(device)
+        return inventory
+
+    def ensemble_power(self):
+        template = _load("ensemble_power")["devices:"][0]
+        devices = []
+        for serial in self.batteries:
+            device = dict(template)
+            device["serial_num"] = serial
+            device["real_power_mw"] = self._random.randint(-3840000, 3840000)
+            devices.append(device)
+        return {"devices:": devices}
+
+    def meters(self):
+        meters = _load("meters")
+        for meter in meters:
+            meter["phaseCount"] = min(meter["phaseCount"], self.phases)
+        return meters
+
+    def meters_readings(self):
+        readings = _load("meters_readings")
+        for meter in readings:
+            channels = meter["channels"]
+            meter["channels"] = [
+                copy.deepcopy(channels[n % len(channels)]) for n in range(self.phases)
+            ]
+            for channel in meter["channels"]:
+                channel["activePower"] = self._vary(channel["activePower"], 0.5)
+        return readings
+
+
+def stream_event(phases=3, seed=0):
+    """Return a /stream/meter event payload with the given number of phases."""
+    rng = random.Random(seed)
+    phase_names = ("ph-a", "ph-b", "ph-c")[:phases]
+
+    def phase():
+        return {
+            "p": rng.uniform(-2000, 4000),
+            "q": rng.uniform(-500, 500),
+            "s": rng.uniform(0, 4000),
+            "v": rng.uniform(225, 240),
+            "i": rng.uniform(0, 16),
+            "pf": rng.uniform(-1, 1),
+            "f": 50.0,
+        }
+
+    return {
+        group: {name: phase() for name in phase_names}
+        for group in ("production", "net-consumption", "total-consumption")
+    }
@@ -0,0 +1,198 @@
+"""Tests for the shared Enlighten/Entrez login session.
+
+Imports envoy_reader without the homeassistant dependency tree, see
+load_envoy_reader in conftest.py.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import httpx
+import jwt
+import pytest
+
+from tests.conftest import load_envoy_reader
+
+envoy_reader_mod = load_envoy_reader()
+
+EnphaseAuthBroker = envoy_reader_mod.EnphaseAuthBroker
+EnlightenError = envoy_reader_mod.EnlightenError
+EnvoyReader = envoy_reader_mod.EnvoyReader
+
+_RealAsyncClient = httpx.AsyncClient
+
+
+def _make_token(serial):
+    return jwt.encode(
+        {"exp": int(time.time()) + 3600, "enphaseUser": "installer", "sn": serial},
+        "test-secret-that-is-long-enough-for-hs256",
+        algorithm="HS256",
+    )
+
+
+class _FakeCloud:
+    """Minimal Entrez/Enlighten backend counting the calls it receives."""
+
+    def __init__(self, delay=0):
+        self.logins = 0
+        self.token_requests = []
+        self.valid_sessions = set()
+        self.delay = delay
+
+    async def handler(self, request):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        if request.url.path in ("/login", "/login/login.json"):
+            self.logins += 1
+            session = f"session-{self.logins}"
+            self.valid_sessions.add(session)
+            return httpx.Response(
+                200,
+                json={"session_id": session},
+                headers={"set-cookie": f"_session={session}; Path=/"},
+            )
+
+        if request.url.path == "/entrez_tokens":
+            session = request.headers.get("cookie", "").partition("_session=")[2]
+            if session not in self.valid_sessions:
+                return httpx.Response(200, text="<html>login</html>")
+            serial = request.content.decode().partition("serialNum=")[2]
+            self.token_requests.append(serial)
+            return httpx.Response(
+                200, text=f"<textarea>{_make_token(serial)}</textarea>"
+            )
+
+        if request.url.path == "/tokens":
+            payload = request.read().decode()
+            self.token_requests.append(payload)
+            return httpx.Response(200, text=_make_token("enlighten"))
+
+        return httpx.Response(404)
+
+    def client_factory(self, *args, **kwargs):
+        kwargs.pop("verify", None)
+        return _RealAsyncClient(transport=httpx.MockTransport(self.handler))
+
+
+@pytest.mark.asyncio
+async def test_login_shared_between_serials():
+    cloud = _FakeCloud()
+    broker = EnphaseAuthBroker("user@example.com", "secret")
+
+    with patch.object(
+        envoy_reader_mod.httpx, "AsyncClient", side_effect=cloud.client_factory
+    ):
+        token_a = await broker.async_get_token("111111111111")
+        token_b = await broker.async_get_token("222222222222")
+
+    assert cloud.logins == 1
+    assert cloud.token_requests == ["111111111111", "222222222222"]
+    assert jwt.decode(token_a, options={"verify_signature": False})["sn"] == (
+        "111111111111"
+    )
+    assert token_a != token_b
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_for_same_serial_are_coalesced():
+    cloud = _FakeCloud(delay=0.01)
+    broker = EnphaseAuthBroker("user@example.com", "secret")
+
+    with patch.object(
+        envoy_reader_mod.httpx, "AsyncClient", side_effect=cloud.client_factory
+    ):
+        tokens = await asyncio.gather(
+            *(broker.async_get_token("111111111111") for _ in range(5))
+        )
+
+    assert cloud.logins == 1
+    assert cloud.token_requests == ["111111111111"]
+    assert len(set(tokens)) == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_session_logs_in_again():
+    cloud = _FakeCloud()
+    broker = EnphaseAuthBroker("user@example.com", "secret")
+
+    with patch.object(
+        envoy_reader_mod.httpx, "AsyncClient", side_effect=cloud.client_factory
+    ):
+        await broker.async_get_token("111111111111")
+        cloud.valid_sessions.clear()  # cloud side session expired
+        await broker.async_get_token("111111111111")
+
+    assert cloud.logins == 2
+    assert cloud.token_requests == ["111111111111", "111111111111"]
+
+
+@pytest.mark.asyncio
+async def test_fresh_session_failure_is_raised():
+    cloud = _FakeCloud()
+    broker = EnphaseAuthBroker("user@example.com", "secret")
+
+    async def reject_tokens(request):
+        if request.url.path == "/entrez_tokens":
+            return httpx.Response(200, text="<textarea>Error: no access</textarea>")
+        return await cloud.handler(request)
+
+    def factory(*args, **kwargs):
+        return _RealAsyncClient(transport=httpx.MockTransport(reject_tokens))
+
+    with patch.object(envoy_reader_mod.httpx, "AsyncClient", side_effect=factory):
+        with pytest.raises(EnlightenError):
+            await broker.async_get_token("111111111111")
+
+    assert cloud.logins == 1
+
+
+@pytest.mark.asyncio
+async def test_session_lifetime_expiry():
+    cloud = _FakeCloud()
+    broker = EnphaseAuthBroker("user@example.com", "secret", session_lifetime=0)
+
+    with patch.object(
+        envoy_reader_mod.httpx, "AsyncClient", side_effect=cloud.client_factory
+    ):
+        await broker.async_get_token("111111111111")
+        await broker.async_get_token("111111111111")
+
+    assert cloud.logins == 2
+
+
+@pytest.mark.asyncio
+async def test_enlighten_source():
+    cloud = _FakeCloud()
+    broker = EnphaseAuthBroker("user@example.com", "secret", token_source="enlighten")
+
+    with patch.object(
+        envoy_reader_mod.httpx, "AsyncClient", side_effect=cloud.client_factory
+    ):
+        await broker.async_get_token("111111111111")
+        await broker.async_get_token("222222222222")
+
+    assert cloud.logins == 1
+    payload = json.loads(cloud.token_requests[1])
+    assert payload["session_id"] == "session-1"
+    assert payload["serial_num"] == "222222222222"
+
+
+def test_readers_share_broker():
+    broker = EnphaseAuthBroker("user@example.com", "secret")
+    reader_a = EnvoyReader("192.168.1.1", enlighten_serial_num="1", auth_broker=broker)
+    reader_b = EnvoyReader("192.168.1.2", enlighten_serial_num="2", auth_broker=broker)
+    assert reader_a.auth_broker is reader_b.auth_broker
+
+
+def test_reader_creates_own_broker():
+    reader = EnvoyReader(
+        "192.168.1.1",
+        enlighten_user="user@example.com",
+        enlighten_pass="secret",
+        token_source="enlighten",
+    )
+    assert reader.auth_broker.username == "user@example.com"
+    assert reader.auth_broker.source_name == "Enlighten"
@@ -0,0 +1,157 @@
+"""Benchmarks for large sites, run with pytest-benchmark.
+
+The sites are generated by tests/site_generator.py. The benchmarks are
+skipped unless selected with `pytest -m benchmark`, and when
+pytest-benchmark is not installed. Compare runs with `--benchmark-autosave`
+and `--benchmark-compare`.
+"""
+
+import importlib.util
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from tests.site_generator import SiteGenerator, stream_event
+from tests.test_device_descriptions import SENSOR_KEYS
+from tests.test_envoy_reader import envoy_reader_mod, make_reader
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.benchmark
+
+EnvoyMeteredWithCT = envoy_reader_mod.EnvoyMeteredWithCT
+FileData = envoy_reader_mod.FileData
+StreamData = envoy_reader_mod.StreamData
+
+SITE_SIZES = (10, 100, 1000)
+
+spec = importlib.util.spec_from_file_location(
+    "device_descriptions", "custom_components/enphase_envoy/device_descriptions.py"
+)
+device_descriptions = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(device_descriptions)
+
+
+def _site_data(inverters, relays, batteries):
+    """Return coordinator data of a site with the given number of devices."""
+    inverter_serials = [f"1221{n:08d}" for n in range(inverters)]
+    relay_serials = [f"1222{n:08d}" for n in range(relays)]
+    battery_serials = [f"1223{n:08d}" for n in range(batteries)]
+    return {
+        "production": 1000,
+        "daily_production": 5000,
+        "agg_batteries_soc": 50,
+        "inverter_production": {
+            serial: {"lastReportWatts": 200} for serial in inverter_serials
+        },
+        "inverter_device_data": {
+            serial: {"dc_voltage": 30.1, "temperature": 40, "watts_max": 300}
+            for serial in inverter_serials
+        },
+        "inverter_info": {
+            serial: {"img_pnum_running": "520-00082-r01"} for serial in inverter_serials
+        },
+        "relay_device_data": {
+            serial: {"temperature": 30, "voltage_l1": 230} for serial in relay_serials
+        },
+        "relay_info": {
+            serial: {"img_pnum_running": "520-00082-r01"} for serial in relay_serials
+        },
+        "pcu_availability": {serial: 5 for serial in inverter_serials + relay_serials},
+        "batteries": {
+            serial: {"temperature": 25, "img_pnum_running": "1"}
+            for serial in battery_serials
+        },
+        "batteries_power": {serial: {"real_power_mw": 0} for serial in battery_serials},
+    }
+
+
+def test_device_descriptions_registry(benchmark):
+    """Group the sensor descriptions and find the device entities of a site.
+
+    This is the lookup of the sensor platform setup, creating the entities
+    themselves needs Home Assistant and is not part of it.
+    """
+    descriptions = [SimpleNamespace(key=key) for key in SENSOR_KEYS]
+    data = _site_data(inverters=1000, relays=50, batteries=20)
+
+    def find_entities():
+        registry = device_descriptions.DeviceDescriptions(
+            descriptions, device_descriptions.SENSOR_DEVICE_RULES
+        )
+        return len(list(registry.entities(data)))
+
+    # 6 sensors per inverter, 4 per relay, 7 per battery
+    assert benchmark(find_entities) == 1000 * 6 + 50 * 4 + 20 * 7
+
+
+@pytest.fixture(scope="module", params=SITE_SIZES, ids=lambda n: f"{n}_devices")
+def site(request, tmp_path_factory):
+    """Return the directory and payloads of a site with n inverters."""
+    size = request.param
+    generator = SiteGenerator(
+        inverters=size, relays=max(1, size // 20), batteries=max(1, size // 50)
+    )
+    directory = generator.write(tmp_path_factory.mktemp(f"site_{size}"))
+    return directory, generator.payloads()
+
+
+def _site_reader(directory):
+    reader = make_reader()
+    for attr, settings in reader.uri_registry.items():
+        settings["url"] = os.path.join(directory, os.path.basename(settings["url"]))
+    reader.data = EnvoyMeteredWithCT(reader)
+    responses = {
+        attr: FileData(settings["url"])
+        for attr, settings in reader.uri_registry.items()
+    }
+    return reader, responses
+
+
+def test_parse_devicedata(benchmark, site):
+    _, payloads = site
+    benchmark(envoy_reader_mod.parse_devicedata, payloads["device_data"])
+
+
+def test_parse_devstatus(benchmark, site):
+    _, payloads = site
+    benchmark(envoy_reader_mod.parse_devstatus, payloads["devstatus"])
+
+
+def test_set_endpoint_data(benchmark, site):
+    reader, responses = _site_reader(site[0])
+
+    def set_all():
+        for attr, response in responses.items():
+            reader.data.set_endpoint_data(attr, response)
+
+    benchmark(set_all)
+
+
+def test_all_values(benchmark, site):
+    reader, responses = _site_reader(site[0])
+    for attr, response in responses.items():
+        reader.data.set_endpoint_data(attr, response)
+
+    values = benchmark(lambda: reader.all_values)
+    assert len(values["inverter_device_data"]) == len(site[1]["production_inverters"])
+
+
+@pytest.mark.parametrize("meters", SITE_SIZES)
+def test_merge_metersdata(benchmark, meters):
+    readings = [{"eid": n, "activePower": n} for n in range(meters)]
+    definitions = [{"eid": n, "state": "enabled"} for n in range(meters)]
+    benchmark(envoy_reader_mod.merge_metersdata, readings, definitions)
+
+
+@pytest.mark.parametrize("phases", (1, 2, 3))
+def test_stream_data_decoding(benchmark, phases):
+    payload = json.dumps(stream_event(phases)).encode()
+
+    def decode():
+        data = StreamData(json.loads(payload))
+        return [phase.watts for phase in data.production.values()]
+
+    assert len(benchmark(decode)) == phases
@@ -0,0 +1,73 @@
+"""Tests for the sensor state deadband in deadband.py."""
+
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    "deadband", "custom_components/enphase_envoy/deadband.py"
+)
+deadband = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(deadband)
+
+Deadband = deadband.Deadband
+create_deadband = deadband.create_deadband
+
+
+class TestDeadband:
+    def test_first_value_is_significant(self):
+        assert Deadband(absolute=10).significant(100, now=0)
+
+    def test_absolute(self):
+        band = Deadband(absolute=1.0)
+        band.significant(100, now=0)
+        assert not band.significant(100.5, now=1)
+        assert not band.significant(99.2, now=2)
+        assert band.significant(101.5, now=3)
+        # Compared with the last written value, not the last seen one
+        assert not band.significant(102.0, now=4)
+
+    def test_relative(self):
+        band = Deadband(absolute=1.0, relative=0.01)
+        band.significant(1000, now=0)
+        assert not band.significant(1009, now=1)
+        assert band.significant(1011, now=2)
+
+    def test_unchanged_value_is_not_significant(self):
+        band = Deadband()
+        band.significant(5, now=0)
+        assert not band.significant(5, now=1)
+        assert band.significant(5.01, now=2)
+
+    def test_heartbeat(self):
+        band = Deadband(absolute=10, max_silence=300)
+        band.significant(100, now=0)
+        assert not band.significant(101, now=299)
+        assert band.significant(101, now=300)
+        assert not band.significant(102, now=301)
+
+    def test_non_numeric_values(self):
+        band = Deadband(absolute=10)
+        band.significant(None, now=0)
+        assert band.significant(100, now=1)
+        assert band.significant(None, now=2)
+        band.significant("normal", now=3)
+        assert not band.significant("normal", now=4)
+        assert band.significant("fault", now=5)
+
+    def test_availability_change_is_significant(self):
+        band = Deadband(absolute=10, max_silence=300)
+        band.significant(100, now=0)
+        # A failed update with the value unchanged
+        assert band.significant(100, available=False, now=1)
+        assert not band.significant(100, available=False, now=2)
+        # Recovery with the value unchanged
+        assert band.significant(100, available=True, now=3)
+        assert not band.significant(101, available=True, now=4)
+
+
+def test_create_deadband_per_device_class():
+    band = create_deadband("voltage", relative=0.01, max_silence=60)
+    assert band.absolute == 0.5
+    assert band.relative == 0.01
+    assert band.max_silence == 60
+    assert create_deadband("energy") is None
+    assert create_deadband(None) is None
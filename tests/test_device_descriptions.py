@@ -0,0 +1,315 @@
+"""Tests for the device entity description registry in device_descriptions.py."""
+
+import ast
+import datetime
+import importlib.util
+from types import SimpleNamespace
+
+import pytest
+
+from tests.conftest import load_envoy_reader
+
+envoy_reader_mod = load_envoy_reader()
+
+spec = importlib.util.spec_from_file_location(
+    "device_descriptions", "custom_components/enphase_envoy/device_descriptions.py"
+)
+device_descriptions = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(device_descriptions)
+
+DeviceDescriptions = device_descriptions.DeviceDescriptions
+SENSOR_DEVICE_RULES = device_descriptions.SENSOR_DEVICE_RULES
+BINARY_SENSOR_DEVICE_RULES = device_descriptions.BINARY_SENSOR_DEVICE_RULES
+entity_context = device_descriptions.entity_context
+
+CONST_PATH = "custom_components/enphase_envoy/const.py"
+
+
+def description_keys(name):
+    """Return the keys of the entity descriptions in the tuple `name` of const.py.
+
+    const.py needs Home Assistant, so the keys are read from its source.
+    """
+    with open(CONST_PATH) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and getattr(node.targets[0], "id", None) == name
+        ):
+            return tuple(
+                keyword.value.value
+                for description in node.value.elts
+                for keyword in description.keywords
+                if keyword.arg == "key"
+            )
+    raise KeyError(name)
+
+
+SENSOR_KEYS = description_keys("SENSORS")
+BINARY_SENSOR_KEYS = description_keys("BINARY_SENSORS")
+
+
+def _descriptions(keys):
+    return [SimpleNamespace(key=key) for key in keys]
+
+
+def _entities(registry, data):
+    return sorted(
+        (family, serial, description.key)
+        for family, serial, description in registry.entities(data)
+    )
+
+
+def test_descriptions_are_grouped_by_data_key():
+    registry = DeviceDescriptions(_descriptions(SENSOR_KEYS), SENSOR_DEVICE_RULES)
+
+    other = [d.key for d in registry.other]
+    assert "production" in other
+    assert "agg_batteries_soc" in other
+    assert not [key for key in other if key.startswith(("inverter_", "relay_"))]
+    groups = {
+        data_key: [(family, d.key, field) for family, d, field in members]
+        for (data_key, requires), members in registry.groups.items()
+        if not requires
+    }
+    assert groups["inverter_production"] == [("inverter", "inverter_data_watts", None)]
+    assert ("inverter", "inverter_data_watts_max", "watts_max") in groups[
+        "inverter_device_data"
+    ]
+    assert ("battery", "batteries_power", None) in groups["batteries"]
+    assert ("battery_firmware", "batteries_software", None) in groups["batteries"]
+
+
+def test_entities_of_each_device():
+    registry = DeviceDescriptions(_descriptions(SENSOR_KEYS), SENSOR_DEVICE_RULES)
+    data = {
+        "inverter_production": {"1": {}},
+        "inverter_device_data": {"1": {"dc_voltage": 30, "temperature": None}},
+        "inverter_info": {"1": {}},
+        "relay_device_data": {"2": {"temperature": 20}},
+    }
+
+    assert _entities(registry, data) == [
+        ("inverter", "1", "inverter_data_dc_voltage"),
+        ("inverter", "1", "inverter_data_watts"),
+        ("inverter", "1", "inverter_info_img_pnum_running"),
+        ("relay", "2", "relay_data_temperature"),
+    ]
+
+
+def test_required_values():
+    registry = DeviceDescriptions(_descriptions(SENSOR_KEYS), SENSOR_DEVICE_RULES)
+    data = {
+        "inverter_device_data": {"1": {}},
+        "relay_device_data": {"2": {}},
+        "pcu_availability": {"1": 5, "2": 4},
+    }
+
+    assert _entities(registry, data) == [
+        ("inverter_signal", "1", "inverter_pcu_communication_level"),
+        ("relay_signal", "2", "relay_pcu_communication_level"),
+    ]
+    data["pcu_availability"] = {}
+    assert _entities(registry, data) == []
+
+
+def test_binary_sensor_relay_contact():
+    registry = DeviceDescriptions(
+        _descriptions(BINARY_SENSOR_KEYS), BINARY_SENSOR_DEVICE_RULES
+    )
+
+    assert "grid_status" in [d.key for d in registry.other]
+    assert _entities(registry, {"relay_info": {"3": {}}}) == [
+        ("relay", "3", "relay_info_communicating"),
+        ("relay_contact", "3", "relay_info_relay"),
+    ]
+
+
+def test_relay_info_change_notifies_relay_entities():
+    old = {"relay_info": {"3": {"relay": "closed"}}, "inverter_info": {"1": {}}}
+    new = {"relay_info": {"3": {"relay": "open"}}, "inverter_info": {"1": {}}}
+    changed = envoy_reader_mod.diff_values(old, new)
+
+    context = entity_context("relay_pcu_communication_level", "3")
+    assert ("relay_info", "3") in context
+    assert not changed.isdisjoint(context)
+
+    changed = envoy_reader_mod.diff_values(
+        new, dict(new, inverter_info={"1": {"producing": False}})
+    )
+    assert changed.isdisjoint(context)
+
+
+LED_STATES = {12: "Charging", 14: "Idle. Fully charged."}
+
+DEVICE_DATA = {
+    "inverter_production": {"1": {"lastReportWatts": 210, "lastReportDate": 1700}},
+    "inverter_device_data": {
+        "1": {"dc_voltage": 30.5, "temperature": 40, "last_reading": 1700},
+        "2": {"dc_voltage": 0, "last_reading": 1600, "gone": True},
+    },
+    "inverter_info": {"1": {"img_pnum_running": "520-00082-r01"}},
+    "relay_device_data": {
+        "3": {"voltage_l1": 230, "voltage_l2": 231, "last_reading": 1700},
+        "4": {"voltage_l1": 0, "last_reading": 1600, "gone": False},
+    },
+    "relay_info": {"3": {"img_pnum_running": "520-00082-r01"}},
+    "batteries": {
+        "5": {"temperature": 25, "led_status": 12, "img_pnum_running": "2.6"}
+    },
+    "batteries_power": {"5": {"real_power_mw": -1500}},
+}
+
+
+def _legacy_inverter_value(data, key, serial, retain):
+    """The inverter sensor value as read before the accessors."""
+    if key == "inverter_data_watts":
+        if data.get("inverter_production"):
+            return data["inverter_production"][serial].get("lastReportWatts")
+    elif key.startswith("inverter_data_"):
+        if data.get("inverter_device_data"):
+            device = data["inverter_device_data"][serial]
+            value = device.get(key[14:])
+            if key.endswith("last_reading"):
+                return datetime.datetime.fromtimestamp(
+                    int(value), tz=datetime.timezone.utc
+                )
+            if device.get("gone") and not retain:
+                return None
+            return value
+    elif key.startswith("inverter_info_"):
+        if data.get("inverter_info"):
+            return data["inverter_info"][serial].get(key[14:])
+    return None
+
+
+def _legacy_relay_value(data, key, serial):
+    """The relay sensor value as read before the accessors."""
+    if key.startswith("relay_data_"):
+        if data.get("relay_device_data"):
+            device = data["relay_device_data"][serial]
+            value = device.get(key[11:])
+            if key.endswith("last_reading"):
+                return datetime.datetime.fromtimestamp(
+                    int(value), tz=datetime.timezone.utc
+                )
+            if device.get("gone", True):
+                return None
+            return value
+    elif key.startswith("relay_info_"):
+        if data.get("relay_info"):
+            return data["relay_info"][serial].get(key[11:])
+    return None
+
+
+def _legacy_battery_value(data, key, serial):
+    """The battery sensor value as read before the accessors."""
+    if key == "batteries_software":
+        return data["batteries"][serial].get("img_pnum_running")
+    if key == "batteries_power":
+        return int(data["batteries_power"][serial].get("real_power_mw") / 1000)
+    if key == "batteries_led_status":
+        return LED_STATES.get(data["batteries"][serial].get("led_status"))
+    return data["batteries"][serial].get(key[10:])
+
+
+def _value(data, accessor, serial):
+    if (devices := data.get(accessor.data_key)) is None:
+        return None
+    if (device := devices.get(serial)) is None:
+        return None
+    return device_descriptions.device_value(accessor, device)
+
+
+def _device_keys(prefixes):
+    return [key for key in SENSOR_KEYS if key.startswith(prefixes)]
+
+
+@pytest.mark.parametrize("retain", (False, True))
+@pytest.mark.parametrize(
+    "key, serial",
+    [(key, "1") for key in _device_keys(("inverter_data_", "inverter_info_"))]
+    # Inverter 2 is gone and only has device data
+    + [
+        (key, "2")
+        for key in _device_keys(("inverter_data_",))
+        if key != "inverter_data_watts"
+    ],
+)
+def test_inverter_accessor_matches_legacy_lookup(key, serial, retain):
+    accessor = device_descriptions.inverter_accessor(key, retain)
+    assert _value(DEVICE_DATA, accessor, serial) == _legacy_inverter_value(
+        DEVICE_DATA, key, serial, retain
+    )
+
+
+@pytest.mark.parametrize(
+    "key, serial",
+    [(key, "3") for key in _device_keys(("relay_data_", "relay_info_"))]
+    + [(key, "4") for key in _device_keys(("relay_data_",))],
+)
+def test_relay_accessor_matches_legacy_lookup(key, serial):
+    accessor = device_descriptions.relay_accessor(key)
+    assert _value(DEVICE_DATA, accessor, serial) == _legacy_relay_value(
+        DEVICE_DATA, key, serial
+    )
+
+
+@pytest.mark.parametrize("key", _device_keys(("batteries_",)))
+def test_battery_accessor_matches_legacy_lookup(key):
+    accessor = device_descriptions.battery_accessor(key, LED_STATES)
+    assert _value(DEVICE_DATA, accessor, "5") == _legacy_battery_value(
+        DEVICE_DATA, key, "5"
+    )
+
+
+def test_accessor_of_missing_device():
+    accessor = device_descriptions.relay_accessor("relay_data_voltage_l3")
+    assert _value(DEVICE_DATA, accessor, "9") is None
+    assert _value({}, accessor, "3") is None
+    # Not reported by a relay on two phases
+    assert _value(DEVICE_DATA, accessor, "3") is None
+
+
+def test_utc_timestamp():
+    device_descriptions.utc_timestamp.cache_clear()
+    for value in (1700000000, "1700000000", 0):
+        assert device_descriptions.utc_timestamp(value) == (
+            datetime.datetime.fromtimestamp(int(value), tz=datetime.timezone.utc)
+        )
+    assert device_descriptions.utc_timestamp(1700000000) is (
+        device_descriptions.utc_timestamp(1700000000)
+    )
+    assert device_descriptions.utc_timestamp.cache_info().hits == 2
+
+    # Like before, a missing timestamp is an error for the caller to handle
+    with pytest.raises(TypeError):
+        device_descriptions.utc_timestamp(None)
+
+
+def test_device_info_is_shared_until_the_device_changes():
+    cache = device_descriptions.DeviceInfoCache()
+    created = []
+
+    def create(info):
+        created.append(info)
+        return {"sw_version": info["img_pnum_running"]}
+
+    info = {"img_pnum_running": "520-00082-r01", "part_num": "800-01391-r03"}
+    fingerprint = (info["img_pnum_running"], info["part_num"])
+    first = cache.get(("inverter", "1"), fingerprint, create, info)
+    # Every entity of the device gets the same DeviceInfo
+    assert cache.get(("inverter", "1"), fingerprint, create, info) is first
+    assert created == [info]
+
+    cache.get(("inverter", "2"), fingerprint, create, info)
+    assert len(created) == 2
+
+    # New firmware
+    info = dict(info, img_pnum_running="520-00082-r02")
+    fingerprint = (info["img_pnum_running"], info["part_num"])
+    updated = cache.get(("inverter", "1"), fingerprint, create, info)
+    assert updated == {"sw_version": "520-00082-r02"}
+    assert cache.get(("inverter", "1"), fingerprint, create, info) is updated
+    assert len(created) == 3
@@ -0,0 +1,188 @@
+"""Tests for recording and replaying Envoy traffic in envoy_capture.py.
+
+Imports envoy_reader without the homeassistant dependency tree, see
+load_envoy_reader in conftest.py.
+"""
+
+import importlib
+import time
+
+import jwt
+import pytest
+
+from tests.conftest import load_envoy_reader
+from tests.envoy_simulator import ENVOY_ENDPOINTS, EnvoySimulator
+
+envoy_reader_mod = load_envoy_reader()
+
+spec = importlib.util.spec_from_file_location(
+    "envoy_capture", "custom_components/enphase_envoy/envoy_capture.py"
+)
+envoy_capture = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(envoy_capture)
+
+EnvoyCapture = envoy_capture.EnvoyCapture
+ReplayTransport = envoy_capture.ReplayTransport
+EnvoyReader = envoy_reader_mod.EnvoyReader
+EnvoyMeteredWithCT = envoy_reader_mod.EnvoyMeteredWithCT
+
+HOST = "envoy.local"
+SERIAL = "999999900879"
+ENDPOINTS = ("info", "inventory", "meters", "production_inverters")
+
+
+def _reader(**kwargs):
+    reader = EnvoyReader(
+        host=HOST,
+        inverters=True,
+        enlighten_user="test@example.com",
+        enlighten_pass="test_pass",
+        enlighten_serial_num=SERIAL,
+        **kwargs,
+    )
+    for key, endpoint in ENVOY_ENDPOINTS.items():
+        reader.register_url(f"endpoint_{key}", **endpoint)
+    reader.data = EnvoyMeteredWithCT(reader)
+    reader.endpoint_type = envoy_reader_mod.ENVOY_MODEL_M
+    return reader
+
+
+def _token():
+    return jwt.encode(
+        {"exp": int(time.time()) + 3600, "enphaseUser": "installer"},
+        "replay-secret-that-is-long-enough-for-hs256",
+        algorithm="HS256",
+    )
+
+
+async def _fetch_all(reader, simulator):
+    return [
+        await reader._async_fetch_with_retry(simulator.url(endpoint))
+        for endpoint in ENDPOINTS
+    ]
+
+
+async def _record(tmp_path):
+    """Return the responses of a recorded session and its capture file."""
+    simulator = EnvoySimulator(
+        host=HOST, stream_interval=0.01, stream_events=3, serial_number=SERIAL
+    )
+    simulator.set_latency("meters", 0.05)
+    capture = EnvoyCapture()
+    reader = _reader(transport=simulator.transport, capture=capture)
+
+    await reader.init_authentication()
+    responses = await _fetch_all(reader, simulator)
+    await _fetch_all(reader, simulator)
+    events = []
+    await reader.stream_reader(meter_callback=events.append)
+
+    path = tmp_path / "site.capture.gz"
+    capture.save(path)
+    return responses, events, capture, path
+
+
+@pytest.mark.asyncio
+async def test_capture_records_responses(tmp_path):
+    responses, events, capture, _ = await _record(tmp_path)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len(events) == 3
+
+    paths = [entry["path"] for entry in capture.responses]
+    assert paths.count("/ivp/meters") == 2
+    assert "/auth/check_jwt" in paths
+    meters = next(e for e in capture.responses if e["path"] == "/ivp/meters")
+    assert meters["latency"] >= 0.05
+    assert meters["headers"] == {"content-type": "application/json"}
+    stream = next(e for e in capture.responses if e["path"] == "/stream/meter")
+    assert len(stream["chunks"]) == 3
+    # Bodies of repeated polls are stored once
+    assert len(capture.bodies) < len(capture.responses)
+
+
+@pytest.mark.asyncio
+async def test_capture_is_redacted(tmp_path):
+    _, _, _, path = await _record(tmp_path)
+
+    content = EnvoyCapture.load(path).as_dict()
+    text = str(content)
+    assert SERIAL not in text
+    assert HOST not in text
+    assert "eyJ" not in text
+    assert "set-cookie" not in text
+
+
+@pytest.mark.asyncio
+async def test_replay(tmp_path):
+    responses, events, _, path = await _record(tmp_path)
+
+    capture = EnvoyCapture.load(path)
+    reader = _reader(transport=ReplayTransport(capture, speed=None))
+    reader._token = _token()
+    await reader.init_authentication()
+
+    simulator = EnvoySimulator(host=HOST)
+    replayed = await _fetch_all(reader, simulator)
+    assert [r.text for r in replayed] == [
+        r.text.replace(SERIAL, "redacted0") for r in responses
+    ]
+    assert SERIAL in responses[0].text
+
+    replayed_events = []
+    await reader.stream_reader(meter_callback=replayed_events.append)
+    assert [str(e) for e in replayed_events] == [str(e) for e in events]
+
+
+@pytest.mark.asyncio
+async def test_replay_timing(tmp_path):
+    _, _, capture, _ = await _record(tmp_path)
+    reader = _reader(transport=ReplayTransport(capture, speed=1))
+    reader._token = _token()
+    await reader.init_authentication()
+
+    start = time.monotonic()
+    response = await reader._async_fetch_with_retry(f"https://{HOST}/ivp/meters")
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.05
+
+    reader = _reader(transport=ReplayTransport(capture, speed=10))
+    reader._token = _token()
+    await reader.init_authentication()
+    start = time.monotonic()
+    await reader._async_fetch_with_retry(f"https://{HOST}/ivp/meters")
+    assert time.monotonic() - start < 0.05
+
+
+@pytest.mark.asyncio
+async def test_replay_unknown_request(tmp_path):
+    _, _, capture, _ = await _record(tmp_path)
+    reader = _reader(transport=ReplayTransport(capture, speed=None))
+    reader._token = _token()
+
+    response = await reader._async_fetch_with_retry(f"https://{HOST}/ivp/unknown")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_capture_redacts_ipv6_host():
+    simulator = EnvoySimulator(host="[fd00::1]", serial_number=SERIAL)
+    capture = EnvoyCapture()
+    reader = EnvoyReader(
+        host="FD00::1",
+        inverters=True,
+        enlighten_user="test@example.com",
+        enlighten_pass="test_pass",
+        enlighten_serial_num=SERIAL,
+        transport=simulator.transport,
+        capture=capture,
+    )
+    await reader.init_authentication()
+    response = await reader._async_fetch_with_retry(simulator.url("info"))
+
+    assert response.status_code == 200
+    assert "fd00" not in str(capture.as_dict())
+    assert "/info.xml" in [entry["path"] for entry in capture.responses]
+    assert capture._redact("host fd00::1 at https://[fd00::1]/") == (
+        "host envoy.local at https://envoy.local/"
+    )
@@ -4,15 +4,20 @@ Imports envoy_reader directly to avoid pulling in the full homeassistant
 dependency tree (same pattern as test_stream_staleness.py).
 """
 
+import copy
 import importlib
 import json
 import os
 import sys
 from types import ModuleType
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+from tests.test_envoy_stream import envoy_stream
+
+ENERGY_COUNTERS = envoy_stream.ENERGY_COUNTERS
+
 TEST_DATA_DIR = os.path.join(
     os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
     "test_data",
@@ -781,6 +786,51 @@ class TestMergeMetersdata:
         assert len(result) == 1
 
 
+# ===========================================================================
+# diff_values
+# ===========================================================================
+
+
+class TestDiffValues:
+    def test_first_update_changes_all_keys(self):
+        assert envoy_reader_mod.diff_values(None, {"a": 1, "b": 2}) == {"a", "b"}
+        assert envoy_reader_mod.diff_values(None, {"batteries": {"1": {}}}) == {
+            "batteries",
+            ("batteries", "1"),
+        }
+
+    def test_changed_added_and_removed_keys(self):
+        old = {"a": 1, "b": {"x": 1}, "c": 3}
+        new = {"a": 1, "b": {"x": 2}, "d": 4}
+        assert envoy_reader_mod.diff_values(old, new) == {"b", "c", "d"}
+
+    def test_changed_devices(self):
+        old = {"inverter_production": {"1": {"w": 10}, "2": {"w": 20}, "3": {}}}
+        new = {"inverter_production": {"1": {"w": 10}, "2": {"w": 25}, "4": {}}}
+        assert envoy_reader_mod.diff_values(old, new) == {
+            "inverter_production",
+            ("inverter_production", "2"),
+            ("inverter_production", "3"),
+            ("inverter_production", "4"),
+        }
+
+    def test_removed_device_value(self):
+        old = {"batteries": {"1": {}}, "production": 1}
+        new = {"batteries": None, "production": 1}
+        assert envoy_reader_mod.diff_values(old, new) == {
+            "batteries",
+            ("batteries", "1"),
+        }
+
+    def test_unchanged_poll_has_no_changes(self):
+        reader = make_reader()
+        reader.data = EnvoyMeteredWithCT(reader)
+        load_all(reader)
+        old = reader.all_values
+        load_all(reader)
+        assert envoy_reader_mod.diff_values(old, reader.all_values) == set()
+
+
 # ===========================================================================
 # Endpoint registration
 # ===========================================================================
@@ -792,3 +842,507 @@ class TestEndpointRegistration:
         expected = {f"endpoint_{k}" for k in ENDPOINTS}
         for ep in expected:
             assert ep in reader.uri_registry, f"Missing endpoint: {ep}"
+
+
+# ===========================================================================
+# Cached model detection
+# ===========================================================================
+
+
+def make_detecting_reader(store_data=None):
+    reader = make_reader()
+    reader.init_authentication = AsyncMock()
+    reader._store_data = copy.deepcopy(store_data or {})
+
+    reader.detection_calls = []
+    update_endpoints = reader.update_endpoints
+
+    async def recording_update_endpoints(endpoints=None, tier=None):
+        if endpoints is not None:
+            reader.detection_calls.append(list(endpoints))
+        await update_endpoints(endpoints, tier)
+
+    reader.update_endpoints = recording_update_endpoints
+    return reader
+
+
+class TestModelCache:
+    @pytest.mark.asyncio
+    async def test_detected_model_is_saved(self):
+        reader = make_detecting_reader()
+        await reader.get_data()
+
+        model = reader._store_data["model"]
+        assert model["data_class"] == "EnvoyMeteredWithCT"
+        assert model["endpoint_type"] == ENVOY_MODEL_M
+        assert model["firmware"] == reader.data.get("envoy_software")
+        assert set(model["required_endpoints"]) == reader.data.required_endpoints
+        assert reader._store_update_pending
+
+    @pytest.mark.asyncio
+    async def test_cached_model_skips_detection(self):
+        first = make_detecting_reader()
+        await first.get_data()
+
+        reader = make_detecting_reader(first._store_data)
+        await reader.get_data()
+
+        assert reader.detection_calls == [["endpoint_info"]]
+        assert isinstance(reader.data, EnvoyMeteredWithCT)
+        assert reader.endpoint_type == ENVOY_MODEL_M
+        assert reader.data.required_endpoints == first.data.required_endpoints
+        assert not reader._store_update_pending
+
+    @pytest.mark.asyncio
+    async def test_firmware_change_detects_again(self):
+        first = make_detecting_reader()
+        await first.get_data()
+        first._store_data["model"]["firmware"] = "D0.0.1"
+
+        reader = make_detecting_reader(first._store_data)
+        await reader.get_data()
+
+        assert ["endpoint_meters"] in reader.detection_calls
+        assert reader._store_data["model"]["firmware"] != "D0.0.1"
+
+    @pytest.mark.asyncio
+    async def test_changed_settings_do_not_reuse_required_endpoints(self):
+        first = make_detecting_reader()
+        await first.get_data()
+
+        reader = make_detecting_reader(first._store_data)
+        reader.device_data_endpoint = "endpoint_devstatus"
+        await reader.detect_model()
+
+        assert reader.detection_calls == [["endpoint_info"]]
+        assert reader.data._required_endpoints is None
+
+    @pytest.mark.asyncio
+    async def test_inconsistent_cached_model_detects_again(self):
+        first = make_detecting_reader()
+        await first.get_data()
+        first._store_data["model"]["data_class"] = "EnvoyStandard"
+        first._store_data["model"]["endpoint_type"] = ENVOY_MODEL_S
+
+        reader = make_detecting_reader(first._store_data)
+        await reader.get_data()
+
+        assert isinstance(reader.data, EnvoyMeteredWithCT)
+        assert reader.endpoint_type == ENVOY_MODEL_M
+        assert reader._store_data["model"]["data_class"] == "EnvoyMeteredWithCT"
+
+    @pytest.mark.asyncio
+    async def test_restored_standard_model_without_meters(self):
+        first = make_detecting_reader()
+        await first.get_data()
+        first._store_data["model"].update(
+            data_class="EnvoyStandard",
+            endpoint_type=ENVOY_MODEL_S,
+            required_endpoints=None,
+        )
+
+        reader = make_detecting_reader(first._store_data)
+        reader._cached_model_consistent = lambda: True
+        await reader.get_data()
+        await reader.get_data()
+
+        assert isinstance(reader.data, EnvoyStandard)
+        assert reader.endpoint_meters is None
+
+
+# ===========================================================================
+# Unsupported endpoint cache
+# ===========================================================================
+
+
+class _StatusResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def make_capability_reader(statuses):
+    """Reader where the given endpoints answer with a fixed HTTP status."""
+    reader = make_reader()
+    reader.data = EnvoyMeteredWithCT(reader)
+    load_all(reader)
+    for endpoint in statuses:
+        reader.uri_registry[endpoint]["optional"] = True
+
+    reader.fetched = []
+
+    async def fake_update_endpoint(attr, url, only_on_success=False):
+        reader.fetched.append(attr)
+        if attr in statuses:
+            setattr(reader, attr, _StatusResponse(statuses[attr]))
+        else:
+            setattr(reader, attr, FileData(url))
+
+    reader._update_endpoint = fake_update_endpoint
+    return reader
+
+
+class TestUnsupportedEndpoints:
+    @pytest.mark.asyncio
+    async def test_404_is_remembered(self):
+        reader = make_capability_reader({"endpoint_ensemble_power": 404})
+        endpoints = ["endpoint_info", "endpoint_ensemble_power"]
+
+        await reader.update_endpoints(endpoints)
+        reader.fetched.clear()
+        await reader.update_endpoints(endpoints)
+
+        assert reader.fetched == ["endpoint_info"]
+        table = reader._store_data["unsupported_endpoints"]
+        assert table["firmware"] == reader.data.get("envoy_software")
+        assert table["endpoints"]["endpoint_ensemble_power"]["status"] == 404
+        assert reader._store_update_pending
+
+    @pytest.mark.asyncio
+    async def test_required_endpoint_404_not_remembered(self):
+        reader = make_capability_reader({})
+
+        async def not_found(attr, url, only_on_success=False):
+            reader.fetched.append(attr)
+            setattr(reader, attr, _StatusResponse(404))
+
+        reader._update_endpoint = not_found
+        await reader.update_endpoints(["endpoint_production_report"])
+
+        assert reader._store_data["unsupported_endpoints"]["endpoints"] == {}
+
+    @pytest.mark.asyncio
+    async def test_401_needs_successful_request(self):
+        reader = make_capability_reader({"endpoint_devstatus": 401})
+
+        await reader.update_endpoints(["endpoint_devstatus"])
+        assert reader._store_data["unsupported_endpoints"]["endpoints"] == {}
+
+        await reader.update_endpoints(["endpoint_info", "endpoint_devstatus"])
+        endpoints = reader._store_data["unsupported_endpoints"]["endpoints"]
+        assert endpoints["endpoint_devstatus"]["status"] == 401
+
+    @pytest.mark.asyncio
+    async def test_entries_expire(self):
+        reader = make_capability_reader({"endpoint_ensemble_power": 404})
+        await reader.update_endpoints(["endpoint_ensemble_power"])
+
+        endpoints = reader._store_data["unsupported_endpoints"]["endpoints"]
+        endpoints["endpoint_ensemble_power"]["time"] -= (
+            envoy_reader_mod.UNSUPPORTED_ENDPOINT_TTL + 1
+        )
+        reader.fetched.clear()
+        await reader.update_endpoints(["endpoint_ensemble_power"])
+
+        assert reader.fetched == ["endpoint_ensemble_power"]
+
+    def test_firmware_change_resets_table(self):
+        reader = make_capability_reader({"endpoint_ensemble_power": 404})
+        reader._store_data["unsupported_endpoints"] = {
+            "firmware": "D0.0.1",
+            "token_type": reader.token_type,
+            "endpoints": {"endpoint_ensemble_power": {"status": 404, "time": 0}},
+        }
+
+        assert reader._unsupported_endpoints() == {}
+        assert reader._store_data["unsupported_endpoints"]["firmware"] == (
+            reader.data.get("envoy_software")
+        )
+
+    @pytest.mark.asyncio
+    async def test_serial_number_from_fetched_info(self):
+        reader = make_capability_reader({})
+        reader._async_fetch_with_retry = AsyncMock()
+
+        assert await reader.get_full_serial_number() == "999999900879"
+        reader._async_fetch_with_retry.assert_not_called()
+
+
+class TestStreamCoveredEndpoints:
+    @staticmethod
+    def _stream_reader(last_event_age=1, energy_counters=True):
+        reader = make_capability_reader({})
+        reader.data.initial_update_finished = True
+        if energy_counters:
+            reader.stream_energy_counters = frozenset(ENERGY_COUNTERS)
+        reader.is_receiving_realtime_data = True
+        reader._last_stream_event = envoy_reader_mod.time.monotonic() - last_event_age
+        return reader
+
+    def test_covered_endpoints(self):
+        reader = self._stream_reader()
+        assert reader.is_stream_healthy
+        # production_report also provides the total voltage, current and
+        # power factor, which the stream does not
+        assert reader._stream_covered_endpoints() == {"endpoint_production_json"}
+
+    def test_energy_counters_are_not_covered_by_default(self):
+        reader = self._stream_reader(energy_counters=False)
+        assert reader._stream_covered_endpoints() == set()
+
+    def test_nothing_covered_without_healthy_stream(self):
+        reader = self._stream_reader(last_event_age=60)
+        assert not reader.is_stream_healthy
+        assert reader._stream_covered_endpoints() == frozenset()
+
+        reader = self._stream_reader()
+        reader.is_receiving_realtime_data = False
+        assert reader._stream_covered_endpoints() == frozenset()
+
+    @pytest.mark.asyncio
+    async def test_covered_endpoints_are_cached_while_stream_is_healthy(self):
+        reader = self._stream_reader()
+        endpoints = ["endpoint_info", "endpoint_production_json"]
+
+        await reader.update_endpoints(endpoints)
+        reader.fetched.clear()
+        await reader.update_endpoints(endpoints)
+        assert reader.fetched == ["endpoint_info"]
+
+        # Stream dropped, the endpoint is fetched again
+        reader.is_receiving_realtime_data = False
+        reader.fetched.clear()
+        await reader.update_endpoints(endpoints)
+        assert reader.fetched == endpoints
+
+
+class TestEndpointTiers:
+    TIERS = {
+        "endpoint_production_report": envoy_reader_mod.TIER_FAST,
+        "endpoint_meters": envoy_reader_mod.TIER_MEDIUM,
+        "endpoint_inventory": envoy_reader_mod.TIER_SLOW,
+        "endpoint_dpel": envoy_reader_mod.TIER_SLOW,
+    }
+
+    def _reader(self):
+        reader = make_capability_reader({})
+        for endpoint, tier in self.TIERS.items():
+            reader.uri_registry[endpoint]["tier"] = tier
+        return reader
+
+    @pytest.mark.asyncio
+    async def test_tier_endpoints(self):
+        reader = self._reader()
+        endpoints = list(self.TIERS)
+        await reader.update_endpoints(endpoints)
+
+        for tier in envoy_reader_mod.ENDPOINT_TIERS:
+            reader.fetched.clear()
+            await reader.update_endpoints(endpoints, tier=tier)
+            assert set(reader.fetched) == {
+                e for e, t in self.TIERS.items() if t == tier
+            }
+
+    @pytest.mark.asyncio
+    async def test_cleared_endpoints_are_fetched_by_fast_tier(self):
+        reader = self._reader()
+        endpoints = list(self.TIERS)
+        await reader.update_endpoints(endpoints)
+
+        reader._clear_endpoint_cache("endpoint_dpel")
+        reader.fetched.clear()
+        await reader.update_endpoints(endpoints, tier=envoy_reader_mod.TIER_FAST)
+        assert set(reader.fetched) == {"endpoint_production_report", "endpoint_dpel"}
+
+        reader.fetched.clear()
+        await reader.update_endpoints(endpoints, tier=envoy_reader_mod.TIER_FAST)
+        assert reader.fetched == ["endpoint_production_report"]
+
+    @pytest.mark.asyncio
+    async def test_first_update_fetches_all_tiers(self):
+        reader = make_detecting_reader()
+        for endpoint, tier in self.TIERS.items():
+            reader.uri_registry[endpoint]["tier"] = tier
+        await reader.get_data(tier=envoy_reader_mod.TIER_FAST)
+        assert reader.endpoint_device_data is not None
+        assert reader.endpoint_inventory is not None
+
+        reader.endpoint_inventory = None
+        await reader.get_data(tier=envoy_reader_mod.TIER_FAST)
+        assert reader.endpoint_inventory is None
+        await reader.get_data(tier=envoy_reader_mod.TIER_SLOW)
+        assert reader.endpoint_inventory is not None
+
+    @pytest.mark.asyncio
+    async def test_background_endpoints_have_their_own_job(self):
+        reader = make_detecting_reader()
+        reader.uri_registry["endpoint_pcu_comm_check"]["tier"] = (
+            envoy_reader_mod.TIER_BACKGROUND
+        )
+
+        await reader.get_data(tier=envoy_reader_mod.TIER_BACKGROUND)
+        assert reader.endpoint_pcu_comm_check is None
+
+        await reader.get_data(tier=envoy_reader_mod.TIER_FAST)
+        assert reader.endpoint_pcu_comm_check is None
+        assert reader.endpoint_inventory is not None
+        assert not reader.all_values.get("pcu_availability")
+
+        await reader.get_data(tier=envoy_reader_mod.TIER_BACKGROUND)
+        assert reader.endpoint_pcu_comm_check is not None
+        assert reader.all_values["pcu_availability"]
+
+
+class TestAdaptivePolling:
+    ENDPOINTS = ["endpoint_inventory"]
+
+    def _reader(self):
+        reader = make_capability_reader({})
+        reader.adaptive_polling = True
+        return reader
+
+    async def _poll(self, reader, times=1, elapsed=0):
+        for _ in range(times):
+            reader.uri_registry["endpoint_inventory"]["last_fetch"] -= elapsed
+            await reader.update_endpoints(self.ENDPOINTS)
+
+    @pytest.mark.asyncio
+    async def test_stable_endpoint_is_stretched(self):
+        reader = self._reader()
+        await self._poll(reader, times=1 + envoy_reader_mod.ADAPTIVE_STABLE_FETCHES)
+        assert reader.adaptive_intervals["endpoint_inventory"] == {
+            "interval": envoy_reader_mod.ADAPTIVE_MIN_INTERVAL,
+            "fetches": 4,
+            "changes": 0,
+            "unchanged_fetches": 3,
+        }
+
+        reader.fetched.clear()
+        await self._poll(reader)
+        assert reader.fetched == []
+
+        await self._poll(reader, elapsed=envoy_reader_mod.ADAPTIVE_MIN_INTERVAL + 1)
+        assert reader.fetched == ["endpoint_inventory"]
+        assert reader.adaptive_intervals["endpoint_inventory"]["interval"] == (
+            2 * envoy_reader_mod.ADAPTIVE_MIN_INTERVAL
+        )
+
+        await self._poll(
+            reader, times=10, elapsed=envoy_reader_mod.ADAPTIVE_MAX_INTERVAL
+        )
+        assert reader.adaptive_intervals["endpoint_inventory"]["interval"] == (
+            envoy_reader_mod.ADAPTIVE_MAX_INTERVAL
+        )
+
+    @pytest.mark.asyncio
+    async def test_change_snaps_back(self):
+        reader = self._reader()
+        await self._poll(reader, times=5)
+        assert reader.adaptive_intervals["endpoint_inventory"]["interval"] > 0
+
+        reader.uri_registry["endpoint_inventory"]["url"] = ENDPOINTS["devstatus"]
+        await self._poll(reader, elapsed=envoy_reader_mod.ADAPTIVE_MAX_INTERVAL)
+        state = reader.adaptive_intervals["endpoint_inventory"]
+        assert state["interval"] == 0
+        assert state["changes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_write_snaps_back(self):
+        reader = self._reader()
+        await self._poll(reader, times=5)
+
+        reader._clear_endpoint_cache("endpoint_inventory")
+        assert reader.adaptive_intervals["endpoint_inventory"]["interval"] == 0
+        reader.fetched.clear()
+        await self._poll(reader)
+        assert reader.fetched == ["endpoint_inventory"]
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        reader = make_capability_reader({})
+        await self._poll(reader, times=5)
+        assert reader.adaptive_intervals == {}
+
+
+class TestReportScheduling:
+    ENDPOINTS = ["endpoint_production_inverters", "endpoint_ensemble_inventory"]
+
+    def _newest_report(self, endpoint):
+        reader = make_capability_reader({})
+        reader.data.set_endpoint_data(
+            endpoint, FileData(reader.uri_registry[endpoint]["url"])
+        )
+        data = reader.data.data[endpoint]
+        if endpoint == "endpoint_ensemble_inventory":
+            return max(
+                d["last_rpt_date"] for group in data for d in group.get("devices", [])
+            )
+        return max(d["lastReportDate"] for d in data)
+
+    def _clock(self, monkeypatch, now):
+        clock = [now]
+        monkeypatch.setattr(envoy_reader_mod.time, "time", lambda: clock[0])
+        return clock
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("endpoint", ENDPOINTS)
+    async def test_fetched_after_next_report(self, monkeypatch, endpoint):
+        newest = self._newest_report(endpoint)
+        clock = self._clock(monkeypatch, newest + 100)
+        reader = make_capability_reader({})
+
+        await reader.update_endpoints([endpoint])
+        next_fetch = (
+            newest + envoy_reader_mod.REPORT_INTERVAL + envoy_reader_mod.REPORT_GRACE
+        )
+        assert reader.next_report_time() == next_fetch
+
+        reader.fetched.clear()
+        clock[0] = next_fetch - 1
+        await reader.update_endpoints([endpoint])
+        assert reader.fetched == []
+
+        clock[0] = next_fetch
+        await reader.update_endpoints([endpoint])
+        assert reader.fetched == [endpoint]
+
+    @pytest.mark.asyncio
+    async def test_overdue_report(self, monkeypatch):
+        # The fixture reports are old, like at night when the devices sleep
+        endpoint = "endpoint_production_inverters"
+        clock = self._clock(monkeypatch, self._newest_report(endpoint) + 86400)
+        reader = make_capability_reader({})
+
+        await reader.update_endpoints([endpoint])
+        assert reader.next_report_time() == (
+            clock[0] + envoy_reader_mod.REPORT_INTERVAL
+        )
+        assert reader.next_report_time(envoy_reader_mod.TIER_SLOW) is None
+
+        reader.fetched.clear()
+        clock[0] += envoy_reader_mod.REPORT_INTERVAL - 1
+        await reader.update_endpoints([endpoint])
+        assert reader.fetched == []
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_not_scheduled(self, monkeypatch):
+        endpoint = "endpoint_production_inverters"
+        newest = self._newest_report(endpoint)
+        clock = self._clock(monkeypatch, newest + 100)
+        statuses = {}
+        reader = make_capability_reader(statuses)
+        await reader.update_endpoints([endpoint])
+
+        statuses[endpoint] = 500
+        clock[0] = reader.next_report_time()
+        await reader.update_endpoints([endpoint])
+        assert reader.next_report_time() is None
+
+        # Retried on the next update, and scheduled again once it answers
+        del statuses[endpoint]
+        reader.fetched.clear()
+        clock[0] += 1
+        await reader.update_endpoints([endpoint])
+        assert reader.fetched == [endpoint]
+        assert reader.next_report_time() > clock[0]
+
+    @pytest.mark.asyncio
+    async def test_write_fetches_again(self):
+        endpoint = "endpoint_ensemble_inventory"
+        reader = make_capability_reader({})
+        await reader.update_endpoints([endpoint])
+
+        reader._clear_endpoint_cache(endpoint)
+        assert reader.next_report_time() is None
+        reader.fetched.clear()
+        await reader.update_endpoints([endpoint])
+        assert reader.fetched == [endpoint]
@@ -0,0 +1,166 @@
+"""Tests running EnvoyReader against the in-process Envoy simulator.
+
+Imports envoy_reader without the homeassistant dependency tree, see
+load_envoy_reader in conftest.py.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tests.conftest import load_envoy_reader
+from tests.envoy_simulator import ENVOY_ENDPOINTS, EnvoySimulator
+from tests.site_generator import SiteGenerator
+
+envoy_reader_mod = load_envoy_reader()
+
+EnvoyReader = envoy_reader_mod.EnvoyReader
+EnvoyMeteredWithCT = envoy_reader_mod.EnvoyMeteredWithCT
+
+HOST = "envoy.local"
+
+
+def _reader(simulator):
+    reader = EnvoyReader(
+        host=HOST,
+        inverters=True,
+        enlighten_user="test@example.com",
+        enlighten_pass="test_pass",
+        enlighten_serial_num=simulator.serial_number,
+        transport=simulator.transport,
+    )
+    for key, endpoint in ENVOY_ENDPOINTS.items():
+        reader.register_url(f"endpoint_{key}", **endpoint)
+    return reader
+
+
+@pytest.mark.asyncio
+async def test_authenticates_and_fetches():
+    simulator = EnvoySimulator(host=HOST)
+    reader = _reader(simulator)
+
+    await reader.init_authentication()
+    response = await reader._async_fetch_with_retry(simulator.url("inventory"))
+
+    assert response.status_code == 200
+    assert response.json()[0]["type"] == "PCU"
+    assert reader.token_type == "installer"
+    assert simulator.logins == 1
+    # The session cookie replaces the bearer token
+    assert reader._authorization_header == {}
+
+
+@pytest.mark.asyncio
+async def test_unauthenticated_request_gets_new_token():
+    simulator = EnvoySimulator(host=HOST)
+    reader = _reader(simulator)
+
+    response = await reader._async_fetch_with_retry(simulator.url("info"))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/xml"
+    assert simulator.tokens_issued == 1
+
+
+@pytest.mark.asyncio
+async def test_recovers_from_expired_tokens():
+    simulator = EnvoySimulator(host=HOST)
+    reader = _reader(simulator)
+    await reader.init_authentication()
+
+    simulator.expire_tokens()
+    response = await reader._async_fetch_with_retry(simulator.url("meters"))
+
+    assert response.status_code == 200
+    assert simulator.tokens_issued == 2
+    # The broker session is reused for the second token
+    assert simulator.logins == 1
+
+
+@pytest.mark.asyncio
+async def test_injected_errors():
+    simulator = EnvoySimulator(host=HOST)
+    reader = _reader(simulator)
+    await reader.init_authentication()
+
+    simulator.fail("devstatus", httpx.ConnectError, count=2)
+    response = await reader._async_fetch_with_retry(simulator.url("devstatus"))
+    assert response.status_code == 200
+    assert simulator.count("devstatus") == 3
+
+    simulator.fail("devstatus", 503, count=1)
+    response = await reader._async_fetch_with_retry(simulator.url("devstatus"))
+    assert response.status_code == 503
+
+    simulator.fail("devstatus", httpx.ReadTimeout)
+    with pytest.raises(httpx.ReadTimeout):
+        await reader._async_fetch_with_retry(simulator.url("devstatus"))
+
+
+@pytest.mark.asyncio
+async def test_generated_site(tmp_path):
+    generator = SiteGenerator(inverters=250)
+    simulator = EnvoySimulator(host=HOST, data_dir=generator.write(tmp_path))
+    reader = _reader(simulator)
+    await reader.init_authentication()
+
+    response = await reader._async_fetch_with_retry(
+        simulator.url("production_inverters")
+    )
+    assert len(response.json()) == 250
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_with_latency():
+    simulator = EnvoySimulator(host=HOST)
+    simulator.set_latency("default", 0.05, jitter=0.01)
+    reader = _reader(simulator)
+    await reader.init_authentication()
+
+    endpoints = ("inventory", "meters", "devstatus", "device_data", "ensemble_power")
+    start = time.monotonic()
+    responses = await asyncio.gather(
+        *(reader._async_fetch_with_retry(simulator.url(e)) for e in endpoints)
+    )
+
+    assert [r.status_code for r in responses] == [200] * len(endpoints)
+    assert time.monotonic() - start < 0.05 * len(endpoints)
+
+
+@pytest.mark.asyncio
+async def test_stream():
+    simulator = EnvoySimulator(
+        host=HOST, stream_interval=0.01, stream_events=5, stream_phases=2
+    )
+    reader = _reader(simulator)
+    reader.data = EnvoyMeteredWithCT(reader)
+    reader.endpoint_type = envoy_reader_mod.ENVOY_MODEL_M
+
+    events = []
+    result = await reader.stream_reader(meter_callback=events.append)
+
+    assert result is True
+    assert len(events) == 5
+    assert sorted(events[0].production) == ["l1", "l2"]
+
+
+@pytest.mark.asyncio
+async def test_endpoint_request_timeout():
+    simulator = EnvoySimulator(host=HOST)
+    timeouts = {}
+
+    async def handle(request):
+        timeouts[request.url.path] = request.extensions["timeout"]["read"]
+        return await simulator.handle(request)
+
+    reader = _reader(simulator)
+    reader._transport = httpx.MockTransport(handle)
+    await reader.init_authentication()
+
+    for endpoint in ("endpoint_pcu_comm_check", "endpoint_inventory"):
+        await reader._update_endpoint(endpoint, reader.uri_registry[endpoint]["url"])
+
+    assert timeouts["/installer/pcu_comm_check"] == 300
+    assert timeouts["/inventory.json"] == 30
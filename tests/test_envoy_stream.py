@@ -0,0 +1,300 @@
+"""Tests for the stream value processing in envoy_stream.py."""
+
+import importlib.util
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "envoy_stream", "custom_components/enphase_envoy/envoy_stream.py"
+)
+envoy_stream = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(envoy_stream)
+
+StreamAggregator = envoy_stream.StreamAggregator
+EnergyIntegrator = envoy_stream.EnergyIntegrator
+StreamReconnectPolicy = envoy_stream.StreamReconnectPolicy
+StreamDispatcher = envoy_stream.StreamDispatcher
+
+
+class TestStreamAggregator:
+    def test_first_values_are_returned_immediately(self):
+        aggregator = StreamAggregator(10)
+        result = aggregator.add({"production": 100}, now=0)
+        assert result["production"].mean == 100
+        assert result["production"].count == 1
+        assert not aggregator.pending
+
+    def test_values_within_window_are_aggregated(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 100}, now=0)
+        assert aggregator.add({"production": 200}, now=1) is None
+        assert aggregator.add({"production": 400}, now=5) is None
+        assert aggregator.add({"production": 300}, now=9) is None
+        assert aggregator.pending
+        assert aggregator.remaining(now=9) == pytest.approx(1)
+
+        result = aggregator.add({"production": 600}, now=10)
+        assert result["production"] == (375, 200, 600, 600, 4)
+
+    def test_trailing_flush_keeps_last_value(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 100}, now=0)
+        aggregator.add({"production": 50}, now=3)
+        aggregator.add({"production": 0}, now=4)
+
+        result = aggregator.flush(now=10)
+        assert result["production"].last == 0
+        assert result["production"].mean == 25
+        assert result["production"].minimum == 0
+        assert aggregator.flush(now=11) == {}
+
+    def test_keys_are_aggregated_independently(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 1}, now=0)
+        aggregator.add({"production": 2, "consumption": 10}, now=1)
+        aggregator.add({"consumption": None, "net_consumption": -5}, now=2)
+
+        result = aggregator.flush(now=10)
+        # Left out keys keep their value for the event
+        assert result["production"] == (2, 2, 2, 2, 2)
+        assert result["consumption"] == (10, 10, 10, 10, 2)
+        assert result["net_consumption"] == (-5, -5, -5, -5, 1)
+
+    def test_unchanged_values_count_in_mean(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 100}, now=0)
+        for i in range(1, 10):
+            aggregator.add({}, now=i)
+        result = aggregator.add({"production": 200}, now=10)
+        # Held at 100 for nine events, then 200 for one
+        assert result["production"] == (110, 100, 200, 200, 10)
+
+    def test_unchanged_key_in_window_is_not_reported(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 100, "consumption": 5}, now=0)
+        aggregator.add({"production": 200}, now=1)
+        result = aggregator.flush(now=10)
+        assert list(result) == ["production"]
+
+    def test_window_mean_is_corrected_in_next_window(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 100}, now=0)
+        aggregator.add({"production": 200}, now=1)
+        aggregator.add({}, now=2)
+        assert aggregator.flush(now=10)["production"].mean == 200
+        aggregator.add({"production": 0}, now=11)
+        aggregator.add({"production": 300}, now=12)
+        assert aggregator.flush(now=20)["production"].mean == 150
+        # Unchanged since, but the last reported mean was not the value
+        aggregator.add({}, now=21)
+        assert aggregator.flush(now=30)["production"] == (300, 300, 300, 300, 1)
+
+    def test_window_restarts_after_flush(self):
+        aggregator = StreamAggregator(10)
+        aggregator.add({"production": 1}, now=0)
+        aggregator.add({"production": 2}, now=5)
+        aggregator.flush(now=10)
+        assert aggregator.add({"production": 3}, now=15) is None
+        assert aggregator.add({"production": 4}, now=20)["production"].mean == 3.5
+
+
+class TestEnergyIntegrator:
+    @staticmethod
+    def _integrator(**kwargs):
+        return EnergyIntegrator(
+            counters={
+                "lifetime_production": ("production", 1),
+                "lifetime_net_consumption": ("net_consumption", 1),
+                "lifetime_net_production": ("net_consumption", -1),
+            },
+            **kwargs,
+        )
+
+    def test_no_estimate_before_first_poll(self):
+        integrator = self._integrator()
+        assert integrator.add({"production": 1000}, now=0) == {}
+        assert integrator.add({"production": 1000}, now=1) == {}
+
+    def test_trapezoidal_integration(self):
+        integrator = self._integrator()
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 0}, now=0)
+        result = integrator.add({"production": 3600}, now=2)
+        # (0 + 3600) / 2 W for 2 seconds = 1 Wh
+        assert result["lifetime_production"] == pytest.approx(5001)
+        result = integrator.add({"production": 3600}, now=3)
+        assert result["lifetime_production"] == pytest.approx(5002)
+
+    def test_gaps_are_not_integrated(self):
+        integrator = self._integrator(max_gap=30)
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 3600}, now=0)
+        result = integrator.add({"production": 3600}, now=100)
+        assert result["lifetime_production"] == 5000
+
+    def test_net_power_split_over_import_and_export(self):
+        integrator = self._integrator()
+        integrator.resync(
+            {"lifetime_net_consumption": 100, "lifetime_net_production": 200}
+        )
+        integrator.add({"net_consumption": 3600}, now=0)
+        integrator.add({"net_consumption": 3600}, now=1)
+        result = integrator.add({"net_consumption": -3600}, now=2)
+        assert result["lifetime_net_consumption"] == pytest.approx(101.5)
+        assert result["lifetime_net_production"] == pytest.approx(200.5)
+
+    def test_resync_catches_up(self):
+        integrator = self._integrator()
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 3600}, now=0)
+        integrator.add({"production": 3600}, now=10)
+        result = integrator.resync({"lifetime_production": 5012})
+        assert result["lifetime_production"] == 5012
+        # integration continues from the polled value
+        result = integrator.add({"production": 3600}, now=11)
+        assert result["lifetime_production"] == pytest.approx(5013)
+
+    def test_small_overshoot_is_held(self):
+        integrator = self._integrator()
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 3600}, now=0)
+        integrator.add({"production": 3600}, now=10)
+        # Estimate is 5010, the Envoy reports a little less
+        result = integrator.resync({"lifetime_production": 5008})
+        assert result["lifetime_production"] == pytest.approx(5010)
+        result = integrator.add({"production": 3600}, now=11)
+        assert result["lifetime_production"] == pytest.approx(5010)
+        result = integrator.add({"production": 3600}, now=14)
+        assert result["lifetime_production"] == pytest.approx(5012)
+
+    def test_large_drop_is_taken_over(self):
+        integrator = self._integrator()
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 3600}, now=0)
+        integrator.add({"production": 3600}, now=10)
+        # Daily counter reset, or meter replaced
+        result = integrator.resync({"lifetime_production": 0})
+        assert result["lifetime_production"] == 0
+
+    def test_unchanged_poll_keeps_estimate(self):
+        integrator = self._integrator()
+        integrator.resync({"lifetime_production": 5000})
+        integrator.add({"production": 3600}, now=0)
+        integrator.add({"production": 3600}, now=10)
+        # The endpoint was not fetched again, so the same value is reported
+        result = integrator.resync({"lifetime_production": 5000})
+        assert result["lifetime_production"] == pytest.approx(5010)
+
+
+class TestStreamReconnectPolicy:
+    @staticmethod
+    def _policy(**kwargs):
+        return StreamReconnectPolicy(rng=lambda: 0, **kwargs)
+
+    def test_clean_close_reconnects_immediately(self):
+        policy = self._policy()
+        policy.connected(now=0)
+        assert policy.is_connected
+        assert policy.disconnected(clean=True, now=600) == 0
+        assert not policy.is_connected
+
+    def test_errors_back_off_exponentially_up_to_maximum(self):
+        policy = self._policy(initial=1, maximum=60)
+        delays = [policy.disconnected(clean=False, now=i) for i in range(8)]
+        assert delays == [1, 2, 4, 8, 16, 32, 60, 60]
+
+    def test_server_error_without_connection_backs_off(self):
+        policy = self._policy(initial=1)
+        # e.g. a HTTP 500 returns True, but never connected
+        assert policy.disconnected(clean=True, now=0) == 1
+        assert policy.disconnected(clean=True, now=1) == 2
+
+    def test_flapping_connection_backs_off(self):
+        policy = self._policy(initial=1, min_uptime=10)
+        policy.connected(now=0)
+        assert policy.disconnected(clean=True, now=1) == 1
+        policy.connected(now=2)
+        assert policy.disconnected(clean=True, now=3) == 2
+
+    def test_successful_connection_resets_backoff(self):
+        policy = self._policy(initial=1)
+        policy.disconnected(clean=False, now=0)
+        policy.disconnected(clean=False, now=1)
+        policy.connected(now=3)
+        assert policy.disconnected(clean=False, now=60) == 1
+
+    def test_jitter_shortens_delay(self):
+        policy = StreamReconnectPolicy(initial=10, jitter=0.2, rng=lambda: 1)
+        assert policy.disconnected(clean=False, now=0) == pytest.approx(8)
+
+    def test_diagnostics(self):
+        policy = self._policy()
+        policy.connected(now=0)
+        policy.disconnected(clean=False, now=100)
+        policy.connected(now=130)
+
+        diagnostics = policy.diagnostics(now=200)
+        assert diagnostics["connected"] is True
+        assert diagnostics["connects"] == 2
+        assert diagnostics["disconnects"] == 1
+        assert diagnostics["failed_attempts"] == 1
+        assert diagnostics["downtime"] == 30
+
+        policy.disconnected(clean=False, now=200)
+        assert policy.diagnostics(now=210)["downtime"] == 40
+
+
+def _event(production=100.0, pf=0.95, phases=("ph-a", "ph-b", "ph-c")):
+    def phase(p):
+        return {"p": p, "q": 10.0, "s": 110.0, "v": 230.0, "i": 0.5, "pf": pf, "f": 50}
+
+    return {
+        "production": {key: phase(production) for key in phases},
+        "total-consumption": {key: phase(500.0) for key in phases},
+        "net-consumption": {key: phase(500.0 - production) for key in phases},
+    }
+
+
+class TestStreamDispatcher:
+    def test_only_compiled_keys_are_returned(self):
+        dispatcher = StreamDispatcher(["production_l1", "voltage_l2", "daily_x"])
+        assert dispatcher.keys == {"production_l1", "voltage_l2"}
+        assert dispatcher.dispatch(_event()) == {
+            "production_l1": 100.0,
+            "voltage_l2": 230.0,
+        }
+
+    def test_power_factor_per_phase(self):
+        dispatcher = StreamDispatcher(["power_factor_l1", "power_factor_l3"])
+        assert dispatcher.dispatch(_event(pf=0.5)) == {
+            "power_factor_l1": 0.5,
+            "power_factor_l3": 0.5,
+        }
+
+    def test_only_changes_are_returned(self):
+        dispatcher = StreamDispatcher(["production_l1", "frequency_l1"])
+        dispatcher.dispatch(_event(production=100.0))
+        assert dispatcher.dispatch(_event(production=100.0)) == {}
+        assert dispatcher.dispatch(_event(production=120.0)) == {"production_l1": 120.0}
+
+    def test_totals_without_phase_keys(self):
+        dispatcher = StreamDispatcher(["production", "net_consumption"])
+        assert dispatcher.dispatch(_event(production=100.0)) == {
+            "production": 300.0,
+            "net_consumption": 1200.0,
+        }
+        assert dispatcher.dispatch(_event(production=100.0)) == {}
+
+    def test_missing_phases_are_skipped(self):
+        dispatcher = StreamDispatcher(["production", "production_l2"])
+        assert dispatcher.dispatch(_event(phases=("ph-a",))) == {"production": 100.0}
+
+    def test_production_is_processed(self):
+        dispatcher = StreamDispatcher(
+            ["production", "production_l1", "consumption_l1"],
+            process_production=lambda value: 0 if -15 < value < 0 else value,
+        )
+        changes = dispatcher.dispatch(_event(production=-5.0))
+        assert changes["production_l1"] == 0
+        assert changes["production"] == 0
+        assert changes["consumption_l1"] == 500.0
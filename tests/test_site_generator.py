@@ -0,0 +1,52 @@
+"""Tests for the synthetic large-site fixture generator."""
+
+import os
+
+from tests.site_generator import SiteGenerator, stream_event
+from tests.test_envoy_reader import envoy_reader_mod, make_reader
+
+
+def _load_site(directory):
+    reader = make_reader()
+    reader.data = envoy_reader_mod.EnvoyMeteredWithCT(reader)
+    for attr, settings in reader.uri_registry.items():
+        url = os.path.join(directory, os.path.basename(settings["url"]))
+        reader.data.set_endpoint_data(attr, envoy_reader_mod.FileData(url))
+    return reader
+
+
+def test_site_is_parsed_with_all_devices(tmp_path):
+    generator = SiteGenerator(inverters=50, relays=5, batteries=4, phases=2)
+    values = _load_site(generator.write(tmp_path)).all_values
+
+    assert len(values["inverter_production"]) == 50
+    assert len(values["inverter_device_data"]) == 50
+    assert len(values["inverter_info"]) == 50
+    assert len(values["relay_device_data"]) == 5
+    assert len(values["relay_info"]) == 5
+    assert len(values["batteries"]) == 4
+    assert len(values["batteries_power"]) == 4
+    assert len(values["pcu_availability"]) == 55
+
+
+def test_meter_phases():
+    payloads = SiteGenerator(phases=2).payloads()
+    assert [len(meter["channels"]) for meter in payloads["meters_readings"]] == [
+        2,
+        2,
+        2,
+    ]
+    assert max(meter["phaseCount"] for meter in payloads["meters"]) == 2
+
+
+def test_site_is_reproducible():
+    assert SiteGenerator(inverters=20).payloads() == (
+        SiteGenerator(inverters=20).payloads()
+    )
+    assert SiteGenerator(inverters=20, seed=1).payloads() != (
+        SiteGenerator(inverters=20).payloads()
+    )
+
+
+def test_stream_event_phases():
+    assert list(stream_event(phases=2)["production"]) == ["ph-a", "ph-b"]
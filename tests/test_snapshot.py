@@ -0,0 +1,90 @@
+"""Tests for the coordinator data snapshot in snapshot.py."""
+
+import importlib.util
+
+import pytest
+
+from tests.test_envoy_reader import make_capability_reader
+
+spec = importlib.util.spec_from_file_location(
+    "snapshot", "custom_components/enphase_envoy/snapshot.py"
+)
+snapshot = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(snapshot)
+
+MAX_AGE = 900
+
+
+def test_snapshot_is_compact_with_value_times():
+    data = {"production": 100, "batteries": {}, "grid_status": None, "tariff": []}
+    saved = snapshot.create_snapshot(data, {"production": 999.6}, now=1000)
+
+    assert saved == {
+        "time": 1000,
+        "data": {"production": 100},
+        "times": {"production": 1000},
+    }
+
+
+@pytest.mark.asyncio
+async def test_value_times_from_reader():
+    reader = make_capability_reader({"endpoint_ensemble_power": 500})
+    await reader.update_endpoints(["endpoint_info", "endpoint_ensemble_power"])
+    reader.uri_registry["endpoint_info"]["last_fetch"] = 1000
+
+    times = reader.value_times()
+    assert times["envoy_software"] == 1000
+    # A failed fetch does not make the value recent
+    assert "batteries_power" not in times
+
+
+def test_warm_start_uses_recent_snapshot():
+    saved = snapshot.create_snapshot({"production": 100}, {"production": 900}, now=1000)
+
+    assert snapshot.restore_snapshot(saved, MAX_AGE, now=1000 + 60) == {
+        "production": 100
+    }
+    # Saved recently, but the values are from before the Envoy went away
+    assert snapshot.restore_snapshot(saved, MAX_AGE, now=900 + MAX_AGE) is None
+    assert snapshot.restore_snapshot(None, MAX_AGE) is None
+
+
+def test_snapshot_without_value_times():
+    saved = {"time": 1000, "data": {"production": 100}}
+    assert snapshot.restore_snapshot(saved, MAX_AGE, now=1100) == {"production": 100}
+    assert snapshot.restore_snapshot(saved, MAX_AGE, now=1000 + MAX_AGE) is None
+
+
+@pytest.mark.asyncio
+async def test_live_update_replaces_snapshot():
+    received, errors = [], []
+
+    async def first_update():
+        return {"production": 200}
+
+    replaced = await snapshot.async_replace_snapshot(
+        first_update, received.append, errors.append
+    )
+
+    assert replaced
+    assert received == [{"production": 200}]
+    assert errors == []
+
+
+@pytest.mark.asyncio
+async def test_failed_live_update_is_reported_once():
+    received, errors, calls = [], [], []
+
+    async def first_update():
+        calls.append(1)
+        raise RuntimeError("Envoy unreachable")
+
+    replaced = await snapshot.async_replace_snapshot(
+        first_update, received.append, errors.append
+    )
+
+    assert not replaced
+    assert received == []
+    assert [str(err) for err in errors] == ["Envoy unreachable"]
+    # The scheduled refreshes retry, no second fetch right away
+    assert len(calls) == 1
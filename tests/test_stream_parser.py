@@ -0,0 +1,169 @@
+"""Tests for the incremental /stream/meter event parser.
+
+Imports envoy_reader without the homeassistant dependency tree, see
+load_envoy_reader in conftest.py.
+"""
+
+import json
+import random
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from tests.conftest import load_envoy_reader
+
+envoy_reader_mod = load_envoy_reader()
+
+SSEParser = envoy_reader_mod.SSEParser
+EnvoyReader = envoy_reader_mod.EnvoyReader
+
+
+def _reading(n):
+    phase = {"p": n, "q": 0, "s": n, "v": 230.1, "i": 1.5, "pf": 1.0, "f": 50.0}
+    return {
+        "production": {"ph-a": phase, "ph-b": phase},
+        "net-consumption": {"ph-a": phase, "ph-b": phase},
+        "total-consumption": {"ph-a": phase, "ph-b": phase},
+    }
+
+
+def _stream(count, newline=b"\n"):
+    return b"".join(
+        b"data: " + json.dumps(_reading(n)).encode() + newline + newline
+        for n in range(count)
+    )
+
+
+def _parse(parser, chunks):
+    return [json.loads(payload) for chunk in chunks for payload in parser.feed(chunk)]
+
+
+def test_single_event():
+    parser = SSEParser()
+    assert _parse(parser, [_stream(1)]) == [_reading(0)]
+
+
+def test_multiple_events_in_one_chunk():
+    parser = SSEParser()
+    assert _parse(parser, [_stream(5)]) == [_reading(n) for n in range(5)]
+
+
+def test_byte_by_byte():
+    data = _stream(3)
+    parser = SSEParser()
+    chunks = [data[i : i + 1] for i in range(len(data))]
+    assert _parse(parser, chunks) == [_reading(n) for n in range(3)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_fragmentation(seed):
+    rnd = random.Random(seed)
+    data = _stream(10, newline=rnd.choice([b"\n", b"\r\n"]))
+    chunks = []
+    pos = 0
+    while pos < len(data):
+        size = rnd.randint(1, 300)
+        chunks.append(data[pos : pos + size])
+        pos += size
+
+    parser = SSEParser()
+    assert _parse(parser, chunks) == [_reading(n) for n in range(10)]
+
+
+def test_split_inside_crlf_and_field_name():
+    parser = SSEParser()
+    assert _parse(parser, [b"da", b"ta:", b'{"a": 1}\r', b"\n\r\n"]) == [{"a": 1}]
+
+
+def test_comments_and_other_fields_are_ignored():
+    parser = SSEParser()
+    chunks = [b": keepalive\n\nevent: meter\nid: 4\n", b'data:{"a": 1}\n\n']
+    assert _parse(parser, chunks) == [{"a": 1}]
+
+
+def test_incomplete_line_is_kept():
+    parser = SSEParser()
+    assert parser.feed(b'data: {"a": ') == []
+    assert parser.feed(b"1}") == []
+    assert [json.loads(p) for p in parser.feed(b"\n")] == [{"a": 1}]
+
+
+def test_oversized_line_is_discarded_and_parser_resyncs():
+    parser = SSEParser(max_size=64)
+    chunks = [b"data: " + b"x" * 100, b"y" * 100, b'\ndata: {"a": 1}\n']
+    assert _parse(parser, chunks) == [{"a": 1}]
+
+
+def test_reset_drops_partial_line():
+    parser = SSEParser()
+    parser.feed(b'data: {"a": ')
+    parser.reset()
+    assert _parse(parser, [b'data: {"b": 2}\n']) == [{"b": 2}]
+
+
+class _FragmentedResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def aread(self):
+        pass
+
+    async def aiter_bytes(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class _FakeClient:
+    def __init__(self, response):
+        self._response = response
+
+    def stream(self, method, url, **kwargs):
+        return self._response
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_stream_reader_receives_every_fragmented_event():
+    reader = MagicMock(spec=EnvoyReader)
+    reader.host = "192.168.1.1"
+    reader.is_metering_enabled = True
+    reader.endpoint_type = "Metered"
+    reader._authorization_header = {}
+    reader._cookies = {}
+    reader._stream_subscriptions = []
+    reader._transport = None
+    reader.init_authentication = AsyncMock()
+
+    data = _stream(4)
+    # Split mid event, and join the tail of one event with the next one.
+    chunks = [data[:10], data[10:250], data[250:251], data[251:]]
+    callback = MagicMock()
+
+    with (
+        patch.object(envoy_reader_mod.httpx, "Timeout"),
+        patch.object(
+            envoy_reader_mod.httpx,
+            "AsyncClient",
+            return_value=_FakeClient(_FragmentedResponse(chunks)),
+        ),
+    ):
+        result = await EnvoyReader.stream_reader(reader, meter_callback=callback)
+
+    assert result is True
+    assert [c.args[0].production["l1"].watts for c in callback.call_args_list] == [
+        0,
+        1,
+        2,
+        3,
+    ]
@@ -71,6 +71,8 @@ def _make_reader(**kwargs):
     reader._authorization_header = {"Authorization": "Bearer test"}
     reader._cookies = {}
     reader.is_receiving_realtime_data = False
+    reader._stream_subscriptions = []
+    reader._transport = None
     reader.init_authentication = AsyncMock()
     # Bind the real stream_reader method to the mock instance.
     reader.stream_reader = lambda **kw: EnvoyReader.stream_reader(reader, **kw)
@@ -92,9 +94,9 @@ class _FakeResponse:
     async def aread(self):
         pass
 
-    async def aiter_text(self):
+    async def aiter_bytes(self):
         for chunk in self._chunks:
-            yield chunk
+            yield chunk.encode() if isinstance(chunk, str) else chunk
         if self._hang:
             await asyncio.sleep(self._hang_timeout)
 
@@ -124,11 +126,11 @@ async def test_stream_reconnects_on_read_timeout():
     """Stream returns None (triggering reconnection) when ReadTimeout is raised."""
     reader = _make_reader()
 
-    # Simulate a response whose aiter_text raises ReadTimeout (as httpx
+    # Simulate a response whose aiter_bytes raises ReadTimeout (as httpx
     # would when the read deadline expires on a stale connection).
     class _TimeoutResponse(_FakeResponse):
-        async def aiter_text(self):
-            yield "data: {}\n"
+        async def aiter_bytes(self):
+            yield b"data: {}\n"
             raise httpx.ReadTimeout("read timed out")
 
     response = _TimeoutResponse(status_code=200)
@@ -251,3 +253,39 @@ async def test_finally_block_demoted_to_debug(caplog):
         assert record.levelno == logging.DEBUG, (
             f"Expected DEBUG level, got {record.levelname}"
         )
+
+
+@pytest.mark.asyncio
+async def test_connect_callback_called_once_connected():
+    reader = _make_reader()
+    connect_callback = MagicMock()
+
+    with (
+        patch.object(envoy_reader_mod.httpx, "Timeout"),
+        patch.object(
+            envoy_reader_mod.httpx,
+            "AsyncClient",
+            return_value=_FakeClient(_FakeResponse(status_code=200, chunks=[])),
+        ),
+    ):
+        await reader.stream_reader(connect_callback=connect_callback)
+
+    connect_callback.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_connect_callback_not_called_on_error():
+    reader = _make_reader()
+    connect_callback = MagicMock()
+
+    with (
+        patch.object(envoy_reader_mod.httpx, "Timeout"),
+        patch.object(
+            envoy_reader_mod.httpx,
+            "AsyncClient",
+            return_value=_FakeClient(_FakeResponse(status_code=500)),
+        ),
+    ):
+        await reader.stream_reader(connect_callback=connect_callback)
+
+    connect_callback.assert_not_called()
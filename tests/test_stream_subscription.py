@@ -0,0 +1,151 @@
+"""Tests for the stream subscriptions of EnvoyReader.
+
+Imports envoy_reader without the homeassistant dependency tree, see
+load_envoy_reader in conftest.py.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from tests.conftest import load_envoy_reader
+
+envoy_reader_mod = load_envoy_reader()
+
+EnvoyReader = envoy_reader_mod.EnvoyReader
+StreamSubscription = envoy_reader_mod.StreamSubscription
+
+
+class TestStreamSubscription:
+    @pytest.mark.asyncio
+    async def test_events_in_order(self):
+        subscription = StreamSubscription(maxsize=5)
+        for i in range(3):
+            subscription.put(i)
+        assert [await subscription.get() for _ in range(3)] == [0, 1, 2]
+
+    def test_drop_oldest(self):
+        subscription = StreamSubscription(maxsize=2, policy="drop_oldest")
+        for i in range(5):
+            subscription.put(i)
+        assert list(subscription._queue) == [3, 4]
+        assert subscription.dropped == 3
+
+    def test_drop_newest(self):
+        subscription = StreamSubscription(maxsize=2, policy="drop_newest")
+        for i in range(5):
+            subscription.put(i)
+        assert list(subscription._queue) == [0, 1]
+        assert subscription.dropped == 3
+
+    def test_coalesce_keeps_latest(self):
+        subscription = StreamSubscription(maxsize=10, policy="coalesce")
+        for i in range(5):
+            subscription.put(i)
+        assert list(subscription._queue) == [4]
+        assert subscription.dropped == 4
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            StreamSubscription(policy="block")
+
+    @pytest.mark.asyncio
+    async def test_waiting_consumer_is_woken(self):
+        subscription = StreamSubscription()
+        getter = asyncio.ensure_future(subscription.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+        subscription.put("event")
+        assert await getter == "event"
+
+    @pytest.mark.asyncio
+    async def test_iteration_ends_on_close(self):
+        subscription = StreamSubscription()
+        subscription.put(1)
+        subscription.put(2)
+        subscription.close()
+        subscription.put(3)
+        assert [item async for item in subscription] == [1, 2]
+
+    def test_unsubscribe(self):
+        reader = EnvoyReader("192.168.1.1")
+        subscription = reader.subscribe_stream()
+        reader.unsubscribe_stream(subscription)
+        assert subscription.closed
+        assert reader._stream_subscriptions == []
+
+
+class _StreamResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    async def aread(self):
+        pass
+
+    async def aiter_bytes(self):
+        for chunk in self._chunks:
+            yield chunk
+            # let the consumers run in between events
+            await asyncio.sleep(0)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class _FakeClient:
+    def __init__(self, response):
+        self._response = response
+
+    def stream(self, method, url, **kwargs):
+        return self._response
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_does_not_affect_others():
+    reader = EnvoyReader("192.168.1.1")
+    reader.init_authentication = AsyncMock()
+    reader.data = envoy_reader_mod.EnvoyMeteredWithCT(reader)
+    reader.endpoint_type = "Metered"
+
+    fast = reader.subscribe_stream(maxsize=100)
+    slow = reader.subscribe_stream(maxsize=2)
+    received = []
+
+    async def consume():
+        async for event in fast:
+            received.append(event.production["l1"].watts)
+
+    consumer = asyncio.ensure_future(consume())
+    phase = '{"p": %d, "q": 0, "s": 0, "v": 0, "i": 0, "pf": 0, "f": 0}'
+    chunks = [
+        b'data: {"production": {"ph-a": ' + (phase % i).encode() + b"}}\n\n"
+        for i in range(10)
+    ]
+
+    with (
+        patch.object(envoy_reader_mod.httpx, "Timeout"),
+        patch.object(
+            envoy_reader_mod.httpx,
+            "AsyncClient",
+            return_value=_FakeClient(_StreamResponse(chunks)),
+        ),
+    ):
+        assert await reader.stream_reader() is True
+
+    reader.unsubscribe_stream(fast)
+    await consumer
+
+    assert received == list(range(10))
+    assert fast.dropped == 0
+    assert slow.dropped == 8
+    assert [(await slow.get()).production["l1"].watts for _ in range(2)] == [8, 9]
@@ -172,6 +172,27 @@ class TestStreamData:
         assert "l2" not in sd.production
         assert sd.net_consumption == {}
 
+    def test_groups_decoded_on_first_access(self):
+        sd = StreamData(SAMPLE_STREAM_CHUNK)
+        assert sd._production is None
+        assert sd._net_consumption is None
+        assert sd.production is sd.production
+        assert sd._net_consumption is None
+
+    def test_compact_instances(self):
+        sd = StreamData(SAMPLE_STREAM_CHUNK)
+        assert not hasattr(sd, "__dict__")
+        assert not hasattr(sd.production["l1"], "__dict__")
+        assert sd.production["l1"].pf == 0.95
+        assert sd.production["l1"].var == 10.0
+
+    def test_raw_value(self):
+        sd = StreamData(SAMPLE_STREAM_CHUNK)
+        assert sd.value("net-consumption", "ph-b", "p") == -100.0
+        assert sd.value("production", "ph-d", "p") is None
+        assert sd.value("storage", "ph-a", "p") is None
+        assert sd._production is None
+
     def test_str_representation(self):
         sd = StreamData(SAMPLE_STREAM_CHUNK)
         s = str(sd)